@@ -12,10 +12,12 @@ from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExampl
 from drf_spectacular.types import OpenApiTypes
 
 from administration.models import Business, Employee
+from pos_inventory.utils.eager_loading import eager_load
+from pos_inventory.utils.pagination import PaginatedViewSetMixin
 from .serializers import BusinessSerializer, EmployeeSerializer
 
 
-class BusinessViewset(ViewSet):
+class BusinessViewset(PaginatedViewSetMixin, ViewSet):
     """API endpoint that allows Business to be viewed or edited"""
 
     serializer_class = BusinessSerializer
@@ -27,8 +29,7 @@ class BusinessViewset(ViewSet):
 
     def list(self, request, *args, **kwargs):
         """Returns a list of business"""
-        serializer = BusinessSerializer(self.queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.queryset, BusinessSerializer)
 
     @extend_schema(
         parameters=[
@@ -43,9 +44,10 @@ class BusinessViewset(ViewSet):
     )
     def retrieve(self, request, uuid=None):
         """Retrieves a business given its associated identifier"""
-        business = get_object_or_404(self.queryset, uuid=uuid)
-        serializer = BusinessSerializer(business)
-        return Response(serializer.data)
+        business = get_object_or_404(
+            eager_load(self.queryset, BusinessSerializer), uuid=uuid
+        )
+        return self.object_response(business, BusinessSerializer)
 
     def create(self, request, *args, **kwargs):
         """Creates a  new business"""
@@ -121,7 +123,7 @@ class BusinessViewset(ViewSet):
         return Response({}, status=204)
 
 
-class EmployeeViewset(ViewSet):
+class EmployeeViewset(PaginatedViewSetMixin, ViewSet):
     """API endpoint that allows employee to be viewed or edited"""
 
     serializer_class = EmployeeSerializer
@@ -133,8 +135,7 @@ class EmployeeViewset(ViewSet):
 
     def list(self, request, *args, **kwargs):
         """Returns a list of employee"""
-        serializer = EmployeeSerializer(self.queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.queryset, EmployeeSerializer)
 
     @extend_schema(
         parameters=[
@@ -149,9 +150,10 @@ class EmployeeViewset(ViewSet):
     )
     def retrieve(self, request, uuid=None):
         """Retrieves a employee given its associated identifier"""
-        employee = get_object_or_404(self.queryset, uuid=uuid)
-        serializer = EmployeeSerializer(employee)
-        return Response(serializer.data)
+        employee = get_object_or_404(
+            eager_load(self.queryset, EmployeeSerializer), uuid=uuid
+        )
+        return self.object_response(employee, EmployeeSerializer)
 
     def create(self, request, *args, **kwargs):
         """Creates a  new employee"""
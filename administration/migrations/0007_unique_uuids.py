@@ -0,0 +1,54 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:16
+
+from django.db import migrations, models
+from django.db.models import Count, F
+import uuid
+
+APP_LABEL = "administration"
+MODELS = ("business", "employee", "supplier")
+
+
+def reissue_duplicate_uuids(apps, schema_editor):
+    """
+    Give a fresh uuid to every row sharing one with an older row, which rows
+    that existed when the uuid column was added all do, before it is unique
+    """
+    db = schema_editor.connection.alias
+    for model_name in MODELS:
+        model = apps.get_model(APP_LABEL, model_name)
+        rows = model.objects.using(db)
+        duplicated = rows.values("uuid").annotate(count=Count("pk")).filter(count__gt=1).values("uuid")
+        seen = set()
+        for pk, value in rows.filter(uuid__in=duplicated).order_by("pk").values_list("pk", "uuid"):
+            if value not in seen:
+                seen.add(value)
+                continue
+            changes = {"uuid": uuid.uuid4()}
+            if any(field.name == "version" for field in model._meta.fields):
+                changes["version"] = F("version") + 1
+            rows.filter(pk=pk).update(**changes)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("administration", "0006_delete_customer"),
+    ]
+
+    operations = [
+        migrations.RunPython(reissue_duplicate_uuids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="business",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="employee",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="supplier",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
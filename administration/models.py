@@ -14,7 +14,7 @@ class Business(models.Model):
     Models Administration information related to business
     """
 
-    uuid = models.UUIDField(editable=False, db_index=True, default=uuid_lib.uuid4)
+    uuid = models.UUIDField(editable=False, unique=True, default=uuid_lib.uuid4)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     name = models.CharField(max_length=255)
@@ -33,7 +33,7 @@ class Employee(models.Model):
     Models Employees of business
     """
 
-    uuid = models.UUIDField(editable=False, db_index=True, default=uuid_lib.uuid4)
+    uuid = models.UUIDField(editable=False, unique=True, default=uuid_lib.uuid4)
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -48,7 +48,7 @@ class Supplier(models.Model):
     Supplier of products information
     """
 
-    uuid = models.UUIDField(editable=False, db_index=True, default=uuid_lib.uuid4)
+    uuid = models.UUIDField(editable=False, unique=True, default=uuid_lib.uuid4)
     products = models.ManyToManyField(
         "products.Product", related_name="suppliers", through="products.SupplierProduct"
     )
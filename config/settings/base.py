@@ -61,6 +61,12 @@ DATABASES = {
 #     }
 # }
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
+# Read replicas, as a comma separated list of database URLs. Report and
+# catalogue list reads are sent to them by pos_inventory.utils.db_router
+for index, url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[]), start=1):
+    DATABASES[f"replica{index}"] = dj_database_url.parse(url)
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["pos_inventory.utils.db_router.ReplicaRouter"]
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -82,6 +88,7 @@ DJANGO_APPS = [
     "django.contrib.staticfiles",
     # "django.contrib.humanize", # Handy template tags
     "django.contrib.admin",
+    "django.contrib.postgres",
     "django.forms",
 ]
 THIRD_PARTY_APPS = [
@@ -160,6 +167,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "pos_inventory.utils.db_router.PrimaryAfterWriteMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -309,6 +317,17 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-schedule
+CELERY_BEAT_SCHEDULE = {
+    "purge-idempotency-keys": {
+        "task": "sales.tasks.purge_idempotency_keys",
+        "schedule": 60 * 60,
+    },
+    "create-sales-partitions": {
+        "task": "sales.tasks.create_sales_partitions",
+        "schedule": 24 * 60 * 60,
+    },
+}
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#worker-send-task-events
 CELERY_WORKER_SEND_TASK_EVENTS = True
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#std-setting-task_send_sent_event
@@ -371,3 +390,31 @@ WEBPACK_LOADER = {
 }
 # Your stuff...
 # ------------------------------------------------------------------------------
+# Finished report jobs are handed out again for identical requests made within
+# this many seconds instead of generating the same report a second time
+REPORT_JOB_REUSE_SECONDS = env.int("REPORT_JOB_REUSE_SECONDS", default=300)
+# How often, at most, each worker's in process scan index reads the products
+# and stock changed since it last looked
+SCAN_INDEX_REFRESH_SECONDS = env.float("SCAN_INDEX_REFRESH_SECONDS", default=2.0)
+# Responses of the read-mostly catalogue endpoints are cached until a write to
+# a model they are built from, or for at most this many seconds
+RESPONSE_CACHE_SECONDS = env.int("RESPONSE_CACHE_SECONDS", default=600)
+# A write sent with an Idempotency-Key header is answered with its first
+# response when retried with the same key within this many hours
+IDEMPOTENCY_KEY_TTL_HOURS = env.int("IDEMPOTENCY_KEY_TTL_HOURS", default=24)
+# Most sales a terminal may upload in one batch of sales queued offline, and
+# the most bytes a compressed request body may expand to
+SALES_BATCH_MAX_SALES = env.int("SALES_BATCH_MAX_SALES", default=500)
+SALES_BATCH_MAX_BYTES = env.int("SALES_BATCH_MAX_BYTES", default=10 * 1024 * 1024)
+# GETs to the catalogue ViewSets run in autocommit instead of the read-write
+# request transaction of ATOMIC_REQUESTS, or with READ_ONLY_TRANSACTIONS in a
+# read-only snapshot on PostgreSQL, which costs one statement more
+READ_ONLY_REQUESTS = env.bool("READ_ONLY_REQUESTS", default=True)
+READ_ONLY_TRANSACTIONS = env.bool("READ_ONLY_TRANSACTIONS", default=False)
+# Reads of a user who has just written go to the primary for this many
+# seconds, a bound on how far the read replicas lag behind it
+REPLICA_STICKY_SECONDS = env.int("REPLICA_STICKY_SECONDS", default=5)
+# The sales tables are partitioned by month, partitions are created this many
+# months ahead, and the partitions of closed years are archived to this schema
+SALES_PARTITION_MONTHS_AHEAD = env.int("SALES_PARTITION_MONTHS_AHEAD", default=3)
+SALES_ARCHIVE_SCHEMA = env("SALES_ARCHIVE_SCHEMA", default="archive")
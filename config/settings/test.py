@@ -15,6 +15,29 @@ SECRET_KEY = env(
 # https://docs.djangoproject.com/en/dev/ref/settings/#test-runner
 TEST_RUNNER = "django.test.runner.DiscoverRunner"
 
+# DATABASES
+# ------------------------------------------------------------------------------
+# A second database on the PostgreSQL server standing in for a read replica.
+# Only the tests that route reads to it list it in REPLICA_DATABASES and their
+# databases, so other runs never create it
+if "postgresql" in DATABASES["default"].get("ENGINE", ""):  # noqa: F405
+    DATABASES["replica1"] = {  # noqa: F405
+        **DATABASES["default"],  # noqa: F405
+        "ATOMIC_REQUESTS": False,
+        "TEST": {"NAME": f"test_{DATABASES['default']['NAME']}_replica"},  # noqa: F405
+    }
+REPLICA_DATABASES = []
+
+# CACHES
+# ------------------------------------------------------------------------------
+# https://docs.djangoproject.com/en/dev/ref/settings/#caches
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "",
+    }
+}
+
 # PASSWORDS
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#password-hashers
@@ -0,0 +1,30 @@
+import pytest
+from django.core.cache import cache
+from django.db import connections
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # cached responses and their generations outlive each test's rolled back rows
+    cache.clear()
+
+
+def is_skipped(item):
+    return (
+        item.get_closest_marker("skip") is not None
+        or getattr(item.cls, "__unittest_skip__", False)
+        or getattr(item.obj, "__unittest_skip__", False)
+    )
+
+
+@pytest.fixture(scope="session")
+def django_db_modify_db_settings(django_db_modify_db_settings, request):
+    # the replica alias of the test settings only gets a test database when a
+    # collected test that is not skipped lists it in its databases
+    for item in request.session.items:
+        if is_skipped(item):
+            continue
+        databases = getattr(item.cls, "databases", ())
+        if databases == "__all__" or "replica1" in databases:
+            return
+    connections.settings.pop("replica1", None)
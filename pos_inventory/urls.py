@@ -1,13 +1,17 @@
 from sales.api.v1.viewsets import (
+    CashRegisterViewSet,
     SalesViewSet,
     ProductSalesViewset,
     CustomerViewset,
     PaymentModeViewSet,
-    PurchaseViewset
+    PurchaseViewset,
+    ReportJobViewSet,
 )
 from products.api.v1.viewsets import ProductViewSet, CategoryViewSet, StockViewSet
 from products.api.v1.viewsets import (
+    CatalogueViewSet,
     ProductViewSet,
+    ResponseCacheViewSet,
     CategoryViewSet,
     StockViewSet,
     SupplierViewSet,
@@ -22,6 +26,8 @@ router.register(r"sales", SalesViewSet, basename="sales")
 router.register(r"products", ProductViewSet, basename="products")
 router.register(r"categories", CategoryViewSet, basename="categories")
 router.register(r"stocks", StockViewSet, basename="stock")
+router.register(r"catalogue", CatalogueViewSet, basename="catalogue")
+router.register(r"cache", ResponseCacheViewSet, basename="cache")
 router.register(r"productsales", ProductSalesViewset, basename="productsales")
 router.register(r"business", BusinessViewset, basename="business")
 router.register(r"customers", CustomerViewset, basename="customers")
@@ -32,6 +38,8 @@ router.register(
 )
 router.register(r"paymentmodes", PaymentModeViewSet, basename="paymentmodes")
 router.register(r"purchases", PurchaseViewset, basename="purchases")
+router.register(r"reportjobs", ReportJobViewSet, basename="reportjobs")
+router.register(r"registers", CashRegisterViewSet, basename="registers")
 router.register(r"users", UserViewSet, basename="users")
 
 urlpatterns = router.urls
@@ -14,7 +14,7 @@ class User(AbstractUser):
 
     # First and last name do not cover name patterns around the globe
     name = CharField(_("Name of User"), blank=True, max_length=255)
-    uuid = UUIDField(editable=False, db_index=True, default=uuid_lib.uuid4)
+    uuid = UUIDField(editable=False, unique=True, default=uuid_lib.uuid4)
     first_name = CharField(_("Firts Name of User"), blank=True, max_length=255)  # type: ignore
     last_name = CharField(_("Last Name of User"), blank=True, max_length=255)  # type: ignore
 
@@ -0,0 +1,117 @@
+"""
+Validators for conditional GETs. ETags are computed from the state of the
+rows a serializer reads, once they are loaded, so a client already holding
+the current payload is answered with 304 before anything is serialized
+"""
+import hashlib
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from pos_inventory.utils.eager_loading import related_paths
+
+
+def has_updated_at(model):
+    return any(field.name == "updated_at" for field in model._meta.concrete_fields)
+
+
+def row_state(obj):
+    """
+    What changes whenever a row changes: its updated_at, else the version a
+    versioned model counts its writes with, else the values of its columns
+    """
+    model = type(obj)
+    if has_updated_at(model):
+        return obj.updated_at
+    if any(field.name == "version" for field in model._meta.concrete_fields):
+        return f"version={obj.version}"
+    return tuple(getattr(obj, field.attname) for field in model._meta.concrete_fields)
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()
+
+
+def related_objects(instance, path):
+    """
+    The objects reached from instance through a select or prefetch lookup,
+    read from the instances loaded with it
+    """
+    objects = [instance]
+    for name in path.split("__"):
+        reached = []
+        for obj in objects:
+            try:
+                value = getattr(obj, name)
+            except ObjectDoesNotExist:
+                continue
+            if value is None:
+                continue
+            if hasattr(value, "all"):
+                reached.extend(value.all())
+            else:
+                reached.append(value)
+        objects = reached
+    return objects
+
+
+def validators(instances, serializer_class, *parts):
+    """
+    Strong ETag and Last-Modified for instances as serializer_class renders
+    them, from the state of each instance and of the related rows it nests,
+    all read from the objects already loaded. parts go into the ETag too.
+    There is no Last-Modified when any of the rows has no updated_at
+    """
+    select, prefetch = related_paths(serializer_class())
+    stamps = list(parts)
+    modified = []
+    for instance in instances:
+        rows = [("", instance)]
+        rows.extend((path, obj) for path in select + prefetch for obj in related_objects(instance, path))
+        for path, obj in rows:
+            stamps.append((path, obj.pk, row_state(obj)))
+            modified.append(obj.updated_at if has_updated_at(type(obj)) else None)
+    last_modified = None
+    if modified and None not in modified:
+        last_modified = max(modified)
+    return make_etag(*stamps), last_modified
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """
+    Return a 304 response when the request's If-None-Match or
+    If-Modified-Since says the client already holds this representation
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def headers_not_modified(request, headers):
+    """
+    not_modified for a response already rendered with validator headers
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    last_modified = headers.get("Last-Modified")
+    return get_conditional_response(
+        request,
+        etag=headers.get("ETag"),
+        last_modified=parse_http_date_safe(last_modified) if last_modified else None,
+    )
+
+
+def set_validators(response, etag=None, last_modified=None):
+    if etag:
+        response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+VALIDATOR_HEADERS = ("ETag", "Last-Modified")
@@ -0,0 +1,103 @@
+"""
+Read replica routing. Reads made inside read_from_replica(), which the report
+and catalogue list endpoints use, go to one of REPLICA_DATABASES while every
+other query stays on the primary. A user who has just written is pinned to
+the primary for REPLICA_STICKY_SECONDS so they always read their own writes
+"""
+import functools
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# the replica the reads of the current block go to, if any
+replica_alias = ContextVar("replica_alias", default=None)
+
+
+def pin_key(user):
+    return f"replica:pinned:{user.pk}"
+
+
+def pin_to_primary(user):
+    """
+    Send the reads of user to the primary until the replicas have caught up
+    with what they just wrote
+    """
+    cache.set(pin_key(user), True, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+def pinned_to_primary(user):
+    return bool(user and user.is_authenticated and cache.get(pin_key(user)))
+
+
+@contextmanager
+def read_from_replica():
+    """
+    Route the reads made in the block to one replica, picked at random, so
+    the queries of a response all see the same point in time
+    """
+    replicas = settings.REPLICA_DATABASES
+    token = replica_alias.set(random.choice(replicas) if replicas else None)
+    try:
+        yield
+    finally:
+        replica_alias.reset(token)
+
+
+def replica_view(view_method):
+    """
+    Run a ViewSet action's reads on a replica unless its user is pinned to
+    the primary after a write
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if pinned_to_primary(request.user):
+            return view_method(self, request, *args, **kwargs)
+        with read_from_replica():
+            return view_method(self, request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica picked by read_from_replica() and writes to
+    the primary. Other reads are left to Django, which reads related rows from
+    the database their instance came from and everything else from the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        return replica_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+
+class PrimaryAfterWriteMiddleware:
+    """
+    Pin the user of every successful write to the primary, so the responses
+    they read next do not come from a replica that has yet to replay it
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, "user", None)
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and user is not None
+            and user.is_authenticated
+        ):
+            pin_to_primary(user)
+        return response
@@ -0,0 +1,54 @@
+"""
+Eager loading of the relations a serializer is going to read
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def related_paths(serializer, prefix="", prefetched=False):
+    """
+    Return the select_related and prefetch_related lookups covering every
+    relation a serializer and the serializers nested in it read. Relations
+    under a prefetched one are prefetched too, as a join cannot reach them
+    """
+    select, prefetch = [], []
+    model = serializer.Meta.model
+    for field in serializer.fields.values():
+        if field.write_only or field.source == "*" or "." in field.source:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+
+        path = prefix + field.source
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.append(path)
+            child_select, child_prefetch = related_paths(field.child, f"{path}__", True)
+        elif isinstance(field, serializers.BaseSerializer):
+            (prefetch if prefetched else select).append(path)
+            child_select, child_prefetch = related_paths(field, f"{path}__", prefetched)
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch.append(path)
+            continue
+        else:
+            # a primary key or hyperlink to a forward relation is read from
+            # the row itself and needs no extra query
+            continue
+        select.extend(child_select)
+        prefetch.extend(child_prefetch)
+    return select, prefetch
+
+
+def eager_load(queryset, serializer_class):
+    """
+    Join or prefetch the relations serializer_class reads from each object of queryset
+    """
+    select, prefetch = related_paths(serializer_class())
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
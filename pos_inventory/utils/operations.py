@@ -0,0 +1,68 @@
+"""
+Migration operations for database features only some servers provide
+"""
+from django.contrib.postgres.operations import CreateExtension
+from django.db import migrations
+
+
+def extension_available(schema_editor, name):
+    """Whether a Postgres server ships an extension"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = %s", [name])
+        return cursor.fetchone() is not None
+
+
+def extension_installed(schema_editor, name):
+    """Whether an extension is installed in the current Postgres database"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = %s", [name])
+        return cursor.fetchone() is not None
+
+
+class CreateExtensionIfAvailable(CreateExtension):
+    """
+    Install a Postgres extension when the server ships it, leaving servers
+    without it to the code paths that do not need it
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        if extension_available(schema_editor, self.name):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+
+class AddPostgresIndex(migrations.AddIndex):
+    """
+    Add an index only Postgres can build, optionally needing an extension.
+    Other databases, and servers without the extension, skip it. The index
+    is kept out of the migration state and must not be declared in the
+    model's Meta, or the table rebuilds SQLite does on later migrations
+    would recreate it there
+    """
+
+    def __init__(self, model_name, index, extension=None):
+        super().__init__(model_name, index)
+        self.extension = extension
+
+    def deconstruct(self):
+        name, args, kwargs = super().deconstruct()
+        if self.extension:
+            kwargs["extension"] = self.extension
+        return name, args, kwargs
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def applies_to(self, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return False
+        return self.extension is None or extension_installed(schema_editor, self.extension)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if self.applies_to(schema_editor):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if self.applies_to(schema_editor):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
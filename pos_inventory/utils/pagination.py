@@ -0,0 +1,72 @@
+"""
+Pagination and conditional GETs for the plain ViewSets used across the API
+"""
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from pos_inventory.utils.conditional import not_modified, set_validators, validators
+from pos_inventory.utils.eager_loading import eager_load
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination over created_at with the primary key breaking ties, so
+    a deep page costs an index range scan instead of an OFFSET over every
+    row before it
+    """
+
+    ordering = ("created_at", "pk")
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+
+class PaginatedViewSetMixin:
+    """
+    Gives a plain ViewSet the pagination a GenericViewSet would apply to its
+    lists, and ETags on the lists and objects it returns
+    """
+
+    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            self._paginator = self.pagination_class()
+        return self._paginator
+
+    def paginated_response(self, queryset, serializer_class=None, **serializer_kwargs):
+        """
+        Serialize one page of a queryset and wrap it with the paging links. The
+        relations the serializer reads are loaded with the page, and rows of a
+        values() queryset are returned as they are without a serializer.
+        The ETag covers the rows of the page, the request's query and the
+        paging links, and lists carry no Last-Modified, as a deleted row
+        leaves it unchanged
+        """
+        if not getattr(queryset, "ordered", True):
+            # offset pages are only stable over a fixed order
+            queryset = queryset.order_by("pk")
+        if serializer_class is None:
+            page = self.paginator.paginate_queryset(queryset, self.request, view=self)
+            return self.paginator.get_paginated_response(page)
+
+        page = self.paginator.paginate_queryset(eager_load(queryset, serializer_class), self.request, view=self)
+        links = self.paginator.get_paginated_response([]).data
+        links.pop("results")
+        etag, _ = validators(page, serializer_class, self.request.get_full_path(), sorted(links.items()))
+        response = not_modified(self.request, etag)
+        if response is not None:
+            return response
+        data = serializer_class(page, many=True, **serializer_kwargs).data
+        return set_validators(self.paginator.get_paginated_response(data), etag)
+
+    def object_response(self, instance, serializer_class):
+        """
+        Serialize a single object, or answer 304 when the client already holds it
+        """
+        etag, last_modified = validators([instance], serializer_class)
+        response = not_modified(self.request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(Response(serializer_class(instance).data), etag, last_modified)
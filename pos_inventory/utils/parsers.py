@@ -0,0 +1,41 @@
+"""
+Parsers for request bodies terminals compress before sending them
+"""
+import zlib
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+# Content-Encoding to the zlib window bits that decode it
+CONTENT_ENCODINGS = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+
+class CompressedJSONParser(JSONParser):
+    """
+    JSON parser that also accepts a body sent with a gzip or deflate
+    Content-Encoding. The body is inflated up to SALES_BATCH_MAX_BYTES, so a
+    small request cannot expand into an unbounded one
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get("request")
+        encoding = request.META.get("HTTP_CONTENT_ENCODING", "") if request else ""
+        encoding = encoding.strip().lower()
+        if encoding and encoding != "identity":
+            if encoding not in CONTENT_ENCODINGS:
+                raise ParseError(f"Unsupported Content-Encoding {encoding!r}")
+            stream = BytesIO(self.decompress(stream.read(), CONTENT_ENCODINGS[encoding]))
+        return super().parse(stream, media_type, parser_context)
+
+    def decompress(self, body, wbits):
+        limit = settings.SALES_BATCH_MAX_BYTES
+        decompressor = zlib.decompressobj(wbits)
+        try:
+            content = decompressor.decompress(body, limit)
+        except zlib.error as error:
+            raise ParseError(f"Malformed compressed body - {error}") from None
+        if decompressor.unconsumed_tail:
+            raise ParseError(f"The body expands to more than {limit} bytes")
+        return content
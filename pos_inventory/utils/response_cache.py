@@ -0,0 +1,148 @@
+"""
+Versioned cache for the responses of read-mostly endpoints. A response is
+stored under its endpoint, query and the generation of every model it is
+built from; a write to one of those models bumps its generation, so the
+stale entries are never read again and simply expire
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from pos_inventory.utils.conditional import VALIDATOR_HEADERS, headers_not_modified
+from pos_inventory.utils.db_router import replica_alias
+
+# endpoint name to the models its responses are built from
+CACHED_ENDPOINTS = {}
+
+
+def generation_key(model):
+    return f"response_cache:generation:{model._meta.label_lower}"
+
+
+def recent_write_key(model):
+    return f"response_cache:recent_write:{model._meta.label_lower}"
+
+
+def replica_may_lag(models):
+    """
+    Whether the current reads come from a replica that may not have replayed
+    a recent write to one of models yet
+    """
+    if replica_alias.get() is None:
+        return False
+    return bool(cache.get_many([recent_write_key(model) for model in models]))
+
+
+def stats_key(endpoint, outcome):
+    return f"response_cache:{outcome}:{endpoint}"
+
+
+def count(key):
+    """
+    Increment a counter kept in the cache, creating it on first use
+    """
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # evicted between the add and the incr
+            cache.add(key, 1, timeout=None)
+
+
+def bump_generation(model):
+    """
+    Invalidate every cached response built from model. The generation is bumped
+    now so this transaction's own reads miss, and again on commit so nothing
+    cached from the old rows while it was open outlives it
+    """
+    key = generation_key(model)
+    count(key)
+
+    def committed():
+        count(key)
+        # replicas may not have replayed the write yet, see cached_response
+        cache.set(recent_write_key(model), True, timeout=settings.REPLICA_STICKY_SECONDS)
+
+    transaction.on_commit(committed)
+
+
+def response_key(endpoint, request, models):
+    generations = cache.get_many([generation_key(model) for model in models])
+    parts = [
+        endpoint,
+        request.get_host(),
+        request.path,
+        *(f"{name}={','.join(sorted(values))}" for name, values in sorted(request.query_params.lists())),
+        *(f"{model._meta.label_lower}@{generations.get(generation_key(model), 0)}" for model in models),
+    ]
+    digest = hashlib.sha256("\n".join(parts).encode()).hexdigest()
+    return f"response_cache:response:{digest}"
+
+
+def cached_response(*models):
+    """
+    Cache the successful responses of a ViewSet action until one of models
+    is written to, or RESPONSE_CACHE_SECONDS pass
+    """
+
+    def decorator(view_method):
+        endpoint = view_method.__qualname__
+        CACHED_ENDPOINTS[endpoint] = models
+
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = response_key(endpoint, request, models)
+            cached = cache.get(key)
+            if cached is not None:
+                count(stats_key(endpoint, "hits"))
+                data, headers = cached
+                response = headers_not_modified(request, headers)
+                if response is not None:
+                    return response
+                return Response(data, headers=headers)
+            count(stats_key(endpoint, "misses"))
+            response = view_method(self, request, *args, **kwargs)
+            # a response read from a lagging replica would outlive the write
+            # that bumped the generation, so it is served but not stored
+            if response.status_code == 200 and not replica_may_lag(models):
+                headers = {name: response[name] for name in VALIDATOR_HEADERS if response.has_header(name)}
+                cache.set(key, (response.data, headers), timeout=settings.RESPONSE_CACHE_SECONDS)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def cache_stats():
+    """
+    Hits, misses and hit rate of each cached endpoint and of all of them together
+    """
+
+    def summary(hits, misses):
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+        }
+
+    counters = cache.get_many(
+        [stats_key(endpoint, outcome) for endpoint in CACHED_ENDPOINTS for outcome in ("hits", "misses")]
+    )
+    endpoints = {
+        endpoint: summary(
+            counters.get(stats_key(endpoint, "hits"), 0),
+            counters.get(stats_key(endpoint, "misses"), 0),
+        )
+        for endpoint in CACHED_ENDPOINTS
+    }
+    total = summary(
+        sum(stats["hits"] for stats in endpoints.values()),
+        sum(stats["misses"] for stats in endpoints.values()),
+    )
+    return {**total, "endpoints": endpoints}
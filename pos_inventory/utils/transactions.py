@@ -0,0 +1,63 @@
+"""
+Transactions for ViewSets that mostly serve reads. ATOMIC_REQUESTS would wrap
+every request in a read-write transaction, these ViewSets keep that for
+writes and run safe requests without one, saving the BEGIN and COMMIT round
+trips and never leaving the connection idle in a transaction while a
+response is serialized
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rest_framework.permissions import SAFE_METHODS
+
+
+@contextmanager
+def read_only_transaction(using=DEFAULT_DB_ALIAS):
+    """
+    Run the block in a read-only REPEATABLE READ transaction on PostgreSQL,
+    so every query in it sees the same snapshot and a write fails instead of
+    committing. Inside an open transaction, or on another backend, the block
+    runs as it is
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql" or connection.in_atomic_block:
+        yield
+        return
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        yield
+
+
+@contextmanager
+def request_transaction(method):
+    """
+    The transaction a request with the given HTTP method runs in under
+    ReadOnlyRequestsMixin
+    """
+    if method not in SAFE_METHODS or not settings.READ_ONLY_REQUESTS:
+        with transaction.atomic():
+            yield
+    elif settings.READ_ONLY_TRANSACTIONS:
+        with read_only_transaction():
+            yield
+    else:
+        yield
+
+
+class ReadOnlyRequestsMixin:
+    """
+    Opt a ViewSet out of ATOMIC_REQUESTS. Writes still run in a transaction
+    that DRF rolls back on errors, while GET, HEAD and OPTIONS requests run
+    in autocommit, or in a read-only snapshot with READ_ONLY_TRANSACTIONS
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        return transaction.non_atomic_requests(view)
+
+    def dispatch(self, request, *args, **kwargs):
+        with request_transaction(request.method):
+            return super().dispatch(request, *args, **kwargs)
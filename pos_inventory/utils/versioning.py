@@ -0,0 +1,150 @@
+"""
+Optimistic concurrency for rows edited from more than one place. A versioned
+row is saved with UPDATE ... WHERE version = n that writes only the fields
+changed since it was read, so a stale copy is refused instead of silently
+overwriting a newer one
+"""
+import copy
+import functools
+
+from django.db import models, transaction
+from django.db.models import F
+from rest_framework.response import Response
+
+
+class VersionConflict(Exception):
+    """
+    Raised when a versioned row was changed by someone else since it was read
+    """
+
+    def __init__(self, instance, version=None):
+        self.instance = instance
+        self.version = instance.version if version is None else version
+        super().__init__(
+            f"{instance._meta.verbose_name} {instance.pk} was changed since version {self.version} was read"
+        )
+
+    def current_version(self):
+        instance = self.instance
+        return type(instance)._base_manager.filter(pk=instance.pk).values_list("version", flat=True).first()
+
+
+class VersionedModel(models.Model):
+    """
+    Base for models saved with a version check. Bulk UPDATEs of these models
+    must bump version themselves, with version=F("version") + 1. A conflict
+    marks the surrounding transaction for rollback, so a caller that goes on
+    after one saves inside transaction.atomic() or uses retry_on_conflict
+    """
+
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance.field_values()
+        return instance
+
+    def field_values(self, fields=None):
+        """
+        Copy of the current value of each loaded concrete field, or of the
+        named ones, so a JSON value changed in place still shows as changed
+        """
+        deferred = self.get_deferred_fields()
+        if fields is not None:
+            fields = {self._meta.get_field(name).attname for name in fields}
+        return {
+            field.attname: copy.deepcopy(getattr(self, field.attname))
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred and (fields is None or field.attname in fields)
+        }
+
+    def changed_fields(self):
+        """
+        Names of the fields that differ from the values last read or saved
+        """
+        loaded = self._loaded_values
+        return [
+            field.name
+            for field in self._meta.concrete_fields
+            if field.attname in loaded and getattr(self, field.attname) != loaded[field.attname]
+        ]
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        if hasattr(self, "_loaded_values"):
+            self._loaded_values.update(self.field_values(fields))
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and hasattr(self, "_loaded_values")
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            changed = [name for name in self.changed_fields() if name != "version"]
+            if not changed:
+                return
+            auto_now = [field.name for field in self._meta.concrete_fields if getattr(field, "auto_now", False)]
+            kwargs["update_fields"] = set(changed + auto_now)
+        super().save(*args, **kwargs)
+        self._loaded_values = self.field_values()
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if self._state.adding:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        version = self._meta.get_field("version")
+        values = [value for value in values if value[0] is not version]
+        values.append((version, None, F("version") + 1))
+        updated = super()._do_update(
+            base_qs.filter(version=self.version),
+            using,
+            pk_val,
+            values,
+            update_fields,
+            forced_update,
+        )
+        if not updated:
+            if base_qs.filter(pk=pk_val).exists():
+                raise VersionConflict(self)
+            return False
+        self.version += 1
+        return True
+
+
+def retry_on_conflict(func, *args, attempts=3, **kwargs):
+    """
+    Call func until it gets through without a VersionConflict, at most
+    attempts times. Each attempt runs in its own savepoint and func must read
+    the rows it changes afresh every time it is called
+    """
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        except VersionConflict:
+            if attempt == attempts - 1:
+                raise
+
+
+def reports_conflicts(view_method):
+    """
+    Answer a ViewSet write that hit a VersionConflict with 409 and the row's
+    current version, undoing whatever it had written
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        try:
+            with transaction.atomic():
+                return view_method(self, request, *args, **kwargs)
+        except VersionConflict as conflict:
+            return Response(
+                {"message": str(conflict), "version": conflict.current_version()},
+                status=409,
+            )
+
+    return wrapper
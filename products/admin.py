@@ -1,8 +1,17 @@
 from django.contrib import admin
 
-from .models import Category, Product, SupplierProduct, Stock
+from .models import (
+    CatalogueTombstone,
+    Category,
+    Product,
+    Stock,
+    StockMovement,
+    SupplierProduct,
+)
 # Register your models here.
 admin.site.register(Category)
 admin.site.register(Product)
 admin.site.register(SupplierProduct)
 admin.site.register(Stock)
+admin.site.register(StockMovement)
+admin.site.register(CatalogueTombstone)
@@ -5,7 +5,8 @@ from typing import Any
 from rest_framework import serializers
 
 from administration.models import Supplier
-from products.models import Category, Product, Stock, SupplierProduct
+from pos_inventory.utils.versioning import VersionConflict
+from products.models import Category, Product, Stock, StockMovement, SupplierProduct
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -13,9 +14,23 @@ class CategorySerializer(serializers.ModelSerializer):
     Serializer for Category model
     """
 
+    thumbnails = serializers.SerializerMethodField()
+
     class Meta:
         model = Category
-        fields = ["name", "uuid", "image", "thumbnail", "created_at", "updated_at"]
+        fields = [
+            "name",
+            "uuid",
+            "image",
+            "thumbnail",
+            "thumbnails",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = ["thumbnail"]
+
+    def get_thumbnails(self, obj) -> dict:
+        return obj.thumbnail_urls()
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -51,6 +66,14 @@ class StockSerializer(serializers.ModelSerializer):
 
     # Use the ProductSerializer as a nested serializer for the product_id field
     product_id = ProductSerializer(read_only=True)
+    # a movement is recorded in the StockMovement ledger, not on the stock row
+    stock_movement_type = serializers.CharField(write_only=True, required=False)
+    stock_movement_quantity = serializers.DecimalField(
+        max_digits=10, decimal_places=2, write_only=True, required=False
+    )
+    stock_movement_remarks = serializers.CharField(
+        write_only=True, required=False, allow_blank=True, allow_null=True
+    )
 
     class Meta:
         model = Stock
@@ -65,6 +88,7 @@ class StockSerializer(serializers.ModelSerializer):
             "price_per_unit_wholesale",
             "reorder_level",
             "reorder_quantity",
+            "version",
             "stock_movement_type",
             "stock_movement_quantity",
             "stock_movement_remarks",
@@ -92,15 +116,38 @@ class StockSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Invalid stock movement type")
         return value
 
+    def create(self, validated_data):
+        """
+        create a stock and record its opening movement in the ledger
+        """
+        stock_movement_type = validated_data.pop("stock_movement_type", None)
+        stock_movement_quantity = validated_data.pop("stock_movement_quantity", None)
+        stock_movement_remarks = validated_data.pop("stock_movement_remarks", None)
+        stock = super().create(validated_data)
+        if stock_movement_type and stock_movement_quantity is not None:
+            StockMovement.objects.create(
+                product_id=stock.pk,
+                movement_type=stock_movement_type,
+                quantity=stock_movement_quantity,
+                remarks=stock_movement_remarks,
+            )
+        return stock
+
     def update(self, instance, validated_data):
         """
         update stock quantities accordingly
         """
-        instance.update_stock_quantity(
-            validated_data.get("stock_movement_type"),
-            validated_data.get("stock_movement_quantity"),
-            validated_data.get("stock_movement_remarks"),
-        )
+        stock_movement_type = validated_data.pop("stock_movement_type", None)
+        stock_movement_quantity = validated_data.pop("stock_movement_quantity", None)
+        stock_movement_remarks = validated_data.pop("stock_movement_remarks", None)
+        # the version the client read, checked before the movement bumps it
+        version = validated_data.pop("version", None)
+        if version is not None and version != instance.version:
+            raise VersionConflict(instance, version)
+        if stock_movement_type and stock_movement_quantity is not None:
+            instance.update_stock_quantity(
+                stock_movement_type, stock_movement_quantity, stock_movement_remarks
+            )
 
         return super().update(instance, validated_data)
 
@@ -3,18 +3,33 @@ Module illustrating the viewsets for product API's
 """
 from datetime import datetime
 from administration.models import Supplier
-from django.shortcuts import get_object_or_404, get_list_or_404
-from django.db.models import Q
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
 
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 
+from pos_inventory.utils.db_router import replica_view
+from pos_inventory.utils.eager_loading import eager_load
+from pos_inventory.utils.pagination import (
+    CreatedAtCursorPagination,
+    PaginatedViewSetMixin,
+)
+from pos_inventory.utils.response_cache import cache_stats, cached_response
+from pos_inventory.utils.exports import EXPORT_PARAMETERS, export_options, stream_export
+from pos_inventory.utils.transactions import ReadOnlyRequestsMixin
+from pos_inventory.utils.versioning import reports_conflicts
 from products.models import Product, Category, Stock, SupplierProduct
+from products.scan import scan_index
+from products.sync import catalogue_changes
+from products.search import search_categories, search_limit, search_products
+from products.reports import stock_movement_report
 from sales.models import Sales
 from .serializers import (
     ProductSerializer,
@@ -27,7 +42,7 @@ from .serializers import (
 from .permissions import CategoryAccessPolicy
 
 
-class CategoryViewSet(ViewSet):
+class CategoryViewSet(ReadOnlyRequestsMixin, PaginatedViewSetMixin, ViewSet):
     """Basic viewset for Category Related Items"""
 
     permission_classes = (CategoryAccessPolicy,)
@@ -38,10 +53,11 @@ class CategoryViewSet(ViewSet):
     def queryset(self):
         return Category.objects.all()
 
+    @replica_view
+    @cached_response(Category)
     def list(self, request, *args, **kwargs):
         """Return a list of all categories"""
-        serializer = CategorySerializer(self.queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.queryset, CategorySerializer)
 
     @extend_schema(
         parameters=[
@@ -60,8 +76,7 @@ class CategoryViewSet(ViewSet):
     def retrieve(self, request, uuid=None):
         """Return a single category"""
         category = get_object_or_404(self.queryset, uuid=uuid)
-        serializer = CategorySerializer(category)
-        return Response(serializer.data)
+        return self.object_response(category, CategorySerializer)
 
     def create(self, request, *args, **kwargs):
         """Create a new category"""
@@ -139,11 +154,12 @@ class CategoryViewSet(ViewSet):
 
     @action(detail=False, methods=["POST"])
     def search(self, request, *args, **kwargs):
+        """
+        Returns the categories best matching the query, most relevant first
+        """
         query = request.data.get("query", "")
         if query:
-            categories = Category.objects.filter(
-                Q(name__icontains=query) | Q(uuid__icontains=query)
-            )
+            categories = search_categories(query, search_limit(request.data.get("limit")))
             serializer = CategorySerializer(categories, many=True)
             return Response(serializer.data)
         return Response({"categories": []})
@@ -164,15 +180,14 @@ class CategoryViewSet(ViewSet):
         },
     )
     @action(detail=True, methods=["GET"])
+    @cached_response(Category, Product)
     def list_all_products(self, request, uuid=None):
         """List all products in a category"""
         category = get_object_or_404(self.queryset, uuid=uuid)
-        products = category.products.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(category.products.all(), ProductSerializer)
 
 
-class ProductViewSet(ViewSet):
+class ProductViewSet(ReadOnlyRequestsMixin, PaginatedViewSetMixin, ViewSet):
     """Basic viewset for Product Related Items"""
 
     serializer_class = ProductSerializer
@@ -186,10 +201,11 @@ class ProductViewSet(ViewSet):
     def category_queryset(self):
         return Category.objects.all()
 
+    @replica_view
+    @cached_response(Category, Product)
     def list(self, request, *args, **kwargs):
         """Return a list of all products"""
-        serializer = ProductSerializer(self.product_queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.product_queryset, ProductSerializer)
 
     @extend_schema(
         parameters=[
@@ -202,11 +218,13 @@ class ProductViewSet(ViewSet):
             )
         ],
     )
+    @cached_response(Category, Product)
     def retrieve(self, request, uuid=None):
         """Return a single product"""
-        product = get_object_or_404(self.product_queryset, uuid=uuid)
-        serializer = ProductSerializer(product)
-        return Response(serializer.data)
+        product = get_object_or_404(
+            eager_load(self.product_queryset, ProductSerializer), uuid=uuid
+        )
+        return self.object_response(product, ProductSerializer)
 
     def create(self, request, *args, **kwargs):
         """Create a new product"""
@@ -293,19 +311,32 @@ class ProductViewSet(ViewSet):
     def list_suppliers(self, request, uuid=None):
         """List all suppliers of a product"""
         product = get_object_or_404(self.product_queryset, uuid=uuid)
-        product_suppliers = product.supplierproduct_set.all()
-        suppliers = []
-        for product_supplier in product_suppliers:
-            supplier = {
-                "uuid": product_supplier.supplier.uuid,
-                "name": product_supplier.supplier.name,
-                "address": product_supplier.supplier.address,
-                "email_address": product_supplier.supplier.email_address,
-                "phone_number": product_supplier.supplier.phone_number,
-            }
-            if supplier not in suppliers:
-                suppliers.append(supplier)
-        return Response(suppliers)
+        suppliers = product.suppliers.distinct().values(
+            "uuid", "name", "address", "email_address", "phone_number"
+        )
+        return self.paginated_response(suppliers)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="code",
+                description="The scanned or typed product code.",
+                required=True,
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+            )
+        ],
+    )
+    @action(detail=False, methods=["GET"])
+    def scan(self, request, *args, **kwargs):
+        """
+        Returns the product, stock, price and tax for an exact product code
+        """
+        code = request.query_params.get("code", "")
+        entry = scan_index.lookup(code) if code else None
+        if entry is None:
+            return Response({"message": "No product with this code"}, status=404)
+        return Response(entry)
 
     @action(detail=False, methods=["POST"])
     def search(self, request, *args, **kwargs):
@@ -314,21 +345,35 @@ class ProductViewSet(ViewSet):
         """
         query = request.data.get("query", "")
         if query:
-            products = Product.objects.filter(
-                Q(name__icontains=query)
-                | Q(description__icontains=query)
-                | Q(code__icontains=query)
+            products = search_products(
+                query,
+                search_limit(request.data.get("limit")),
+                eager_load(self.product_queryset, ProductSerializer),
             )
             serializer = ProductSerializer(products, many=True)
             return Response(serializer.data)
         return Response({"products": []})
 
 
-class StockViewSet(ViewSet):
+class StockViewSet(ReadOnlyRequestsMixin, PaginatedViewSetMixin, ViewSet):
     """ViewSet for Stock  Items"""
 
     serializer_class = StockSerializer
+    pagination_class = CreatedAtCursorPagination
     lookup_field = "uuid"
+    export_columns = {
+        "uuid": "uuid",
+        "product": "product_id__uuid",
+        "product_code": "product_id__code",
+        "product_name": "product_id__name",
+        "stock_quantity": "stock_quantity",
+        "cost_per_unit": "cost_per_unit",
+        "price_per_unit_retail": "price_per_unit_retail",
+        "price_per_unit_wholesale": "price_per_unit_wholesale",
+        "reorder_level": "reorder_level",
+        "reorder_quantity": "reorder_quantity",
+        "updated_at": "updated_at",
+    }
 
     @property
     def stock_queryset(self):
@@ -338,10 +383,10 @@ class StockViewSet(ViewSet):
     def product_queryset(self):
         return Product.objects.all()
 
+    @replica_view
     def list(self, request, *args, **kwargs):
         """Return a list of all stock"""
-        serializer = StockSerializer(self.stock_queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.stock_queryset, StockSerializer)
 
     @extend_schema(
         parameters=[
@@ -356,9 +401,10 @@ class StockViewSet(ViewSet):
     )
     def retrieve(self, request, uuid=None):
         """Return a single stock"""
-        stock = get_object_or_404(self.stock_queryset, uuid=uuid)
-        serializer = StockSerializer(stock)
-        return Response(serializer.data)
+        stock = get_object_or_404(
+            eager_load(self.stock_queryset, StockSerializer), uuid=uuid
+        )
+        return self.object_response(stock, StockSerializer)
 
     def create(self, request, *args, **kwargs):
         """Create a new stock"""
@@ -384,6 +430,7 @@ class StockViewSet(ViewSet):
             )
         ],
     )
+    @reports_conflicts
     def update(self, request, uuid=None):
         """Update an existing stock"""
         stock = get_object_or_404(self.stock_queryset, uuid=uuid)
@@ -404,6 +451,7 @@ class StockViewSet(ViewSet):
             )
         ],
     )
+    @reports_conflicts
     def partial_update(self, request, uuid=None):
         """Update an existing stock"""
         stock = get_object_or_404(self.stock_queryset, uuid=uuid)
@@ -442,25 +490,22 @@ class StockViewSet(ViewSet):
         ],
     )
     @action(detail=True, methods=["POST"])
+    @reports_conflicts
     def stock_movement(self, request, uuid=None):
         """Method that updates stock according to the typr of movement"""
         stock = get_object_or_404(self.stock_queryset, uuid=uuid)
 
-        stock_movement_type = request.data.get("stock_movement_type")
-        stock_movement_quantity = request.data.get("stock_movement_quantity")
-        stock_movement_remarks = request.data.get("stock_movement_remarks")
-        print(request.data)
-        if stock_movement_type:
-            stock.update_stock_quantity(
-                stock_movement_type, stock_movement_quantity, stock_movement_remarks
-            )
-            serializer = StockSerializer(stock, data=request.data, partial=True)
-            if serializer.is_valid():
-                serializer.save()
+        if not request.data.get("stock_movement_type"):
+            return Response({"error": "No stock movement type given"}, status=400)
+        # the serializer applies the movement and records it in the ledger
+        serializer = StockSerializer(stock, data=request.data, partial=True)
+        if serializer.is_valid():
+            serializer.save()
             return Response(serializer.data)
-        return Response({"error": "No stock movement type given"}, status=400)
+        return Response(serializer.errors, status=400)
 
     @action(detail=False, methods=["POST"])
+    @replica_view
     def generate_stock_movement_report(self, request, pk=None):
         """
         Generate stock movement report for a given date range
@@ -477,62 +522,57 @@ class StockViewSet(ViewSet):
                 status=400,
             )
 
-        # Filter stock items based on the date range
-        stocks = Stock.objects.filter(updated_at__date__range=[start_date, end_date])
+        product = None
+        product_uuid = data.get("product", None)
+        if product_uuid:
+            product = get_object_or_404(self.product_queryset, uuid=product_uuid)
 
-        if not stocks:
+        report = stock_movement_report(start_date, end_date, product)
+        if report is None:
             return Response(
                 {"message": "No stock movement found for the given date range"},
                 status=400,
             )
 
-        report = {
-            "start_date": start_date,
-            "end_date": end_date,
-            "stock_movement": [],
-        }
-
-        for stock in stocks:
-            stock_movement = {
-                "stock_id": stock.uuid,
-                "product_name": stock.product_id.name,
-                "stock_quantity": stock.stock_quantity,
-                "stock_updated_at": stock.updated_at,
-                "cost_per_unit": stock.cost_per_unit,
-                "price_per_unit_retail": stock.price_per_unit_retail,
-                "price_per_unit_wholesale": stock.price_per_unit_wholesale,
-                "reorder_level": stock.reorder_level,
-                "reorder_quantity": stock.reorder_quantity,
-                "stock_movement_type": stock.stock_movement_type,
-                "stock_movement_quantity": stock.stock_movement_quantity,
-                "stock_movement_remarks": stock.stock_movement_remarks,
-            }
-            report["stock_movement"].append(stock_movement)
-
         return Response(
             {"stock_movement_report": report},
             status=200,
         )
 
+    @extend_schema(parameters=EXPORT_PARAMETERS[:1])
+    @action(detail=False, methods=["GET"])
+    def export(self, request, *args, **kwargs):
+        """
+        Stream the stock level of every product as CSV or newline delimited JSON
+        """
+        try:
+            export_format, _, _ = export_options(request.query_params)
+        except ValueError as error:
+            return Response({"message": str(error)}, status=400)
+        stock = Stock.objects.order_by("pk")
+        return stream_export(stock, self.export_columns, export_format, "stock")
+
     @action(detail=False, methods=["POST"])
     def search(self, request, *args, **kwargs):
         """
         Returns stock information for product name, description or code  in query
         """
         query = request.data.get("query", "")
-        product = Product.objects.filter(
-            Q(name__icontains=query)
-            | Q(description__icontains=query)
-            | Q(code__icontains=query)
-        ).first()
         if query:
-            stock = Stock.objects.get(pk=product.id)
-            serializer = StockSerializer(stock)
-            return Response(serializer.data)
+            # the best matching product that is stocked
+            product = search_products(
+                query, 1, self.product_queryset.filter(stock__isnull=False)
+            ).first()
+            if product is not None:
+                stock = get_object_or_404(
+                    eager_load(self.stock_queryset, StockSerializer), pk=product.pk
+                )
+                serializer = StockSerializer(stock)
+                return Response(serializer.data)
         return Response({"stocks": []})
 
 
-class SupplierProductViewSet(ViewSet):
+class SupplierProductViewSet(ReadOnlyRequestsMixin, PaginatedViewSetMixin, ViewSet):
     """
     API endpoint that allows suppliers to be viewed or edited.
     """
@@ -552,14 +592,14 @@ class SupplierProductViewSet(ViewSet):
     def supplier_product_queryset(self):
         return SupplierProduct.objects.all()
 
+    @replica_view
     def list(self, request, *args, **kwargs):
         """
         List all supplier products
         """
-        serializer = SupplierProductSerializer(
-            self.supplier_product_queryset, many=True
+        return self.paginated_response(
+            self.supplier_product_queryset, SupplierProductSerializer
         )
-        return Response(serializer.data)
 
     @extend_schema(
         parameters=[
@@ -577,8 +617,7 @@ class SupplierProductViewSet(ViewSet):
         Retun a single SupplierProduct
         """
         product_sale = get_object_or_404(self.supplier_product_queryset, uuid=uuid)
-        serializer = SupplierProductSerializer(product_sale)
-        return Response(serializer.data)
+        return self.object_response(product_sale, SupplierProductSerializer)
 
     def create(self, request, *args, **kwargs):
         """Create a new SupplierProduct"""
@@ -664,11 +703,10 @@ class SupplierProductViewSet(ViewSet):
         List all SupplierProducts for a Supplier
         """
         supplier = get_object_or_404(self.supplier_queryset, uuid=uuid)
-        supplier_products = get_list_or_404(
-            self.supplier_product_queryset, supplier=supplier.id
-        )
-        serializer = SupplierProductSerializer(supplier_products, many=True)
-        return Response(serializer.data)
+        supplier_products = self.supplier_product_queryset.filter(supplier=supplier.id)
+        if not supplier_products.exists():
+            raise Http404
+        return self.paginated_response(supplier_products, SupplierProductSerializer)
 
     @extend_schema(
         parameters=[
@@ -687,14 +725,13 @@ class SupplierProductViewSet(ViewSet):
         List all Suppliers associated with a Product
         """
         product = get_object_or_404(self.product_queryset, uuid=uuid)
-        product_supplier = get_list_or_404(
-            self.supplier_product_queryset, product=product.id
-        )
-        serializer = SupplierProductSerializer(product_supplier, many=True)
-        return Response(serializer.data)
+        product_supplier = self.supplier_product_queryset.filter(product=product.id)
+        if not product_supplier.exists():
+            raise Http404
+        return self.paginated_response(product_supplier, SupplierProductSerializer)
 
 
-class SupplierViewSet(ViewSet):
+class SupplierViewSet(ReadOnlyRequestsMixin, PaginatedViewSetMixin, ViewSet):
     """API endpoit that allows Suppliers to be viewed and edited"""
 
     serializer_class = SupplierSerializer
@@ -708,10 +745,11 @@ class SupplierViewSet(ViewSet):
     def product_queryset(self):
         return Product.objects.all()
 
+    @replica_view
+    @cached_response(Category, Product, Supplier, SupplierProduct)
     def list(self, request, *args, **kwargs):
         """Return a list of all suppliers"""
-        serializer = SupplierSerializer(self.supplier_queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.supplier_queryset, SupplierSerializer)
 
     @extend_schema(
         parameters=[
@@ -726,9 +764,10 @@ class SupplierViewSet(ViewSet):
     )
     def retrieve(self, request, uuid=None):
         """Return a single supplier"""
-        supplier = get_object_or_404(self.supplier_queryset, uuid=uuid)
-        serializer = SupplierSerializer(supplier)
-        return Response(serializer.data)
+        supplier = get_object_or_404(
+            eager_load(self.supplier_queryset, SupplierSerializer), uuid=uuid
+        )
+        return self.object_response(supplier, SupplierSerializer)
 
     def create(self, request, *args, **kwargs):
         """Create a new supplier"""
@@ -794,3 +833,42 @@ class SupplierViewSet(ViewSet):
         supplier = get_object_or_404(self.supplier_queryset, uuid=uuid)
         supplier.delete()
         return Response(status=204)
+
+
+class CatalogueViewSet(ReadOnlyRequestsMixin, ViewSet):
+    """API endpoint that lets POS terminals sync the catalogue incrementally"""
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="since",
+                description="Token returned by the previous sync. Leave out for a full sync.",
+                required=False,
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+            )
+        ],
+    )
+    @action(detail=False, methods=["GET"])
+    def changes(self, request, *args, **kwargs):
+        """
+        Returns the categories, products and stock changed or deleted since a sync token
+        """
+        since = request.query_params.get("since") or None
+        try:
+            return Response(catalogue_changes(since))
+        except ValueError:
+            return Response({"message": "Invalid sync token"}, status=400)
+
+
+class ResponseCacheViewSet(ViewSet):
+    """API endpoint reporting how well the catalogue responses are cached"""
+
+    permission_classes = (IsAdminUser,)
+
+    @action(detail=False, methods=["GET"])
+    def stats(self, request, *args, **kwargs):
+        """
+        Returns the hits, misses and hit rate of every cached endpoint
+        """
+        return Response(cache_stats())
@@ -0,0 +1,30 @@
+"""
+Management command that renders the thumbnails of existing category images
+"""
+from django.core.management.base import BaseCommand
+
+from products.models import Category
+from products.tasks import generate_thumbnails
+from products.thumbnails import generate_category_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Render the thumbnails of every category image that has none or outdated ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="re-render categories whose thumbnails are current")
+        parser.add_argument("--queue", action="store_true", help="hand each category to the Celery workers")
+
+    def handle(self, *args, **options):
+        categories = Category.objects.exclude(image="").exclude(image__isnull=True)
+        count = 0
+        for category in categories.only("pk", "image", "thumbnails_source").iterator():
+            if not options["all"] and not category.thumbnails_outdated:
+                continue
+            if options["queue"]:
+                generate_thumbnails.delay(category.pk)
+            else:
+                generate_category_thumbnails(category.pk)
+            count += 1
+        action = "Queued" if options["queue"] else "Rendered"
+        self.stdout.write(self.style.SUCCESS(f"{action} thumbnails for {count} categories"))
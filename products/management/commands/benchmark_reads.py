@@ -0,0 +1,106 @@
+"""
+Management command that times GETs of the catalogue endpoints inside the
+request transaction against the read-only request paths
+"""
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+ENDPOINTS = ("categories-list", "products-list", "stock-list", "supplier-list")
+# how each mode sets READ_ONLY_REQUESTS and READ_ONLY_TRANSACTIONS
+MODES = {
+    "request transaction": (False, False),
+    "autocommit": (True, False),
+    "read-only transaction": (True, True),
+}
+
+
+class StatementCounter:
+    """
+    Execute wrapper counting the statements sent, DEBUG or not
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = "Time GETs of the catalogue endpoints with and without the request transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="GETs per round")
+        parser.add_argument("--rounds", type=int, default=10, help="rounds per mode")
+        parser.add_argument("--username", help="user to make them as, the first superuser by default")
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects
+        if options["username"]:
+            user = users.filter(username=options["username"]).first()
+        else:
+            user = users.filter(is_superuser=True).order_by("pk").first()
+        if user is None:
+            raise CommandError("No user to make the requests as")
+        client = Client()
+        client.force_login(user)
+        # keep the connection open between requests, as production does
+        connection.settings_dict["CONN_MAX_AGE"] = 60
+
+        # every GET goes to the database instead of the response cache, made
+        # in process to the host the test client sends
+        with override_settings(RESPONSE_CACHE_SECONDS=0, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for name in ENDPOINTS:
+                url = reverse(name)
+                client.get(url)  # warm up the connection and the code paths
+                timings = {mode: [] for mode in MODES}
+                # alternate the modes so drift in the machine hits them alike
+                for _ in range(options["rounds"]):
+                    for mode, flags in MODES.items():
+                        timings[mode].append(self.time_requests(client, url, options["requests"], flags))
+                baseline = statistics.median(timings["request transaction"])
+                self.stdout.write(f"{url}: {self.statements(client, url)}")
+                for mode, rounds in timings.items():
+                    median = statistics.median(rounds)
+                    self.stdout.write(f"  {mode}: {median:.3f} ms per GET ({(median - baseline) / baseline:+.1%})")
+
+    def time_requests(self, client, url, count, flags):
+        """
+        Mean milliseconds per GET of url with the given settings
+        """
+        read_only_requests, read_only_transactions = flags
+        with override_settings(
+            READ_ONLY_REQUESTS=read_only_requests,
+            READ_ONLY_TRANSACTIONS=read_only_transactions,
+        ):
+            started = time.perf_counter()
+            for _ in range(count):
+                response = client.get(url)
+            elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f"{url} answered {response.status_code}")
+        return elapsed / count * 1000
+
+    def statements(self, client, url):
+        """
+        Statements one GET of url sends in each mode, not counting the BEGIN
+        and COMMIT the driver sends around a transaction
+        """
+        counts = []
+        for mode, (read_only_requests, read_only_transactions) in MODES.items():
+            counter = StatementCounter()
+            with override_settings(
+                READ_ONLY_REQUESTS=read_only_requests,
+                READ_ONLY_TRANSACTIONS=read_only_transactions,
+            ), connection.execute_wrapper(counter):
+                client.get(url)
+            counts.append(f"{counter.count} in {mode}")
+        return "statements " + ", ".join(counts)
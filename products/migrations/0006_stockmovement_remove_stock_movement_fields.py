@@ -0,0 +1,95 @@
+# Generated by Django 4.2.3 on 2026-10-18 06:22
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def copy_last_stock_movements(apps, schema_editor):
+    """Keep the last movement recorded on each stock row as its first ledger entry"""
+    Stock = apps.get_model("products", "Stock")
+    StockMovement = apps.get_model("products", "StockMovement")
+    db = schema_editor.connection.alias
+    StockMovement.objects.using(db).bulk_create(
+        (
+            StockMovement(
+                product_id=stock.pk,
+                movement_type=stock.stock_movement_type,
+                quantity=stock.stock_movement_quantity or 0,
+                remarks=stock.stock_movement_remarks,
+            )
+            for stock in Stock.objects.using(db).exclude(stock_movement_type__isnull=True)
+        ),
+        batch_size=1000,
+    )
+    # auto_now_add stamps the migration time, date each entry by its stock row instead
+    StockMovement.objects.using(db).update(
+        created_at=Subquery(Stock.objects.using(db).filter(pk=OuterRef("product_id")).values("updated_at")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0005_alter_product_tax_type"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "movement_type",
+                    models.CharField(
+                        choices=[
+                            ("01", "Incoming-Import"),
+                            ("02", "Incoming-Purchase"),
+                            ("03", "Incoming-Return"),
+                            ("04", "Incoming-Stock Movement"),
+                            ("05", "Incoming-Processing"),
+                            ("06", "Incoming-Adjustment"),
+                            ("11", "Outgoing-Sale"),
+                            ("12", "Outgoing-Return"),
+                            ("13", "Outgoing-Stock Movement"),
+                            ("14", "Outgoing-Processing"),
+                            ("15", "outgoing-Discarding"),
+                            ("16", "outgoing-Adjustment"),
+                        ],
+                        max_length=4,
+                    ),
+                ),
+                ("quantity", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("remarks", models.TextField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_movements",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "stock movements",
+                "ordering": ["created_at", "id"],
+                "indexes": [
+                    models.Index(fields=["product", "created_at"], name="products_st_product_a806c1_idx"),
+                    models.Index(fields=["created_at"], name="products_st_created_792bf6_idx"),
+                ],
+            },
+        ),
+        migrations.RunPython(copy_last_stock_movements, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="stock",
+            name="stock_movement_quantity",
+        ),
+        migrations.RemoveField(
+            model_name="stock",
+            name="stock_movement_remarks",
+        ),
+        migrations.RemoveField(
+            model_name="stock",
+            name="stock_movement_type",
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.3 on 2026-10-18 06:36
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+import django.db.models.functions.text
+
+from pos_inventory.utils.operations import AddPostgresIndex, CreateExtensionIfAvailable
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0006_stockmovement_remove_stock_movement_fields"),
+    ]
+
+    operations = [
+        CreateExtensionIfAvailable("pg_trgm"),
+        AddPostgresIndex(
+            model_name="category",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("name"), name="gin_trgm_ops"
+                ),
+                name="category_name_trgm",
+            ),
+            extension="pg_trgm",
+        ),
+        AddPostgresIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("name"), name="gin_trgm_ops"
+                ),
+                name="product_name_trgm",
+            ),
+            extension="pg_trgm",
+        ),
+        AddPostgresIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("code"), name="gin_trgm_ops"
+                ),
+                name="product_code_trgm",
+            ),
+            extension="pg_trgm",
+        ),
+        AddPostgresIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector("name", "description", config="simple"),
+                name="product_search_vector",
+            ),
+        ),
+    ]
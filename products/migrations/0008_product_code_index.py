@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-18 06:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0007_product_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="product",
+            name="code",
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
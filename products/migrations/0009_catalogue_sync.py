@@ -0,0 +1,45 @@
+# Generated by Django 4.2.3 on 2026-10-18 06:39
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0008_product_code_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogueTombstone",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("category", "Category"), ("product", "Product"), ("stock", "Stock")], max_length=8
+                    ),
+                ),
+                ("uuid", models.UUIDField()),
+                ("deleted_at", models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                "ordering": ["deleted_at", "id"],
+            },
+        ),
+        migrations.AlterField(
+            model_name="category",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="product",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="stock",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
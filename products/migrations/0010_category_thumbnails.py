@@ -0,0 +1,22 @@
+# Generated by Django 4.2.3 on 2026-10-18 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0009_catalogue_sync"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="thumbnails",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="thumbnails_source",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+    ]
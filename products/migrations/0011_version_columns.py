@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-18 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0010_category_thumbnails"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stock",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+SYNCED_MODELS = ["category", "product", "stock", "cataloguetombstone"]
+
+
+def create_change_xid_triggers(apps, schema_editor):
+    """Stamp every write to the synced tables with the id of its transaction, on PostgreSQL"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        """
+        CREATE OR REPLACE FUNCTION stamp_change_xid() RETURNS trigger AS $$
+        BEGIN
+            NEW.change_xid := pg_current_xact_id()::text::bigint;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    quote = schema_editor.quote_name
+    for model_name in SYNCED_MODELS:
+        table = apps.get_model("products", model_name)._meta.db_table
+        schema_editor.execute(
+            f"CREATE TRIGGER {quote(f'{table}_change_xid')} BEFORE INSERT OR UPDATE ON {quote(table)} "
+            "FOR EACH ROW EXECUTE FUNCTION stamp_change_xid()"
+        )
+
+
+def drop_change_xid_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    quote = schema_editor.quote_name
+    for model_name in SYNCED_MODELS:
+        table = apps.get_model("products", model_name)._meta.db_table
+        schema_editor.execute(f"DROP TRIGGER {quote(f'{table}_change_xid')} ON {quote(table)}")
+    schema_editor.execute("DROP FUNCTION stamp_change_xid()")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0012_unique_uuids"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cataloguetombstone",
+            name="change_xid",
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="change_xid",
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="change_xid",
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="stock",
+            name="change_xid",
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_change_xid_triggers, drop_change_xid_triggers),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.2.3 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0013_change_xid"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(fields=["created_at", "product_id"], name="products_st_created_ecb536_idx"),
+        ),
+    ]
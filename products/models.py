@@ -3,39 +3,58 @@ Module that describes models (DATABASE tables) related to products, suppliers
 and Categories. Forming a basis of inventory control through business logic
 """
 from decimal import Decimal
-from io import BytesIO
 from os import name
-from PIL import Image
 import uuid as uuid_lib
 
 from django.db import models
+from django.db.models import Case, DecimalField, F, When
 
-from django.core.files import File
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 
 from administration.models import Supplier
+from pos_inventory.utils.response_cache import bump_generation
+from pos_inventory.utils.versioning import VersionedModel
+
+
+class SyncedModel(models.Model):
+    """
+    Base for the catalogue rows POS terminals sync. On PostgreSQL a trigger
+    sets change_xid to the id of the transaction that last wrote the row,
+    which products.sync orders the changes by
+    """
+
+    change_xid = models.BigIntegerField(null=True, blank=True, editable=False, db_index=True)
+
+    class Meta:
+        abstract = True
 
 
 # Create your models here.
-class Category(models.Model):
+class Category(SyncedModel):
     """
     Class defining the category that is used to classify products
     contains a slug for easy url constructor
-    images and thumbnail also present and a way to get create
-    thumbnails if not present
+    images and thumbnails also present, the thumbnails are rendered in
+    the background once an image is uploaded
     """
 
     name = models.CharField(max_length=255)
-    uuid = models.UUIDField(editable=False, db_index=True, default=uuid_lib.uuid4)
+    uuid = models.UUIDField(editable=False, unique=True, default=uuid_lib.uuid4)
     image = models.ImageField(upload_to="uploads/", blank=True, null=True)
     thumbnail = models.ImageField(upload_to="uploads/", blank=True, null=True)
+    # every thumbnail size by name, and the image they were rendered from
+    thumbnails = models.JSONField(default=dict, blank=True)
+    thumbnails_source = models.CharField(max_length=255, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name_plural = "Categories"
         ordering = ["name"]
+        # category_name_trgm, a trigram index on UPPER(name), is added on
+        # Postgres by migration 0007 and kept out of Meta, see AddPostgresIndex
 
     def __str__(self):
         return self.name
@@ -49,35 +68,30 @@ class Category(models.Model):
         return ""
 
     def get_thumbnail(self):
+        """
+        URL of the default thumbnail, empty until the thumbnail task has run
+        """
         if self.thumbnail:
             return "http://127.0.0.1:8000" + self.thumbnail.url
+        return ""
 
-        else:
-            if self.image:
-                self.thumbnail = self.make_thumbnail(self.image)
-                self.save()
-
-                return "http://127.0.0.1:8000" + self.thumbnail.url
-            else:
-                return ""
-
-    def make_thumbnail(self, image, size=(150, 150)):
-        img = Image.open(image)
-        (width, height) = (300, 200)
-        # resize all images to a standard size before generating thumbnails
-        img.resize((width, height))
-        img.convert("RGB")
-        img.thumbnail(size)
-        # saving image as file buffer in memory (mimicing a file)
-        thumb_io = BytesIO()
-        img.save(thumb_io, "JPEG", quality=85)
-        # reading converted thumbnail as a file and saving it in variable thumbnail
-        thumbnail = File(thumb_io, name=image.name)
-
-        return thumbnail
-
-
-class Product(models.Model):
+    def thumbnail_urls(self):
+        """
+        URLs of the stored thumbnails keyed by size
+        """
+        return {
+            size: self.thumbnail.storage.url(path) for size, path in self.thumbnails.items()
+        }
+
+    @property
+    def thumbnails_outdated(self):
+        """
+        Whether the thumbnails were made from another image than the current one
+        """
+        return (self.image.name or "") != self.thumbnails_source
+
+
+class Product(SyncedModel):
     """
     Contains the products to be sold by the system and forms the
     basis of the stock
@@ -217,9 +231,9 @@ class Product(models.Model):
     )
     name = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
-    uuid = models.UUIDField(editable=False, db_index=True, default=uuid_lib.uuid4)
-    code = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    uuid = models.UUIDField(editable=False, unique=True, default=uuid_lib.uuid4)
+    code = models.CharField(max_length=255, db_index=True)
     description = models.TextField(blank=True, null=True)
     product_type = models.CharField(max_length=2, choices=ProductType.choices)
     tax_type = models.CharField(max_length=5, choices=TaxType.choices)
@@ -231,6 +245,11 @@ class Product(models.Model):
     class Meta:
         verbose_name_plural = "products"
         ordering = ["name"]
+        # icontains compiles to UPPER(column) LIKE UPPER(%query%), which the
+        # trigram indexes product_name_trgm and product_code_trgm serve, and
+        # product_search_vector serves full text search. Migration 0007 adds
+        # them on Postgres only and they are kept out of Meta, see
+        # AddPostgresIndex
 
     def __str__(self):
         return self.name
@@ -240,18 +259,11 @@ class Product(models.Model):
 
     def get_total_amount(self, sale_amount, tax_type):
         """
-        Calculate the tax amount according to tax type
+        Calculate the amount including tax according to tax type
         """
-        if tax_type == Product.TaxType.A:
-            return sale_amount
-        elif tax_type == Product.TaxType.B or tax_type == "B_16":
-            return sale_amount * Decimal(1.16)
-        elif tax_type == Product.TaxType.C:
-            return sale_amount
-        elif tax_type == Product.TaxType.D:
-            return sale_amount
-        elif tax_type == Product.TaxType.E:
-            return sale_amount * Decimal(1.08)
+        from products.tax import line_tax
+
+        return sale_amount + line_tax(sale_amount, tax_type)
 
 
 class SupplierProduct(models.Model):
@@ -263,7 +275,81 @@ class SupplierProduct(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
 
 
-class Stock(models.Model):
+class StockQuerySet(models.QuerySet):
+    """
+    Race-free stock changes. Rows are locked in primary key order so that
+    concurrent multi-line carts always queue instead of deadlocking, and
+    quantities are changed with database side arithmetic so no update is lost
+    """
+
+    def lock(self, product_ids):
+        """
+        Lock the stock rows of the given products for the rest of the
+        transaction and return them keyed by primary key
+        """
+        stocks = self.select_for_update().filter(pk__in=product_ids).order_by("pk")
+        return {stock.pk: stock for stock in stocks}
+
+    def move(self, quantities, stock_movement_type, stock_movement_remarks):
+        """
+        Apply a stock movement of the given type to many products in a single
+        UPDATE. quantities maps a product id to the quantity moved
+        """
+        if stock_movement_type in Stock.INCOMING_MOVEMENT_TYPES:
+            sign = 1
+        elif stock_movement_type in Stock.OUTGOING_MOVEMENT_TYPES:
+            sign = -1
+        else:
+            return 0
+        quantities = {
+            pk: Decimal(str(quantity))
+            for pk, quantity in quantities.items()
+            if Decimal(str(quantity))
+        }
+        if not quantities:
+            return 0
+        updated = self.filter(pk__in=quantities).update(
+            stock_quantity=Case(
+                *[
+                    When(pk=pk, then=F("stock_quantity") + sign * quantity)
+                    for pk, quantity in quantities.items()
+                ],
+                output_field=DecimalField(),
+            ),
+            updated_at=timezone.now(),
+            version=F("version") + 1,
+        )
+        # a bulk UPDATE sends no post_save for the cached responses to notice
+        bump_generation(Stock)
+        StockMovement.objects.bulk_create(
+            [
+                StockMovement(
+                    product_id=pk,
+                    movement_type=stock_movement_type,
+                    quantity=quantity,
+                    remarks=stock_movement_remarks,
+                )
+                for pk, quantity in quantities.items()
+            ]
+        )
+        return updated
+
+    def reserve(self, quantities, stock_movement_remarks="Sale made"):
+        """
+        Take the requested quantities out of stock for a sale. Each product
+        gives at most what it has in stock, the quantities actually reserved
+        are returned keyed by product id
+        """
+        stocks = self.lock(quantities)
+        reserved = {
+            pk: min(Decimal(str(quantities[pk])), stock.stock_quantity)
+            for pk, stock in stocks.items()
+        }
+        self.move(reserved, Stock.StockInOutType.Sale, stock_movement_remarks)
+        return reserved
+
+
+class Stock(VersionedModel, SyncedModel):
     """
     Class with attributes for inventory management
     """
@@ -286,7 +372,24 @@ class Stock(models.Model):
         Discarding = "15", _("outgoing-Discarding")
         Adjustment_out = "16", _("outgoing-Adjustment")
 
-    uuid = models.UUIDField(editable=False, db_index=True, default=uuid_lib.uuid4)
+    INCOMING_MOVEMENT_TYPES = [
+        StockInOutType.Import,
+        StockInOutType.Purchase,
+        StockInOutType.Return_in,
+        StockInOutType.Stock_movement_in,
+        StockInOutType.Processing_in,
+        StockInOutType.Adjustment_in,
+    ]
+    OUTGOING_MOVEMENT_TYPES = [
+        StockInOutType.Sale,
+        StockInOutType.Return_out,
+        StockInOutType.Stock_movement_out,
+        StockInOutType.Processing_out,
+        StockInOutType.Discarding,
+        StockInOutType.Adjustment_out,
+    ]
+
+    uuid = models.UUIDField(editable=False, unique=True, default=uuid_lib.uuid4)
     product_id = models.OneToOneField(
         Product, primary_key=True, on_delete=models.CASCADE
     )
@@ -294,62 +397,83 @@ class Stock(models.Model):
         max_digits=10, decimal_places=2, blank=True, default=0.00
     )
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     cost_per_unit = models.DecimalField(max_digits=6, decimal_places=2)
     price_per_unit_retail = models.DecimalField(max_digits=6, decimal_places=2)
     price_per_unit_wholesale = models.DecimalField(max_digits=6, decimal_places=2)
     reorder_level = models.DecimalField(null=True, max_digits=6, decimal_places=2)
     reorder_quantity = models.DecimalField(null=True, max_digits=6, decimal_places=2)
-    stock_movement_type = models.CharField(
-        null=True, max_length=4, choices=StockInOutType.choices
-    )
-    stock_movement_quantity = models.DecimalField(
-        null=True, max_digits=6, decimal_places=2, default=0.0
-    )
-    stock_movement_remarks = models.TextField(null=True, blank=True)
+
+    objects = StockQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = "stocks"
         ordering = ["product_id"]
-
-    def switch_stock_case(
-        self, stock_movement_type, stock_movement_quantity, stock_movement_remarks
-    ):
-        """
-        Encapsulating the stock-movement type and its respective quantity.
-        """
-        if stock_movement_type in [
-            self.StockInOutType.Import,
-            self.StockInOutType.Purchase,
-            self.StockInOutType.Return_in,
-            self.StockInOutType.Stock_movement_in,
-            self.StockInOutType.Processing_in,
-            self.StockInOutType.Adjustment_in,
-        ]:
-            stock_movement_quantity = Decimal(stock_movement_quantity)
-            self.stock_movement_quantity = stock_movement_quantity
-            self.stock_quantity += stock_movement_quantity
-            self.stock_movement_remarks = stock_movement_remarks
-        elif stock_movement_type in [
-            self.StockInOutType.Sale,
-            self.StockInOutType.Return_out,
-            self.StockInOutType.Stock_movement_out,
-            self.StockInOutType.Processing_out,
-            self.StockInOutType.Discarding,
-            self.StockInOutType.Adjustment_out,
-        ]:
-            stock_movement_quantity = Decimal(stock_movement_quantity)
-            self.stock_movement_quantity = stock_movement_quantity
-            self.stock_quantity -= stock_movement_quantity
-            self.stock_movement_remarks = stock_movement_remarks
+        indexes = [
+            # the keyset pages of the stock list walk (created_at, pk)
+            models.Index(fields=["created_at", "product_id"]),
+        ]
 
     def update_stock_quantity(
         self, stock_movement_type, stock_movement_quantity, stock_movement_remarks
     ):
         """
-        Update Stock quantity according to the given stock_movement_type
+        Update Stock quantity according to the given stock_movement_type.
+        The change is applied in the database so concurrent movements on the
+        same row are never lost, the instance is then refreshed from it
         """
-        self.switch_stock_case(
-            stock_movement_type, stock_movement_quantity, stock_movement_remarks
+        Stock.objects.filter(pk=self.pk).move(
+            {self.pk: stock_movement_quantity},
+            stock_movement_type,
+            stock_movement_remarks,
         )
-        self.save()
+        self.refresh_from_db(fields=["stock_quantity", "updated_at", "version"])
+
+
+class StockMovement(models.Model):
+    """
+    Append-only ledger with one row per stock movement. Rows are never
+    updated, so only the time of the movement is kept
+    """
+
+    product = models.ForeignKey(
+        Product, related_name="stock_movements", on_delete=models.CASCADE
+    )
+    movement_type = models.CharField(
+        max_length=4, choices=Stock.StockInOutType.choices
+    )
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    remarks = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "stock movements"
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(fields=["product", "created_at"]),
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_movement_type_display()} {self.quantity} {self.product_id}"
+
+
+class CatalogueTombstone(SyncedModel):
+    """
+    Records a deleted catalogue row so terminals syncing changes can drop it
+    """
+
+    class Kind(models.TextChoices):
+        CATEGORY = "category", _("Category")
+        PRODUCT = "product", _("Product")
+        STOCK = "stock", _("Stock")
+
+    kind = models.CharField(max_length=8, choices=Kind.choices)
+    uuid = models.UUIDField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ["deleted_at", "id"]
+
+    def __str__(self):
+        return f"{self.kind} {self.uuid} deleted"
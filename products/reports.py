@@ -0,0 +1,70 @@
+"""
+Module building the stock reports shared by the API and the report workers
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from products.models import StockMovement
+
+STOCK_MOVEMENT_FIELDS = [
+    "stock_id",
+    "product_name",
+    "stock_quantity",
+    "stock_updated_at",
+    "cost_per_unit",
+    "price_per_unit_retail",
+    "price_per_unit_wholesale",
+    "reorder_level",
+    "reorder_quantity",
+    "stock_movement_type",
+    "stock_movement_quantity",
+    "stock_movement_remarks",
+    "stock_movement_created_at",
+]
+
+
+def stock_movement_report(start_date, end_date, product=None):
+    """
+    Return every stock movement between two dates, or None if there is none
+    """
+    # One range scan over the ledger, every movement in the date range
+    movements = StockMovement.objects.filter(
+        created_at__gte=timezone.make_aware(datetime.combine(start_date, time.min)),
+        created_at__lt=timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)),
+    )
+    if product is not None:
+        movements = movements.filter(product=product)
+    movements = movements.order_by("created_at", "id").values_list(
+        "product__stock__uuid",
+        "product__name",
+        "product__stock__stock_quantity",
+        "product__stock__updated_at",
+        "product__stock__cost_per_unit",
+        "product__stock__price_per_unit_retail",
+        "product__stock__price_per_unit_wholesale",
+        "product__stock__reorder_level",
+        "product__stock__reorder_quantity",
+        "movement_type",
+        "quantity",
+        "remarks",
+        "created_at",
+    )
+
+    report = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "stock_movement": [dict(zip(STOCK_MOVEMENT_FIELDS, movement)) for movement in movements],
+    }
+    if not report["stock_movement"]:
+        return None
+    return report
+
+
+def stock_movement_report_rows(report):
+    """
+    Flatten a stock movement report into CSV rows, header first
+    """
+    yield STOCK_MOVEMENT_FIELDS
+    for movement in report["stock_movement"]:
+        yield [movement[field] for field in STOCK_MOVEMENT_FIELDS]
@@ -0,0 +1,121 @@
+"""
+In process index of product codes for the till's scan path. Each worker keeps
+a map from code to everything needed to ring a product up, and brings it up
+to date from the rows whose updated_at moved since it last looked and the
+tombstones of the rows deleted since
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+
+from products.models import CatalogueTombstone, Product
+
+SCAN_FIELDS = {
+    "uuid": "uuid",
+    "code": "code",
+    "name": "name",
+    "tax_type": "tax_type",
+    "stock": "stock__uuid",
+    "stock_quantity": "stock__stock_quantity",
+    "price_per_unit_retail": "stock__price_per_unit_retail",
+    "price_per_unit_wholesale": "stock__price_per_unit_wholesale",
+}
+# rows are timestamped by the clocks of every app server, so each refresh
+# looks a little further back than the newest change it has seen
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class ScanIndex:
+    """
+    Map from product code to the product, stock, price and tax a scan returns
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.entries = {}
+        self.codes = {}
+        self.uuids = {}
+        self.synced_at = None
+        self.checked_at = None
+
+    def rows(self, products):
+        return products.values("pk", "updated_at", "stock__updated_at", *SCAN_FIELDS.values())
+
+    def store(self, row, advance=True):
+        """
+        Put a product row in the index, dropping the code it was indexed under
+        before. Only rows read by a refresh advance the point it resumes from
+        """
+        previous_code = self.codes.get(row["pk"])
+        if previous_code is not None and previous_code != row["code"]:
+            self.entries.pop(previous_code, None)
+        self.codes[row["pk"]] = row["code"]
+        self.uuids[row["uuid"]] = row["pk"]
+        self.entries[row["code"]] = {name: row[field] for name, field in SCAN_FIELDS.items()}
+        if not advance:
+            return
+        for changed_at in (row["updated_at"], row["stock__updated_at"]):
+            if changed_at is not None and (self.synced_at is None or changed_at > self.synced_at):
+                self.synced_at = changed_at
+
+    def evict(self, since):
+        """
+        Drop the products deleted since a time, and the entries of products
+        whose stock was deleted, which are read again when next scanned
+        """
+        tombstones = CatalogueTombstone.objects.filter(
+            kind__in=[CatalogueTombstone.Kind.PRODUCT, CatalogueTombstone.Kind.STOCK],
+            deleted_at__gt=since,
+        )
+        deleted = {kind: set() for kind in CatalogueTombstone.Kind.values}
+        for kind, uuid in tombstones.values_list("kind", "uuid"):
+            deleted[kind].add(uuid)
+        for uuid in deleted[CatalogueTombstone.Kind.PRODUCT]:
+            pk = self.uuids.pop(uuid, None)
+            if pk is not None:
+                self.entries.pop(self.codes.pop(pk), None)
+        if deleted[CatalogueTombstone.Kind.STOCK]:
+            for code, entry in list(self.entries.items()):
+                if entry["stock"] in deleted[CatalogueTombstone.Kind.STOCK]:
+                    del self.entries[code]
+
+    def refresh(self, force=False):
+        """
+        Load the products changed and drop those deleted since the last
+        refresh, at most once every SCAN_INDEX_REFRESH_SECONDS unless forced
+        """
+        interval = settings.SCAN_INDEX_REFRESH_SECONDS
+        if not force and self.checked_at is not None and time.monotonic() - self.checked_at < interval:
+            return
+        with self.lock:
+            products = Product.objects.order_by()
+            if self.synced_at is not None:
+                since = self.synced_at - SYNC_OVERLAP
+                products = products.filter(Q(updated_at__gt=since) | Q(stock__updated_at__gt=since))
+                self.evict(since)
+            for row in self.rows(products).iterator(chunk_size=5000):
+                self.store(row)
+            self.checked_at = time.monotonic()
+
+    def lookup(self, code):
+        """
+        Return the index entry for a code, or None if no product has it
+        """
+        self.refresh()
+        entry = self.entries.get(code)
+        if entry is None:
+            # a product created since the last refresh, read through the code index
+            with self.lock:
+                for row in self.rows(Product.objects.filter(code=code).order_by("pk")):
+                    self.store(row, advance=False)
+            entry = self.entries.get(code)
+        return entry
+
+
+scan_index = ScanIndex()
@@ -0,0 +1,88 @@
+"""
+Indexed catalogue search used by the till. On Postgres matches come from the
+trigram and full-text GIN indexes on products and are ordered by relevance;
+other databases fall back to icontains with a simpler ranking
+"""
+import uuid as uuid_lib
+from functools import lru_cache
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Case, FloatField, Q, Value, When
+
+from products.models import Category, Product
+
+SEARCH_CONFIG = "simple"
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+
+def product_search_vector():
+    """
+    Document the full-text index on products is built over. Queries must use
+    this exact expression for Postgres to pick the index
+    """
+    return SearchVector("name", "description", config=SEARCH_CONFIG)
+
+
+@lru_cache(maxsize=None)
+def trigram_enabled(using=DEFAULT_DB_ALIAS):
+    """
+    Whether the pg_trgm extension is installed on a database
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def search_limit(value):
+    """
+    Number of results to return for a requested limit
+    """
+    try:
+        return max(1, min(int(value), MAX_SEARCH_LIMIT))
+    except (TypeError, ValueError):
+        return SEARCH_LIMIT
+
+
+def search_products(query, limit=SEARCH_LIMIT, queryset=None):
+    """
+    Return the products best matching query, most relevant first. An exact
+    code match always ranks first so scanned or typed codes win
+    """
+    queryset = Product.objects.all() if queryset is None else queryset
+    matches = Q(name__icontains=query) | Q(code__icontains=query)
+    rank = Case(
+        When(code__iexact=query, then=Value(2.0)),
+        When(name__istartswith=query, then=Value(1.0)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    if connections[queryset.db].vendor == "postgresql":
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        queryset = queryset.annotate(document=product_search_vector())
+        matches |= Q(document=search_query)
+        rank = rank + SearchRank(product_search_vector(), search_query)
+        if trigram_enabled(queryset.db):
+            rank = rank + TrigramSimilarity("name", query)
+    else:
+        matches |= Q(description__icontains=query)
+    return queryset.filter(matches).annotate(rank=rank).order_by("-rank", "name")[:limit]
+
+
+def search_categories(query, limit=SEARCH_LIMIT):
+    """
+    Return the categories whose name matches query, or the one it identifies
+    """
+    matches = Q(name__icontains=query)
+    try:
+        matches |= Q(uuid=uuid_lib.UUID(query))
+    except ValueError:
+        pass
+    categories = Category.objects.filter(matches)
+    if trigram_enabled(categories.db):
+        categories = categories.annotate(rank=TrigramSimilarity("name", query)).order_by("-rank", "name")
+    return categories[:limit]
@@ -0,0 +1,41 @@
+"""
+Signal handlers keeping tombstones of deleted catalogue rows, the cached
+catalogue responses current and category thumbnails rendered
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from administration.models import Supplier
+from pos_inventory.utils.response_cache import bump_generation
+from products.models import CatalogueTombstone, Category, Product, Stock, SupplierProduct
+from products.tasks import generate_thumbnails
+
+TOMBSTONE_KINDS = {
+    Category: CatalogueTombstone.Kind.CATEGORY,
+    Product: CatalogueTombstone.Kind.PRODUCT,
+    Stock: CatalogueTombstone.Kind.STOCK,
+}
+CACHED_MODELS = (Category, Product, Stock, Supplier, SupplierProduct)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Stock)
+def record_tombstone(sender, instance, **kwargs):
+    CatalogueTombstone.objects.create(kind=TOMBSTONE_KINDS[sender], uuid=instance.uuid)
+
+
+@receiver(post_save, sender=Category)
+def queue_thumbnails(sender, instance, **kwargs):
+    if instance.thumbnails_outdated:
+        transaction.on_commit(lambda: generate_thumbnails.delay(instance.pk))
+
+
+def invalidate_cached_responses(sender, **kwargs):
+    bump_generation(sender)
+
+
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_cached_responses, sender=model)
+    post_delete.connect(invalidate_cached_responses, sender=model)
@@ -0,0 +1,157 @@
+"""
+Catalogue delta sync for POS terminals. A terminal keeps the token of its
+last sync and is sent only the categories, products and stock changed or
+deleted after it.
+
+On PostgreSQL a trigger stamps every catalogue row and tombstone with the id
+of the transaction writing it, and a token is the oldest transaction still
+running when the sync started, which is written x<id>. Every transaction
+before it has committed or rolled back by then, so the next sync, which
+sends what that transaction and any later one wrote, never misses a row
+committed late. On other databases a token is a timestamp and a sync also
+resends the SYNC_OVERLAP before it, so a write committed more than
+SYNC_OVERLAP after its rows were stamped is missed
+"""
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.db import connections, router
+from django.utils import timezone
+
+from products.models import CatalogueTombstone, Category, Product, Stock
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# a row is stamped when it is written but only visible once its transaction
+# commits, so every sync by timestamp also resends what changed shortly
+# before its token
+SYNC_OVERLAP = timedelta(seconds=30)
+XID_TOKEN_PREFIX = "x"
+
+# response key, model, tombstone kind and the columns sent, by name and lookup
+CATALOGUE = [
+    (
+        "categories",
+        Category,
+        CatalogueTombstone.Kind.CATEGORY,
+        {
+            "uuid": "uuid",
+            "name": "name",
+            "image": "image",
+            "thumbnail": "thumbnail",
+            "thumbnails": "thumbnails",
+            "updated_at": "updated_at",
+        },
+    ),
+    (
+        "products",
+        Product,
+        CatalogueTombstone.Kind.PRODUCT,
+        {
+            "uuid": "uuid",
+            "category": "category__uuid",
+            "name": "name",
+            "code": "code",
+            "description": "description",
+            "product_type": "product_type",
+            "tax_type": "tax_type",
+            "unit": "unit",
+            "packaging_unit": "packaging_unit",
+            "limited": "limited",
+            "active_for_sale": "active_for_sale",
+            "updated_at": "updated_at",
+        },
+    ),
+    (
+        "stock",
+        Stock,
+        CatalogueTombstone.Kind.STOCK,
+        {
+            "uuid": "uuid",
+            "product": "product_id__uuid",
+            "stock_quantity": "stock_quantity",
+            "cost_per_unit": "cost_per_unit",
+            "price_per_unit_retail": "price_per_unit_retail",
+            "price_per_unit_wholesale": "price_per_unit_wholesale",
+            "reorder_level": "reorder_level",
+            "reorder_quantity": "reorder_quantity",
+            "updated_at": "updated_at",
+        },
+    ),
+]
+
+
+def make_token(moment):
+    """
+    Sync token for a moment, the microseconds since the epoch
+    """
+    return str((moment - EPOCH) // timedelta(microseconds=1))
+
+
+def read_token(token):
+    """
+    Moment a sync token stands for, raising ValueError for a malformed token
+    """
+    microseconds = int(token)
+    if microseconds < 0:
+        raise ValueError("Sync tokens are never negative")
+    return EPOCH + timedelta(microseconds=microseconds)
+
+
+def read_xid_token(token):
+    """
+    Transaction id a sync token stands for, None for a token by timestamp,
+    raising ValueError for a malformed token
+    """
+    if not token.startswith(XID_TOKEN_PREFIX):
+        read_token(token)
+        return None
+    xid = int(token.removeprefix(XID_TOKEN_PREFIX))
+    if xid < 0:
+        raise ValueError("Sync tokens are never negative")
+    return xid
+
+
+def transaction_horizon(using):
+    """
+    The oldest transaction still running on a PostgreSQL database. Every
+    transaction with a lower id has committed or rolled back
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+        return cursor.fetchone()[0]
+
+
+def catalogue_changes(since=None):
+    """
+    Return the catalogue rows changed and deleted after the since token, or
+    every row when there is no token, with the token to send next time. A
+    token by timestamp given to a database that orders changes by
+    transaction, or the other way round, gets every row
+    """
+    using = router.db_for_read(Product)
+    row_filters, tombstone_filters = {}, {}
+    if connections[using].vendor == "postgresql":
+        start = None if since is None else read_xid_token(since)
+        # read before the rows, which then show everything committed below it
+        token = f"{XID_TOKEN_PREFIX}{transaction_horizon(using)}"
+        if start is not None:
+            row_filters = tombstone_filters = {"change_xid__gte": start}
+    else:
+        if since is not None and since.startswith(XID_TOKEN_PREFIX):
+            read_xid_token(since)
+            since = None
+        until = timezone.now()
+        start = None if since is None else read_token(since) - SYNC_OVERLAP
+        token = make_token(until)
+        row_filters, tombstone_filters = {"updated_at__lte": until}, {"deleted_at__lte": until}
+        if start is not None:
+            row_filters["updated_at__gt"] = start
+            tombstone_filters["deleted_at__gt"] = start
+    changes = {"token": token, "full": start is None, "deleted": {}}
+
+    for key, model, kind, columns in CATALOGUE:
+        rows = model.objects.using(using).filter(**row_filters)
+        tombstones = CatalogueTombstone.objects.using(using).filter(kind=kind, **tombstone_filters)
+        changes[key] = [dict(zip(columns, row)) for row in rows.order_by("updated_at").values_list(*columns.values())]
+        changes["deleted"][key] = [] if start is None else list(tombstones.values_list("uuid", flat=True))
+    return changes
@@ -0,0 +1,8 @@
+from config import celery_app
+from products.thumbnails import generate_category_thumbnails
+
+
+@celery_app.task()
+def generate_thumbnails(category_id):
+    """Render the thumbnails of a category's image in every size."""
+    return generate_category_thumbnails(category_id)
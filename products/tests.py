@@ -1,3 +1,699 @@
-from django.test import TestCase
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from pos_inventory.users.models import User
+from pos_inventory.utils.transactions import read_only_transaction
+from pos_inventory.utils.versioning import VersionConflict, retry_on_conflict
+from products.models import Category, Product, Stock
+from products.scan import scan_index
+from products.tax import cart_tax, line_tax
+
+
+def create_stocked_product(name="Sugar", code="SUG01", quantity="10.00"):
+    category, _ = Category.objects.get_or_create(name="General")
+    product = Product.objects.create(
+        category=category,
+        name=name,
+        code=code,
+        product_type=Product.ProductType.Finished_Product,
+        tax_type=Product.TaxType.B,
+        packaging_unit=Product.PackagingUnit.Bag,
+        unit=Product.UnitOfQuantity.Number,
+    )
+    Stock.objects.create(
+        product_id=product,
+        stock_quantity=Decimal(quantity),
+        cost_per_unit=Decimal("50.00"),
+        price_per_unit_retail=Decimal("100.00"),
+        price_per_unit_wholesale=Decimal("90.00"),
+    )
+    return product
+
+
+class StockMovementTestCase(TestCase):
+    def setUp(self):
+        self.product = create_stocked_product()
+        self.stock = Stock.objects.get(pk=self.product.pk)
+
+    def test_update_stock_quantity_applies_movement_direction(self):
+        """Test that incoming movements add to stock and outgoing ones remove"""
+        self.stock.update_stock_quantity(Stock.StockInOutType.Purchase, "5", "restock")
+        assert self.stock.stock_quantity == Decimal("15.00")
+        self.stock.update_stock_quantity(Stock.StockInOutType.Discarding, "3", "expired")
+        assert self.stock.stock_quantity == Decimal("12.00")
+
+    def test_every_movement_is_kept_in_the_ledger(self):
+        """Test that each movement appends a ledger row instead of overwriting the last"""
+        self.stock.update_stock_quantity(Stock.StockInOutType.Purchase, "5", "restock")
+        self.stock.update_stock_quantity(Stock.StockInOutType.Discarding, "3", "expired")
+        Stock.objects.reserve({self.product.pk: Decimal("2")})
+        movements = list(
+            self.product.stock_movements.values_list("movement_type", "quantity", "remarks")
+        )
+        assert movements == [
+            (Stock.StockInOutType.Purchase, Decimal("5.00"), "restock"),
+            (Stock.StockInOutType.Discarding, Decimal("3.00"), "expired"),
+            (Stock.StockInOutType.Sale, Decimal("2.00"), "Sale made"),
+        ]
+
+    def test_update_stock_quantity_is_not_lost_on_stale_instance(self):
+        """Test that a movement made through a stale instance keeps other movements"""
+        stale = Stock.objects.get(pk=self.product.pk)
+        self.stock.update_stock_quantity(Stock.StockInOutType.Sale, "4", "Sale made")
+        stale.update_stock_quantity(Stock.StockInOutType.Sale, "4", "Sale made")
+        assert Stock.objects.get(pk=self.product.pk).stock_quantity == Decimal("2.00")
+
+    def test_reserve_never_takes_more_than_is_in_stock(self):
+        """Test that a reservation is limited to the quantity in stock"""
+        other = create_stocked_product(name="Salt", code="SALT01", quantity="1.00")
+        reserved = Stock.objects.reserve({self.product.pk: Decimal("4"), other.pk: Decimal("3")})
+        assert reserved == {self.product.pk: Decimal("4"), other.pk: Decimal("1.00")}
+        assert Stock.objects.get(pk=other.pk).stock_quantity == Decimal("0.00")
+
+
+class StockVersioningTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.client.force_login(self.user)
+        self.product = create_stocked_product()
+        self.url = reverse("stock-detail", kwargs={"uuid": self.product.stock.uuid})
+
+    def test_stale_copy_is_refused(self):
+        """Test that saving a copy read before another write raises a conflict"""
+        first = Stock.objects.get(pk=self.product.pk)
+        second = Stock.objects.get(pk=self.product.pk)
+        first.price_per_unit_retail = Decimal("110.00")
+        first.save()
+        second.reorder_level = Decimal("3.00")
+        with self.assertRaises(VersionConflict), transaction.atomic():
+            second.save()
+        assert Stock.objects.get(pk=self.product.pk).version == 2
+
+    def test_only_changed_fields_are_written(self):
+        """Test that a save writes the changed fields and skips an unchanged row"""
+        stock = Stock.objects.get(pk=self.product.pk)
+        with self.assertNumQueries(0):
+            stock.save()
+        stock.reorder_level = Decimal("3.00")
+        with CaptureQueriesContext(connection) as queries:
+            stock.save()
+        update = queries.captured_queries[-1]["sql"]
+        assert '"reorder_level"' in update and '"price_per_unit_retail"' not in update
+        assert stock.version == 2
+
+    def test_stock_movements_bump_the_version(self):
+        """Test that a sale moving stock makes an edit of the copy read before it stale"""
+        stock = Stock.objects.get(pk=self.product.pk)
+        Stock.objects.reserve({self.product.pk: Decimal("2")})
+        stock.price_per_unit_retail = Decimal("110.00")
+        with self.assertRaises(VersionConflict), transaction.atomic():
+            stock.save()
+
+    def test_update_with_an_old_version_answers_409(self):
+        """Test that an edit sent with the version it read is refused once that is stale"""
+        version = self.client.get(self.url).json()["version"]
+        Stock.objects.reserve({self.product.pk: Decimal("2")})
+        res = self.client.patch(
+            self.url,
+            {
+                "version": version,
+                "stock_movement_type": Stock.StockInOutType.Purchase,
+                "stock_movement_quantity": "5",
+            },
+            content_type="application/json",
+        )
+        assert res.status_code == 409
+        assert res.json()["version"] == version + 1
+        # the movement made before the conflict was undone with it
+        assert Stock.objects.get(pk=self.product.pk).stock_quantity == Decimal("8.00")
+        res = self.client.patch(
+            self.url,
+            {"version": version + 1, "reorder_level": "3.00"},
+            content_type="application/json",
+        )
+        assert res.status_code == 200
+        assert res.json()["version"] == version + 2
+
+    def test_retry_reads_the_row_again(self):
+        """Test that retry_on_conflict reruns a write that lost a race"""
+        # the first attempt works on a copy read before a sale moved the stock
+        copies = iter([Stock.objects.get(pk=self.product.pk)])
+        Stock.objects.reserve({self.product.pk: Decimal("1")})
+        calls = []
+
+        def reprice():
+            stock = next(copies, None) or Stock.objects.get(pk=self.product.pk)
+            calls.append(stock.version)
+            stock.price_per_unit_retail = Decimal("120.00")
+            stock.save()
+            return stock
+
+        stock = retry_on_conflict(reprice)
+        assert calls == [1, 2]
+        assert stock.price_per_unit_retail == Decimal("120.00") and stock.version == 3
+
+
+class TaxEngineTestCase(TestCase):
+    def test_rates_are_exact(self):
+        """Test that tax is computed from exact decimal rates, not binary floats"""
+        product = Product(tax_type=Product.TaxType.B)
+        assert product.get_total_amount(Decimal("100"), product.tax_type) == Decimal("116.00")
+        assert line_tax(Decimal("0.3125"), Product.TaxType.E) == Decimal("0.02")
+        assert line_tax(Decimal("50.00"), Product.TaxType.A) == Decimal("0.00")
+
+    def test_unknown_tax_types_are_rejected(self):
+        """Test that a code missing from the rate table raises instead of returning None"""
+        with self.assertRaises(ValueError):
+            line_tax(Decimal("10"), "Z")
+
+    def test_cart_is_summarised_per_tax_band(self):
+        """Test that a cart's totals and band summaries add up to its lines"""
+        taxes = cart_tax(
+            [
+                (Decimal("10.05"), Product.TaxType.B),
+                (Decimal("3.30"), "B_16"),
+                (Decimal("7.00"), Product.TaxType.E),
+                (Decimal("2.00"), Product.TaxType.A),
+            ]
+        )
+        assert taxes["line_taxes"] == [
+            Decimal("1.61"),
+            Decimal("0.53"),
+            Decimal("0.56"),
+            Decimal("0.00"),
+        ]
+        assert (taxes["net"], taxes["tax"], taxes["total"]) == (
+            Decimal("22.35"),
+            Decimal("2.70"),
+            Decimal("25.05"),
+        )
+        assert taxes["bands"]["B"] == {
+            "rate": Decimal("0.16"),
+            "taxable": Decimal("13.35"),
+            "tax": Decimal("2.14"),
+        }
+        assert sorted(taxes["bands"]) == ["A", "B", "E"]
+
+
+class StockMovementReportTestCase(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username="clerk", password="password"))
+        self.product = create_stocked_product()
+        self.stock = Stock.objects.get(pk=self.product.pk)
+
+    def test_report_lists_every_movement_in_range(self):
+        """Test that the report returns all movements of a product, not only the last"""
+        self.stock.update_stock_quantity(Stock.StockInOutType.Purchase, "5", "restock")
+        self.stock.update_stock_quantity(Stock.StockInOutType.Sale, "1", "Sale made")
+        today = timezone.localdate().isoformat()
+        res = self.client.post(
+            reverse("stock-generate-stock-movement-report"),
+            {"start_date": today, "end_date": today},
+            content_type="application/json",
+        )
+        movements = res.json()["stock_movement_report"]["stock_movement"]
+        assert [movement["stock_movement_remarks"] for movement in movements] == [
+            "restock",
+            "Sale made",
+        ]
+        assert Decimal(str(movements[-1]["stock_quantity"])) == Decimal("14.00")
+
+
+class StockExportTestCase(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username="clerk", password="password"))
+
+    def test_stock_levels_are_streamed_as_csv(self):
+        """Test that the stock export streams a CSV row for every stocked product"""
+        create_stocked_product()
+        create_stocked_product(name="Salt", code="SALT01", quantity="3.00")
+        res = self.client.get(reverse("stock-export"))
+        rows = b"".join(res.streaming_content).decode().splitlines()
+        assert rows[0].startswith("uuid,product,product_code,product_name,stock_quantity")
+        assert [row.split(",")[2:5] for row in rows[1:]] == [
+            ["SUG01", "Sugar", "10.00"],
+            ["SALT01", "Salt", "3.00"],
+        ]
+
+
+class ProductSearchTestCase(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username="clerk", password="password"))
+        self.sugar = create_stocked_product(name="Brown Sugar", code="SUG01")
+        self.sugar_cane = create_stocked_product(name="Sugarcane Juice", code="JUI01")
+        self.salt = create_stocked_product(name="Salt", code="SUGAR")
+        Product.objects.filter(pk=self.salt.pk).update(description="Not to be mistaken for sugar")
+
+    def search(self, url_name, query, **data):
+        return self.client.post(
+            reverse(url_name), {"query": query, **data}, content_type="application/json"
+        ).json()
+
+    def test_products_are_ranked_by_relevance(self):
+        """Test that an exact code wins, then names starting with the query, then other matches"""
+        results = [product["code"] for product in self.search("products-search", "sugar")]
+        assert results == ["SUGAR", "JUI01", "SUG01"]
+
+    def test_description_words_are_searched(self):
+        """Test that products are found by the words of their description"""
+        results = self.search("products-search", "mistaken")
+        assert [product["name"] for product in results] == ["Salt"]
+
+    def test_results_are_limited(self):
+        """Test that a search returns no more results than asked for"""
+        assert len(self.search("products-search", "sugar", limit=2)) == 2
+
+    def test_stock_search_returns_best_match(self):
+        """Test that the stock search returns the stock of the best matching product"""
+        assert self.search("stock-search", "SUG01")["product_id"]["code"] == "SUG01"
+        assert self.search("stock-search", "nothing like it") == {"stocks": []}
+
+    def test_categories_are_found_by_name_or_uuid(self):
+        """Test that categories match on name or on their exact uuid"""
+        category = Category.objects.get(name="General")
+        assert [c["name"] for c in self.search("categories-search", "gener")] == ["General"]
+        assert [c["name"] for c in self.search("categories-search", str(category.uuid))] == [
+            "General"
+        ]
+
+
+class SearchIndexMigrationsTestCase(SimpleTestCase):
+    databases = {"default"}
+
+    @skipUnless(connection.vendor == "postgresql", "the search indexes are only built on PostgreSQL")
+    def test_search_indexes_are_built_on_postgres(self):
+        """Test that the migrations build the search indexes kept out of the models' Meta"""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE indexname LIKE %s", ["%_trgm"])
+            trigram_indexes = {row[0] for row in cursor.fetchall()}
+            cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'product_search_vector'")
+            assert cursor.fetchone() is not None
+        if trigram_indexes:
+            assert trigram_indexes == {"category_name_trgm", "product_name_trgm", "product_code_trgm"}
+
+    def test_migrations_apply_on_sqlite(self):
+        """Test that every migration applies on SQLite, where the search indexes are left out"""
+        with tempfile.TemporaryDirectory() as directory:
+            result = subprocess.run(
+                [sys.executable, "manage.py", "migrate", "--no-input"],
+                cwd=settings.BASE_DIR,
+                env={
+                    **os.environ,
+                    "DATABASE_URL": f"sqlite:///{directory}/db.sqlite3",
+                    "DJANGO_SETTINGS_MODULE": "config.settings.test",
+                },
+                capture_output=True,
+                text=True,
+            )
+        assert result.returncode == 0, result.stderr
+
+
+@override_settings(SCAN_INDEX_REFRESH_SECONDS=60)
+class ScanIndexTestCase(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username="clerk", password="password"))
+        scan_index.clear()
+        self.product = create_stocked_product()
+
+    def scan(self, code):
+        return self.client.get(reverse("products-scan"), {"code": code})
+
+    def test_scan_returns_product_stock_price_and_tax(self):
+        """Test that a scanned code returns what the till needs to ring it up"""
+        entry = self.scan("SUG01").json()
+        assert entry["uuid"] == str(self.product.uuid)
+        assert entry["tax_type"] == Product.TaxType.B
+        assert Decimal(entry["price_per_unit_retail"]) == Decimal("100.00")
+        assert Decimal(entry["stock_quantity"]) == Decimal("10.00")
+        assert self.scan("UNKNOWN").status_code == 404
+
+    def test_warm_lookups_do_not_touch_the_database(self):
+        """Test that a code already in the index is answered from memory"""
+        scan_index.lookup("SUG01")
+        with self.assertNumQueries(0):
+            assert scan_index.lookup("SUG01")["code"] == "SUG01"
+
+    def test_new_products_are_found_before_the_next_refresh(self):
+        """Test that a product created after the last refresh is read by its code"""
+        scan_index.lookup("SUG01")
+        create_stocked_product(name="Salt", code="SALT01")
+        assert scan_index.lookup("SALT01")["name"] == "Salt"
+
+    def test_refresh_applies_changed_rows(self):
+        """Test that a refresh picks up changed stock and renamed codes"""
+        scan_index.lookup("SUG01")
+        Stock.objects.get(pk=self.product.pk).update_stock_quantity(
+            Stock.StockInOutType.Sale, "4", "Sale made"
+        )
+        Product.objects.filter(pk=self.product.pk).update(
+            code="SUG02", updated_at=timezone.now()
+        )
+        scan_index.refresh(force=True)
+        assert "SUG01" not in scan_index.entries
+        assert scan_index.lookup("SUG02")["stock_quantity"] == Decimal("6.00")
+
+    def test_refresh_drops_deleted_products(self):
+        """Test that a deleted product is no longer found once the index is refreshed"""
+        salt = create_stocked_product(name="Salt", code="SALT01")
+        assert self.scan("SALT01").status_code == 200
+        Stock.objects.filter(pk=self.product.pk).delete()
+        salt.delete()
+        scan_index.refresh(force=True)
+        assert self.scan("SALT01").status_code == 404
+        assert self.scan("SUG01").json()["stock"] is None
+
+
+class CatalogueSyncTestCase(TransactionTestCase):
+    # on PostgreSQL a sync only sees past writes that have committed, which
+    # the writes of a TestCase never do
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username="clerk", password="password"))
+        self.sugar = create_stocked_product()
+        self.salt = create_stocked_product(name="Salt", code="SALT01")
+
+    def changes(self, since=None):
+        params = {"since": since} if since else {}
+        return self.client.get(reverse("catalogue-changes"), params).json()
+
+    def age_catalogue(self):
+        """move every change past the overlap a sync resends"""
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        for model in (Category, Product, Stock):
+            model.objects.update(updated_at=an_hour_ago)
+
+    def test_first_sync_returns_the_whole_catalogue(self):
+        """Test that a sync without a token sends every row"""
+        changes = self.changes()
+        assert changes["full"] is True
+        assert sorted(product["code"] for product in changes["products"]) == ["SALT01", "SUG01"]
+        assert len(changes["stock"]) == 2
+        assert [category["name"] for category in changes["categories"]] == ["General"]
+
+    def test_sync_returns_only_rows_changed_since_the_token(self):
+        """Test that a sync with a token sends only the changed stock"""
+        self.age_catalogue()
+        token = self.changes()["token"]
+        Stock.objects.get(pk=self.salt.pk).update_stock_quantity(
+            Stock.StockInOutType.Purchase, "5", "restock"
+        )
+        changes = self.changes(token)
+        assert changes["full"] is False
+        assert changes["products"] == []
+        assert [row["product"] for row in changes["stock"]] == [str(self.salt.uuid)]
+        assert Decimal(str(changes["stock"][0]["stock_quantity"])) == Decimal("15.00")
+        assert int(changes["token"].lstrip("x")) >= int(token.lstrip("x"))
+
+    def test_deleted_rows_are_sent_as_tombstones(self):
+        """Test that a deleted product and its stock are reported as deleted"""
+        self.age_catalogue()
+        token = self.changes()["token"]
+        stock_uuid = Stock.objects.get(pk=self.sugar.pk).uuid
+        self.sugar.delete()
+        deleted = self.changes(token)["deleted"]
+        assert deleted["products"] == [str(self.sugar.uuid)]
+        assert deleted["stock"] == [str(stock_uuid)]
+        assert deleted["categories"] == []
+
+    def test_malformed_token_is_rejected(self):
+        """Test that a token that is not a number is answered with a 400"""
+        res = self.client.get(reverse("catalogue-changes"), {"since": "yesterday"})
+        assert res.status_code == 400
+
+    @skipUnless(connection.vendor == "postgresql", "only PostgreSQL orders changes by transaction")
+    def test_writes_committed_after_a_sync_are_sent_by_the_next(self):
+        """Test that a write stamped before a sync but committed after it is not skipped"""
+        token = self.changes()["token"]
+        written, synced = threading.Event(), threading.Event()
+
+        def restock():
+            try:
+                with transaction.atomic():
+                    Stock.objects.get(pk=self.salt.pk).update_stock_quantity(
+                        Stock.StockInOutType.Purchase, "5", "restock"
+                    )
+                    written.set()
+                    synced.wait(10)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(restock)
+            written.wait(10)
+            changes = self.changes(token)
+            synced.set()
+        assert changes["stock"] == []
+        assert [row["product"] for row in self.changes(changes["token"])["stock"]] == [str(self.salt.uuid)]
+
+    def test_token_from_before_transaction_ordering_gets_a_full_sync(self):
+        """Test that a token of the other kind is answered with the whole catalogue"""
+        other = "x1" if connection.vendor != "postgresql" else "1"
+        changes = self.changes(other)
+        assert changes["full"] is True
+        assert len(changes["products"]) == 2
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password", is_staff=True)
+        self.client.force_login(self.user)
+        self.sugar = create_stocked_product()
+
+    def stats(self):
+        return self.client.get(reverse("cache-stats")).json()
+
+    def test_repeated_list_is_served_from_the_cache(self):
+        """Test that a second identical request skips the database"""
+        first = self.client.get(reverse("products-list")).json()
+        # only the session and user queries every request makes, a read needs
+        # no savepoint now that it runs outside the request transaction
+        with self.assertNumQueries(2):
+            second = self.client.get(reverse("products-list")).json()
+        assert first == second
+        stats = self.stats()["endpoints"]["ProductViewSet.list"]
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    def test_query_parameters_are_part_of_the_key(self):
+        """Test that requests for different pages are cached apart"""
+        create_stocked_product(name="Salt", code="SALT01")
+        assert self.client.get(reverse("products-list"), {"limit": 1}).json()["count"] == 2
+        assert len(self.client.get(reverse("products-list")).json()["results"]) == 2
+        assert len(self.client.get(reverse("products-list"), {"limit": 1}).json()["results"]) == 1
+
+    def test_writes_invalidate_the_cached_responses(self):
+        """Test that saving or deleting a model serves fresh responses"""
+        url = reverse("categories-list")
+        assert self.client.get(url).json()["results"][0]["name"] == "General"
+        category = Category.objects.get(name="General")
+        category.name = "Groceries"
+        category.save()
+        assert self.client.get(url).json()["results"][0]["name"] == "Groceries"
+
+        products_url = reverse("products-detail", kwargs={"uuid": self.sugar.uuid})
+        assert self.client.get(products_url).json()["category"]["name"] == "Groceries"
+        self.sugar.delete()
+        assert self.client.get(products_url).status_code == 404
+
+    def test_stats_are_for_admins_only(self):
+        """Test that the cache stats are hidden from regular users"""
+        self.client.force_login(User.objects.create_user(username="clerk", password="password"))
+        assert self.client.get(reverse("cache-stats")).status_code == 403
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, MEDIA_ROOT=tempfile.mkdtemp())
+class CategoryThumbnailTestCase(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username="clerk", password="password"))
+
+    def upload(self, category, color="red"):
+        buffer = BytesIO()
+        Image.new("RGB", (1200, 800), color).save(buffer, "PNG")
+        with self.captureOnCommitCallbacks(execute=True):
+            category.image.save("drinks.png", ContentFile(buffer.getvalue()))
+        category.refresh_from_db()
+        return category
+
+    def test_upload_renders_every_size_as_webp(self):
+        """Test that uploading an image queues WebP thumbnails fitted to each size"""
+        category = self.upload(Category.objects.create(name="Drinks"))
+        assert sorted(category.thumbnails) == ["large", "medium", "small"]
+        assert category.thumbnail.name == category.thumbnails["small"]
+        for size, box in (("small", 150), ("large", 600)):
+            with default_storage.open(category.thumbnails[size]) as stored:
+                image = Image.open(stored)
+                assert image.format == "WEBP"
+                assert image.size == (box, box * 2 // 3)
+
+        res = self.client.get(reverse("categories-detail", kwargs={"uuid": category.uuid}))
+        assert res.json()["thumbnails"]["medium"].endswith(category.thumbnails["medium"])
+
+    def test_thumbnail_names_follow_the_image_content(self):
+        """Test that the same image keeps its thumbnails and a new one gets new ones"""
+        first = self.upload(Category.objects.create(name="Drinks"))
+        second = self.upload(Category.objects.create(name="Sodas"))
+        assert first.thumbnails == second.thumbnails
+        third = self.upload(second, color="blue")
+        assert third.thumbnails["small"] != first.thumbnails["small"]
+
+    def test_reading_a_category_renders_nothing(self):
+        """Test that a category without thumbnails is read without rendering them"""
+        category = Category.objects.create(name="Drinks")
+        category.image.save("drinks.png", ContentFile(b"not decoded"), save=False)
+        Category.objects.filter(pk=category.pk).update(image=category.image.name)
+        res = self.client.get(reverse("categories-detail", kwargs={"uuid": category.uuid}))
+        assert res.json()["thumbnails"] == {}
+        assert Category.objects.get(pk=category.pk).thumbnails_source == ""
+
+    def test_backfill_renders_outdated_thumbnails(self):
+        """Test that the backfill command renders thumbnails of images that lack them"""
+        buffer = BytesIO()
+        Image.new("RGB", (300, 300), "green").save(buffer, "PNG")
+        category = Category.objects.create(name="Drinks")
+        category.image.save("drinks.png", ContentFile(buffer.getvalue()), save=False)
+        Category.objects.filter(pk=category.pk).update(image=category.image.name)
+        call_command("backfill_thumbnails", stdout=StringIO())
+        category.refresh_from_db()
+        assert not category.thumbnails_outdated
+        assert sorted(category.thumbnails) == ["large", "medium", "small"]
+
+
+@skipUnless(connection.vendor == "postgresql", "the stand-in replica is a second database on the PostgreSQL server")
+@skipUnless("replica1" in settings.DATABASES, "no primary database to stand a replica in for")
+@override_settings(REPLICA_DATABASES=["replica1"])
+class ReplicaRoutingTestCase(TestCase):
+    databases = {"default", "replica1"}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.client.force_login(self.user)
+        self.product = create_stocked_product()
+        self.stock_url = reverse("stock-detail", kwargs={"uuid": self.product.stock.uuid})
+
+    def list_names(self, client, url_name):
+        return [row["name"] for row in client.get(reverse(url_name)).json()["results"]]
+
+    def test_catalogue_lists_read_from_a_replica(self):
+        """Test that list endpoints read the replica while other reads stay on the primary"""
+        Category.objects.using("replica1").create(name="Replica only")
+        assert self.list_names(self.client, "categories-list") == ["Replica only"]
+        assert self.client.get(reverse("stock-list")).json()["results"] == []
+        assert self.client.get(self.stock_url).status_code == 200
+
+    def test_writer_reads_their_own_writes(self):
+        """Test that a user who has written is pinned to the primary for a while"""
+        other = self.client_class()
+        other.force_login(User.objects.create_user(username="clerk", password="password"))
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.patch(
+                self.stock_url, {"reorder_level": "3.00"}, content_type="application/json"
+            )
+        assert res.status_code == 200
+        assert len(self.client.get(reverse("stock-list")).json()["results"]) == 1
+        assert other.get(reverse("stock-list")).json()["results"] == []
+
+        # the replica's answer right after a write is not kept in the response cache
+        assert self.list_names(other, "categories-list") == []
+        Category.objects.using("replica1").create(name="Replayed")
+        assert self.list_names(other, "categories-list") == ["Replayed"]
+
+    def test_reports_read_from_a_replica(self):
+        """Test that a sales report runs its queries on the replica"""
+        with CaptureQueriesContext(connections["replica1"]) as queries:
+            self.client.post(
+                reverse("sales-generate-sales-report"),
+                {"start_date": "2024-01-01", "end_date": "2024-01-31"},
+                content_type="application/json",
+            )
+        assert len(queries)
+
+
+@skipUnless(connection.vendor == "postgresql", "row locks need a server database")
+class StockReservationConcurrencyTestCase(TransactionTestCase):
+    sales = 300
+    tills = 16
+
+    def setUp(self):
+        self.product = create_stocked_product(quantity="250.00")
+        self.other = create_stocked_product(name="Salt", code="SALT01", quantity="1000.00")
+
+    def sell(self, index):
+        try:
+            # alternate the order in which carts list the products so that
+            # only the lock ordering keeps the tills from deadlocking
+            if index % 2:
+                quantities = {self.product.pk: Decimal("1"), self.other.pk: Decimal("1")}
+            else:
+                quantities = {self.other.pk: Decimal("1"), self.product.pk: Decimal("1")}
+            with transaction.atomic():
+                return Stock.objects.reserve(quantities)[self.product.pk]
+        finally:
+            connection.close()
+
+    def test_parallel_sales_of_one_product_are_exact(self):
+        """Test that hundreds of parallel sales never lose an update or oversell"""
+        with ThreadPoolExecutor(max_workers=self.tills) as executor:
+            sold = list(executor.map(self.sell, range(self.sales)))
+        assert sum(sold) == Decimal("250")
+        assert Stock.objects.get(pk=self.product.pk).stock_quantity == Decimal("0.00")
+        assert Stock.objects.get(pk=self.other.pk).stock_quantity == Decimal("700.00")
+
+
+@skipUnless(connection.vendor == "postgresql", "read-only transactions need PostgreSQL")
+class ReadOnlyRequestsTestCase(TransactionTestCase):
+    read_only = "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.client.force_login(self.user)
+        self.product = create_stocked_product()
+
+    def statements(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            res = getattr(self.client, method)(url, data, content_type="application/json")
+        assert res.status_code == 200
+        return [query["sql"] for query in queries]
+
+    def test_reads_skip_the_request_transaction(self):
+        """Test that a catalogue GET runs in autocommit while a write stays atomic"""
+        assert "BEGIN" not in self.statements("get", reverse("products-list"))
+        statements = self.statements(
+            "patch",
+            reverse("stock-detail", kwargs={"uuid": self.product.stock.uuid}),
+            {"reorder_level": "3.00"},
+        )
+        assert "BEGIN" in statements and self.read_only not in statements
+
+    @override_settings(READ_ONLY_TRANSACTIONS=True)
+    def test_reads_can_run_in_a_read_only_snapshot(self):
+        """Test that with READ_ONLY_TRANSACTIONS a GET runs in one read-only transaction"""
+        statements = self.statements("get", reverse("products-list"))
+        assert statements[:2] == ["BEGIN", self.read_only]
+
+    def test_writes_fail_in_a_read_only_transaction(self):
+        """Test that a write slipped into a read-only transaction is refused"""
+        with self.assertRaises(DatabaseError), read_only_transaction():
+            Category.objects.create(name="Spices")
+        assert not Category.objects.filter(name="Spices").exists()
+
+    @override_settings(READ_ONLY_REQUESTS=False)
+    def test_read_only_requests_can_be_turned_off(self):
+        """Test that reads go back to the request transaction with the setting off"""
+        assert "BEGIN" in self.statements("get", reverse("products-list"))
@@ -0,0 +1,73 @@
+"""
+Category thumbnails, rendered by a Celery task once an image is uploaded so no
+request ever decodes an image. Every size is stored as WebP under a name
+derived from the image's content, so a re-run or a re-upload of the same
+image writes nothing new
+"""
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from pos_inventory.utils.response_cache import bump_generation
+from products.models import Category
+
+# size name to the box the thumbnail is fitted in
+THUMBNAIL_SIZES = {"small": (150, 150), "medium": (300, 300), "large": (600, 600)}
+# the size also kept in the thumbnail field older clients read
+DEFAULT_THUMBNAIL = "small"
+THUMBNAIL_QUALITY = 80
+
+
+def render_thumbnails(content):
+    """
+    Return the WebP bytes of each thumbnail size of an image
+    """
+    with Image.open(BytesIO(content)) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    thumbnails = {}
+    for name, size in THUMBNAIL_SIZES.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail(size, Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        thumbnail.save(buffer, "WEBP", quality=THUMBNAIL_QUALITY, method=6)
+        thumbnails[name] = buffer.getvalue()
+    return thumbnails
+
+
+def generate_category_thumbnails(category_id):
+    """
+    Render and store the thumbnails of a category's current image, or clear
+    them when it has none. Returns the stored thumbnail names by size
+    """
+    category = Category.objects.filter(pk=category_id).first()
+    if category is None:
+        return {}
+    source = category.image.name or ""
+    thumbnails = {}
+    if source:
+        with category.image.open("rb") as image:
+            content = image.read()
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        for name, data in render_thumbnails(content).items():
+            path = f"thumbnails/{digest}-{name}.webp"
+            if not default_storage.exists(path):
+                path = default_storage.save(path, ContentFile(data))
+            thumbnails[name] = path
+
+    # only record them if the image was not replaced while they were rendered
+    updated = Category.objects.filter(pk=category_id, image=category.image.name).update(
+        thumbnail=thumbnails.get(DEFAULT_THUMBNAIL, ""),
+        thumbnails=thumbnails,
+        thumbnails_source=source,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        # a bulk UPDATE sends no post_save for the cached responses to notice
+        bump_generation(Category)
+    return thumbnails
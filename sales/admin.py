@@ -1,9 +1,26 @@
 from django.contrib import admin
 
-from .models import PaymentMode, Sales, Customer, ProductSales
+from .models import (
+    CashRegister,
+    PaymentMode,
+    Sales,
+    Customer,
+    ProductSales,
+    DailySalesRollup,
+    DailyProductRollup,
+    IdempotencyKey,
+    ReportJob,
+    TillDrawer,
+)
 
 # Register your models here.
 admin.site.register(Sales)
 admin.site.register(PaymentMode)
 admin.site.register(Customer)
 admin.site.register(ProductSales)
+admin.site.register(DailySalesRollup)
+admin.site.register(DailyProductRollup)
+admin.site.register(ReportJob)
+admin.site.register(CashRegister)
+admin.site.register(TillDrawer)
+admin.site.register(IdempotencyKey)
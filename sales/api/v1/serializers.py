@@ -2,11 +2,23 @@
 Module for creating serializerd for Sales application models
 """
 from typing import Any
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 
 from administration.models import Business, Employee
 from administration.api.v1.serializers import BusinessSerializer, EmployeeSerializer
-from sales.models import PaymentMode, ProductSales, Sales, Customer, Purchase
+from sales.change import DENOMINATIONS
+from sales.models import (
+    CashRegister,
+    Customer,
+    PaymentMode,
+    ProductSales,
+    Purchase,
+    ReportJob,
+    Sales,
+    TillDrawer,
+)
 from products.models import Product
 from products.api.v1.serializers import ProductSerializer
 
@@ -36,7 +48,7 @@ class PaymentModeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PaymentMode
-        fields = ["uuid", "payment_method", "properties"]
+        fields = ["uuid", "payment_method", "properties", "version"]
 
 class SalesSerializer(serializers.ModelSerializer):
     """
@@ -64,6 +76,7 @@ class SalesSerializer(serializers.ModelSerializer):
             "transaction_type",
             "receipt_label",
             "sale_status",
+            "version",
             "created_at",
             "updated_at",
         ]
@@ -105,6 +118,148 @@ class ProductSalesSerializer(serializers.ModelSerializer):
         ]
 
 
+class CheckoutLineSerializer(serializers.Serializer):
+    """
+    Serializer for a single cart line submitted at checkout
+    """
+
+    product = serializers.UUIDField()
+    quantity_sold = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0
+    )
+    is_wholesale = serializers.BooleanField(default=False)
+
+
+def validate_denominations(value):
+    """
+    Reject counts keyed by anything but a denomination a till drawer holds
+    """
+    unknown = [key for key in value if not key.isdigit() or int(key) not in DENOMINATIONS]
+    if unknown:
+        raise serializers.ValidationError(f"Unknown denominations {unknown}")
+    return value
+
+
+class TillDrawerSerializer(serializers.ModelSerializer):
+    """
+    Serializer for TillDrawer model
+    """
+
+    class Meta:
+        model = TillDrawer
+        fields = ["denomination", "count", "updated_at"]
+
+
+class CashRegisterSerializer(serializers.ModelSerializer):
+    """
+    Serializer for CashRegister model with the counts in its drawer
+    """
+
+    business = serializers.SlugRelatedField(
+        slug_field="uuid",
+        queryset=Business.objects.all(),
+        required=False,
+        allow_null=True,
+    )
+    drawer = TillDrawerSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = CashRegister
+        fields = ["uuid", "business", "name", "drawer", "created_at", "updated_at"]
+
+
+class CashDepositSerializer(serializers.Serializer):
+    """
+    Serializer for notes and coins put into a cash register's drawer
+    """
+
+    counts = serializers.DictField(
+        child=serializers.IntegerField(min_value=0), validators=[validate_denominations]
+    )
+
+
+class DenominationBreakDownSerializer(serializers.Serializer):
+    """
+    Serializer for one note or coin swapped for smaller ones
+    """
+
+    denomination = serializers.ChoiceField(choices=DENOMINATIONS)
+    into = serializers.DictField(
+        child=serializers.IntegerField(min_value=0), validators=[validate_denominations]
+    )
+
+
+class BreakDownSerializer(serializers.Serializer):
+    """
+    Serializer for the notes and coins broken down in a sale's cash register
+    """
+
+    denominations = DenominationBreakDownSerializer(many=True, allow_empty=False)
+
+
+class CheckoutPaymentSerializer(serializers.Serializer):
+    """
+    Serializer for the payment submitted at checkout
+    """
+
+    payment_mode = serializers.CharField()
+    amount_paid = serializers.DecimalField(max_digits=10, decimal_places=2)
+    # the till taking a cash payment and the notes and coins handed over
+    register = serializers.UUIDField(required=False, allow_null=True)
+    tendered = serializers.DictField(
+        child=serializers.IntegerField(min_value=0),
+        required=False,
+        validators=[validate_denominations],
+    )
+
+
+class CheckoutSerializer(serializers.Serializer):
+    """
+    Serializer for a whole cart submitted to the checkout endpoint
+    """
+
+    customer_id = serializers.UUIDField(required=False, allow_null=True)
+    business_id = serializers.UUIDField()
+    cashier_id = serializers.UUIDField()
+    receipt_type = serializers.ChoiceField(choices=Sales.SalesReceiptType.choices)
+    transaction_type = serializers.ChoiceField(
+        choices=Sales.TransactionType.choices
+    )
+    lines = CheckoutLineSerializer(many=True, allow_empty=False)
+    payment = CheckoutPaymentSerializer()
+
+
+class BatchSaleSerializer(CheckoutSerializer):
+    """
+    Serializer for one sale a terminal queued while offline, a checkout cart
+    with the terminal's own id for it and the time it was made
+    """
+
+    client_reference = serializers.CharField(max_length=64)
+    sold_at = serializers.DateTimeField(required=False)
+
+    def validate_sold_at(self, value):
+        if value > timezone.now():
+            raise serializers.ValidationError("A sale cannot be made in the future")
+        return value
+
+
+class SalesBatchSerializer(serializers.Serializer):
+    """
+    Serializer for a batch of offline sales. Each sale is validated on its
+    own by BatchSaleSerializer so one bad sale does not reject the batch
+    """
+
+    sales = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_sales(self, value):
+        if len(value) > settings.SALES_BATCH_MAX_SALES:
+            raise serializers.ValidationError(
+                f"A batch holds at most {settings.SALES_BATCH_MAX_SALES} sales"
+            )
+        return value
+
+
 class PurchaseSerializer(serializers.ModelSerializer):
     """Serializer for Purchase model"""
 
@@ -121,3 +276,54 @@ class PurchaseSerializer(serializers.ModelSerializer):
             "purchase_amount",
             "description",
         ]
+
+
+class ReportRequestSerializer(serializers.Serializer):
+    """
+    Serializer for a report to be generated in the background
+    """
+
+    report_type = serializers.ChoiceField(choices=ReportJob.ReportType.choices)
+    report_format = serializers.ChoiceField(
+        choices=ReportJob.ReportFormat.choices, default=ReportJob.ReportFormat.JSON
+    )
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    product = serializers.UUIDField(required=False)
+
+    def validate(self, attrs):
+        if attrs["start_date"] > attrs["end_date"]:
+            raise serializers.ValidationError("start_date must not be after end_date")
+        if "product" in attrs and attrs["report_type"] != ReportJob.ReportType.STOCK_MOVEMENT:
+            raise serializers.ValidationError(
+                {"product": "Only stock movement reports can be limited to a product"}
+            )
+        return attrs
+
+    @property
+    def parameters(self):
+        """Report parameters in the form they are stored on the job"""
+        parameters = {
+            "start_date": self.validated_data["start_date"].isoformat(),
+            "end_date": self.validated_data["end_date"].isoformat(),
+        }
+        if "product" in self.validated_data:
+            parameters["product"] = str(self.validated_data["product"])
+        return parameters
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Serializer for ReportJob model"""
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            "uuid",
+            "report_type",
+            "report_format",
+            "parameters",
+            "status",
+            "error",
+            "created_at",
+            "finished_at",
+        ]
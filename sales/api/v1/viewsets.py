@@ -1,13 +1,18 @@
 """
 Model defining viewsets for Sales API's
 """
+import os
 from datetime import datetime
-from decimal import Decimal, ROUND_HALF_EVEN
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404, get_list_or_404
+from django.utils import timezone
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
-from decimal import Decimal, ROUND_HALF_EVEN
+from decimal import Decimal
 from django.shortcuts import get_object_or_404, get_list_or_404
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -15,25 +20,75 @@ from rest_framework.viewsets import ViewSet
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, extend_schema
 
+from pos_inventory.utils.db_router import replica_view
+from pos_inventory.utils.eager_loading import eager_load
+from pos_inventory.utils.pagination import (
+    CreatedAtCursorPagination,
+    PaginatedViewSetMixin,
+)
+from pos_inventory.utils.parsers import CompressedJSONParser
+from pos_inventory.utils.versioning import reports_conflicts, retry_on_conflict
+from pos_inventory.utils.exports import EXPORT_PARAMETERS, export_options, stream_export
 from products.models import Product, Stock
-from sales.models import PaymentMode, ProductSales, Sales, Customer, Supplier, Purchase
+from products.tax import UnknownTaxType, cart_tax, line_tax, tax_band
+from sales.idempotency import idempotent
+from sales.ingest import ingest_sales
+from sales.reports import sales_report
+from sales.tasks import generate_report
+from sales.models import (
+    PAYMENT_MODE_CODES,
+    CashRegister,
+    Customer,
+    DailyProductRollup,
+    DailySalesRollup,
+    PaymentMode,
+    ProductSales,
+    Purchase,
+    ReportJob,
+    Sales,
+    Supplier,
+    day_range,
+)
 from administration.models import Employee, Business
 from .serializers import (
+    BreakDownSerializer,
+    CashDepositSerializer,
+    CashRegisterSerializer,
+    CheckoutSerializer,
+    CheckoutPaymentSerializer,
     PaymentModeSerializer,
     ProductSalesSerializer,
     SalesSerializer,
     CustomerSerializer,
     PurchaseSerializer,
+    ReportJobSerializer,
+    ReportRequestSerializer,
+    SalesBatchSerializer,
 )
 
 
-class SalesViewSet(ViewSet):
+class SalesViewSet(PaginatedViewSetMixin, ViewSet):
     """
     API endpoint that allows Sales to be viewed or edited.
     """
 
     serializer_class = SalesSerializer
+    pagination_class = CreatedAtCursorPagination
     lookup_field = "uuid"
+    export_columns = {
+        "uuid": "uuid",
+        "created_at": "created_at",
+        "customer": "customer_id__uuid",
+        "business": "business_id__uuid",
+        "cashier": "cashier_id__uuid",
+        "payment_method": "payment_id__payment_method",
+        "receipt_type": "receipt_type",
+        "transaction_type": "transaction_type",
+        "receipt_label": "receipt_label",
+        "sale_status": "sale_status",
+        "sale_amount_with_tax": "sale_amount_with_tax",
+        "tax_amount": "tax_amount",
+    }
 
     @property
     def sales_queryset(self):
@@ -63,8 +118,7 @@ class SalesViewSet(ViewSet):
         """
         List all Sales.
         """
-        serializer = SalesSerializer(self.sales_queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.sales_queryset, SalesSerializer)
 
     @extend_schema(
         parameters=[
@@ -79,10 +133,12 @@ class SalesViewSet(ViewSet):
     )
     def retrieve(self, request, uuid=None):
         """Retrieve a Sale indentified by uuid"""
-        sale = get_object_or_404(self.sales_queryset, uuid=uuid)
-        serializer = SalesSerializer(sale)
-        return Response(serializer.data)
+        sale = get_object_or_404(
+            eager_load(self.sales_queryset, SalesSerializer), uuid=uuid
+        )
+        return self.object_response(sale, SalesSerializer)
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """Create a new Sale"""
         data = request.data
@@ -116,12 +172,13 @@ class SalesViewSet(ViewSet):
             )
         ],
     )
+    @reports_conflicts
     def update(self, request, uuid=None):
         """Update a Sale"""
         sale = get_object_or_404(self.sales_queryset, uuid=uuid)
         serializer = SalesSerializer(sale, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            self.save_sale(serializer)
             return Response(serializer.data, status=200)
         return Response(serializer.errors, status=400)
 
@@ -136,15 +193,28 @@ class SalesViewSet(ViewSet):
             )
         ],
     )
+    @reports_conflicts
     def partial_update(self, request, uuid=None):
         """Update a Sale"""
         sale = get_object_or_404(self.sales_queryset, uuid=uuid)
         serializer = SalesSerializer(sale, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            self.save_sale(serializer)
             return Response(serializer.data, status=200)
         return Response(serializer.errors, status=400)
 
+    def save_sale(self, serializer):
+        """
+        Save an updated sale, moving it in the daily rollups when it was or
+        becomes approved, as its status, amounts or keys may have changed
+        """
+        sale = serializer.instance
+        if sale.sale_status == Sales.TransactionProgress.Approved:
+            sale.roll_up(-1)
+        serializer.save()
+        if sale.sale_status == Sales.TransactionProgress.Approved:
+            sale.roll_up()
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -159,10 +229,13 @@ class SalesViewSet(ViewSet):
     def destroy(self, request, uuid=None):
         """Delete a Sale"""
         sale = get_object_or_404(self.sales_queryset, uuid=uuid)
+        if sale.sale_status == Sales.TransactionProgress.Approved:
+            sale.roll_up(-1)
         sale.delete()
         return Response(status=204)
 
     @extend_schema(
+        request=CheckoutPaymentSerializer,
         parameters=[
             OpenApiParameter(
                 name="uuid",
@@ -174,25 +247,52 @@ class SalesViewSet(ViewSet):
         ],
     )
     @action(detail=True, methods=["post"])
+    @reports_conflicts
+    @idempotent
     def generate_receipt(self, request, uuid=None):
         """
         Complete a Sale by adding the requisite data and creating the related
         product sale object
         """
-        payment_mode_mapping = {
-            "CASH": "01",
-            "CREDIT": "02",
-            "CASH/CREDIT": "03",
-            "BANK CHECK": "04",
-            "DEBIT AND CREDIT CARD": "05",
-            "MOBILE MONEY": "06",
-            "OTHER": "07",
-        }
-        payment_mode = request.data.get("payment_mode")
-        amount_paid = request.data.get("amount_paid")
-        sale = get_object_or_404(self.sales_queryset, uuid=uuid)
-        business = get_object_or_404(Business, id=sale.business_id.id)
-        product_sales = sale.product_sales.all()
+        payment_serializer = CheckoutPaymentSerializer(data=request.data)
+        if not payment_serializer.is_valid():
+            return Response(payment_serializer.errors, status=400)
+        payment = payment_serializer.validated_data
+        sale = get_object_or_404(
+            self.sales_queryset.select_related("business_id"), uuid=uuid
+        )
+        product_sales = sale.product_sales.select_related("product")
+        try:
+            with transaction.atomic():
+                receipt_data = self.complete_sale(
+                    sale,
+                    product_sales,
+                    payment["payment_mode"],
+                    payment["amount_paid"],
+                    **self.register_payment(payment),
+                )
+        except UnknownTaxType as error:
+            return Response({"message": f"{error} on a line of the sale"}, status=400)
+        return Response(receipt_data)
+
+    def register_payment(self, payment):
+        """
+        The register and cash tendered a payment names, for complete_sale
+        """
+        register = None
+        if payment.get("register"):
+            register = get_object_or_404(CashRegister, uuid=payment["register"])
+        return {"register": register, "tendered": payment.get("tendered")}
+
+    def complete_sale(
+        self, sale, product_sales, payment_mode, amount_paid, register=None, tendered=None
+    ):
+        """
+        Attach the payment mode to a sale, approve it and build its receipt.
+        Cash tendered goes into the register's drawer and the change comes out of it.
+        Raises UnknownTaxType for a line taxed at a code the rate table does not know
+        """
+        business = sale.business_id
         receipt_data = {}
         receipt_data["business_name"] = business.name
         receipt_data["business_address"] = business.address
@@ -201,8 +301,6 @@ class SalesViewSet(ViewSet):
         receipt_data["business_email"] = business.email_address
         receipt_data["label"] = sale.receipt_label
         receipt_data["product_info"] = []
-        total_amount = 0
-        total_tax = 0
 
         for product_sale in product_sales:
             product_info = {
@@ -216,59 +314,157 @@ class SalesViewSet(ViewSet):
             }
             receipt_data["product_info"].append(product_info)
 
-            # Add the sale_amount_with_tax to the total_amount
-            total_amount = product_sale.sale.sale_amount_with_tax
-            total_tax += product_sale.sale.tax_amount
-
+        receipt_data["tax_summary"] = cart_tax(
+            (product_sale.price, product_sale.tax_rate) for product_sale in product_sales
+        )["bands"]
         receipt_data["total_amount_without_tax"] = (
             sale.sale_amount_with_tax - sale.tax_amount
         )
-        receipt_data["total_tax"] = total_tax
-        receipt_data["total_amount"] = Decimal(total_amount)
+        receipt_data["total_tax"] = sale.tax_amount
+        receipt_data["total_amount"] = Decimal(sale.sale_amount_with_tax)
         receipt_data["payment_mode"] = payment_mode
         receipt_data["total_amount_paid"] = Decimal(amount_paid)
         receipt_data["sale_status"] = Sales.TransactionProgress.Approved
 
-        if payment_mode in payment_mode_mapping:
-            mapped_payment_mode = payment_mode_mapping[payment_mode]
+        if payment_mode in PAYMENT_MODE_CODES:
+            mapped_payment_mode = PAYMENT_MODE_CODES[payment_mode]
             payment_mode_obj, _ = PaymentMode.objects.get_or_create(
                 payment_method=mapped_payment_mode
             )
 
-            # Check if properties is None before creating the till dictionary
-            if not payment_mode_obj.properties:
-                reset_dict = {
-                    1: 0,
-                    5: 0,
-                    10: 0,
-                    20: 0,
-                    50: 0,
-                    100: 0,
-                    200: 0,
-                    500: 0,
-                    1000: 0,
-                }
-                payment_mode_obj.properties = reset_dict
-                payment_mode_obj.save()
-
+            # Save the payment mode for the sale
+            newly_approved = sale.sale_status != Sales.TransactionProgress.Approved
             sale.payment_id = payment_mode_obj
+            sale.sale_status = Sales.TransactionProgress.Approved
+            if register is not None:
+                sale.register = register
             sale.save()
+            if newly_approved:
+                sale.roll_up()
 
             if (
                 mapped_payment_mode == PaymentMode.PaymentMethod.CASH
                 or mapped_payment_mode == PaymentMode.PaymentMethod.CASH_CREDIT
             ):
-                receipt_data["change"] = sale.generate_change(
+                if sale.register and tendered:
+                    sale.register.deposit(tendered)
+                receipt_data["change"], receipt_data["change_breakdown"] = sale.generate_change(
                     receipt_data["total_amount"], Decimal(amount_paid)
                 )
 
-            # Save the payment mode for the sale
-            sale.sale_status = Sales.TransactionProgress.Approved
-            sale.save()
+        return receipt_data
 
-        return Response(receipt_data)
+    @extend_schema(request=CheckoutSerializer)
+    @action(detail=False, methods=["POST"])
+    @idempotent
+    def checkout(self, request, *args, **kwargs):
+        """
+        Create a Sale together with all of its ProductSales, decrement stock
+        and complete the payment for a whole cart in a single transaction
+        """
+        checkout_serializer = CheckoutSerializer(data=request.data)
+        if not checkout_serializer.is_valid():
+            return Response(checkout_serializer.errors, status=400)
+        data = checkout_serializer.validated_data
+        customer = None
+        if data.get("customer_id"):
+            customer = get_object_or_404(self.customer_queryset, uuid=data["customer_id"])
+        business = get_object_or_404(self.business_queryset, uuid=data["business_id"])
+        cashier = get_object_or_404(self.cashier_queryset, uuid=data["cashier_id"])
+
+        lines = data["lines"]
+        products = {
+            product.uuid: product
+            for product in self.product_queryset.select_related("stock").filter(
+                uuid__in={line["product"] for line in lines}, stock__isnull=False
+            )
+        }
+        missing = [str(line["product"]) for line in lines if line["product"] not in products]
+        if missing:
+            return Response(
+                {"message": "Products not found", "products": missing}, status=404
+            )
+
+        try:
+            for product in products.values():
+                tax_band(product.tax_type)
+        except UnknownTaxType as error:
+            return Response({"message": f"{error} on a product in the cart"}, status=400)
+
+        requested = {}
+        for line in lines:
+            product = products[line["product"]]
+            requested[product.id] = requested.get(product.id, 0) + line["quantity_sold"]
+
+        with transaction.atomic():
+            available = Stock.objects.reserve(requested)
+            product_sales = []
+            for line in lines:
+                product = products[line["product"]]
+                stock = product.stock
+                quantity_sold = min(line["quantity_sold"], available[stock.pk])
+                available[stock.pk] -= quantity_sold
+                if line["is_wholesale"]:
+                    price_per_unit = stock.price_per_unit_wholesale
+                else:
+                    price_per_unit = stock.price_per_unit_retail
+                product_sales.append(
+                    ProductSales(
+                        product=product,
+                        quantity_sold=quantity_sold,
+                        price_per_unit=price_per_unit,
+                        is_wholesale=line["is_wholesale"],
+                        price=quantity_sold * price_per_unit,
+                        tax_rate=product.tax_type,
+                        cost_per_unit=stock.cost_per_unit,
+                    )
+                )
+            taxes = cart_tax(
+                (product_sale.price, product_sale.tax_rate) for product_sale in product_sales
+            )
+
+            sale = Sales.objects.create(
+                customer_id=customer,
+                business_id=business,
+                cashier_id=cashier,
+                receipt_type=data["receipt_type"],
+                transaction_type=data["transaction_type"],
+                receipt_label=data["transaction_type"] + data["receipt_type"],
+                sale_amount_with_tax=taxes["total"],
+                tax_amount=taxes["tax"],
+            )
+            for product_sale, tax_amount in zip(product_sales, taxes["line_taxes"]):
+                product_sale.sale = sale
+                product_sale.tax_amount = tax_amount
+            ProductSales.objects.bulk_create(product_sales)
+
+            payment = data["payment"]
+            receipt_data = self.complete_sale(
+                sale,
+                product_sales,
+                payment["payment_mode"],
+                payment["amount_paid"],
+                **self.register_payment(payment),
+            )
+        receipt_data["uuid"] = sale.uuid
+        return Response(receipt_data, status=201)
+
+    @extend_schema(request=SalesBatchSerializer)
+    @action(detail=False, methods=["POST"], parser_classes=[CompressedJSONParser])
+    def batch(self, request, *args, **kwargs):
+        """
+        Record the sales a terminal queued while offline. The body may be sent
+        gzip or deflate compressed, and each sale is answered with its own
+        result so a retried batch only records what was not recorded before
+        """
+        batch_serializer = SalesBatchSerializer(data=request.data)
+        if not batch_serializer.is_valid():
+            return Response(batch_serializer.errors, status=400)
+        results = ingest_sales(batch_serializer.validated_data["sales"])
+        return Response({"results": results}, status=200)
 
     @extend_schema(
+        request=BreakDownSerializer,
         parameters=[
             OpenApiParameter(
                 name="uuid",
@@ -285,10 +481,21 @@ class SalesViewSet(ViewSet):
         Breakdown denomination when there is no change available
         """
         sale = get_object_or_404(self.sales_queryset, uuid=uuid)
-        denominations = request.denominations
-        sale.break_down_denominiations(denominations)
+        serializer = BreakDownSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        denominations = [
+            (breakdown["denomination"], breakdown["into"])
+            for breakdown in serializer.validated_data["denominations"]
+        ]
+        try:
+            sale.break_down_denominiations(denominations)
+        except ValueError as error:
+            return Response({"message": str(error)}, status=400)
+        return Response(CashRegisterSerializer(sale.register).data)
 
     @action(detail=False, methods=["POST"])
+    @replica_view
     def generate_sales_report(self, request, *args, **kwargs):
         """
         Generate sales report based on date given
@@ -304,75 +511,126 @@ class SalesViewSet(ViewSet):
                 {"message": "Please provide a start date and end date"},
                 status=400,
             )
-        sales_summary = Sales.objects.filter(
-            created_at__date__range=[start_date, end_date]
-        )
-        if not sales_summary:
+        report = sales_report(start_date, end_date)
+        if report is None:
             return Response(
                 {"message": "No sales found for the given date range"},
                 status=400,
             )
-        report = {
-            "total_sales": 0,
-            "tax_amount": 0,
-            "profit": 0,
-            "sales": [],
-        }
-        for sale in sales_summary:
-            summary = {
-                "cashier_id": sale.cashier_id.id if sale.cashier_id else None,
-                "payment_id": sale.payment_id.id if sale.payment_id else None,
-                "receipt_label": sale.receipt_label,
-                "sale_amount": sale.sale_amount_with_tax,
-                "products": [],
-            }
-            total_tax = 0
-            total_sales = 0
-            total_profit = 0
-
-            product_sales = sale.product_sales.all()
-            for product_sale in product_sales:
-                product = product_sale.product
-                stock = get_object_or_404(Stock, pk=product_sale.product.id)
-                product_info = {
-                    "product_name": product.name,
-                    "product_description": product.description,
-                    "product_unit_price": product_sale.price_per_unit,
-                    "product_quantity": product_sale.quantity_sold,
-                    "product_price": product_sale.price,
-                    "tax_type": product.tax_type,
-                    "product_tax": product_sale.tax_amount,
-                    "cost": stock.cost_per_unit * product_sale.quantity_sold,
-                    "profit": (product_sale.price_per_unit - stock.cost_per_unit)
-                    * product_sale.quantity_sold,
-                }
-
-                total_tax += product_sale.tax_amount
-
-                total_profit += product_info["profit"]
-
-                summary["products"].append(product_info)
-            total_sales += sale.sale_amount_with_tax
-            total_tax = sale.tax_amount
-            report["total_sales"] += total_sales
-            report["tax_amount"] += total_tax
-            report["profit"] += total_profit
-
-            report["sales"].append(summary)
 
         return Response(
             {"sales_report": report},
             status=200,
         )
 
+    @action(detail=False, methods=["POST"])
+    @replica_view
+    def generate_sales_summary(self, request, *args, **kwargs):
+        """
+        Summarise approved sales over a date range from the daily rollups
+        """
+        data = request.data
+        start_date = data.get("start_date", None)
+        end_date = data.get("end_date", None)
+        if start_date and end_date:
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+        else:
+            return Response(
+                {"message": "Please provide a start date and end date"},
+                status=400,
+            )
+        sales_rollups = DailySalesRollup.objects.filter(day__range=[start_date, end_date])
+        product_rollups = DailyProductRollup.objects.filter(
+            day__range=[start_date, end_date]
+        )
+        business_uuid = data.get("business_id", None)
+        if business_uuid:
+            business = get_object_or_404(self.business_queryset, uuid=business_uuid)
+            sales_rollups = sales_rollups.filter(business=business)
+            product_rollups = product_rollups.filter(business=business)
+
+        sales_totals = {
+            "sales_count": Sum("sales_count"),
+            "total_sales": Sum("sale_amount_with_tax"),
+            "tax_amount": Sum("tax_amount"),
+        }
+        summary = sales_rollups.aggregate(**sales_totals)
+        if not summary["sales_count"]:
+            return Response(
+                {"message": "No sales found for the given date range"},
+                status=400,
+            )
+        summary.update(
+            product_rollups.aggregate(
+                profit=Sum(F("price") - F("cost"), output_field=DecimalField())
+            )
+        )
+        summary["start_date"] = start_date
+        summary["end_date"] = end_date
+        summary["days"] = list(
+            sales_rollups.values("day").annotate(**sales_totals).order_by("day")
+        )
+        summary["cashiers"] = list(
+            sales_rollups.values("cashier__uuid")
+            .annotate(**sales_totals)
+            .order_by("cashier__uuid")
+        )
+        summary["payment_methods"] = list(
+            sales_rollups.values("payment_method")
+            .annotate(**sales_totals)
+            .order_by("payment_method")
+        )
+        summary["products"] = list(
+            product_rollups.values("product__uuid", "product__name")
+            .annotate(
+                quantity_sold=Sum("quantity_sold"),
+                total_price=Sum("price"),
+                total_tax=Sum("tax_amount"),
+                profit=Sum(F("price") - F("cost"), output_field=DecimalField()),
+            )
+            .order_by("-total_price")
+        )
+        return Response({"sales_summary": summary}, status=200)
 
-class ProductSalesViewset(ViewSet):
+    @extend_schema(parameters=EXPORT_PARAMETERS)
+    @action(detail=False, methods=["GET"])
+    def export(self, request, *args, **kwargs):
+        """
+        Stream every sale, oldest first, as CSV or newline delimited JSON
+        """
+        try:
+            export_format, start_date, end_date = export_options(request.query_params)
+        except ValueError as error:
+            return Response({"message": str(error)}, status=400)
+        sales = Sales.objects.filter(**day_range(start_date, end_date)).order_by(
+            "created_at", "id"
+        )
+        return stream_export(sales, self.export_columns, export_format, "sales")
+
+
+class ProductSalesViewset(PaginatedViewSetMixin, ViewSet):
     """
     API endpoint that allows Product to be viewed or edited.
     """
 
     serializer_class = ProductSalesSerializer
+    pagination_class = CreatedAtCursorPagination
     lookup_field = "uuid"
+    export_columns = {
+        "uuid": "uuid",
+        "created_at": "created_at",
+        "sale": "sale__uuid",
+        "product": "product__uuid",
+        "product_code": "product__code",
+        "product_name": "product__name",
+        "quantity_sold": "quantity_sold",
+        "price_per_unit": "price_per_unit",
+        "is_wholesale": "is_wholesale",
+        "price": "price",
+        "tax_rate": "tax_rate",
+        "tax_amount": "tax_amount",
+    }
 
     @property
     def product_sales_queryset(self):
@@ -394,8 +652,9 @@ class ProductSalesViewset(ViewSet):
         """
         List all ProductSales.
         """
-        serializer = ProductSalesSerializer(self.product_sales_queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(
+            self.product_sales_queryset, ProductSalesSerializer
+        )
 
     @extend_schema(
         parameters=[
@@ -412,21 +671,27 @@ class ProductSalesViewset(ViewSet):
         """
         Retun a single ProductSale
         """
-        product_sale = get_object_or_404(self.product_sales_queryset, uuid=uuid)
-        serializer = ProductSalesSerializer(product_sale)
-        return Response(serializer.data)
+        product_sale = get_object_or_404(
+            eager_load(self.product_sales_queryset, ProductSalesSerializer), uuid=uuid
+        )
+        return self.object_response(product_sale, ProductSalesSerializer)
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """Create a new ProductSale"""
         data = request.data
         product_uuid = data.pop("product", None)
         sale_uuid = data.pop("sale", None)
-        quantity_sold = data.get("quantity_sold", "0")
+        quantity_sold = Decimal(str(data.get("quantity_sold", "0")))
         product = get_object_or_404(self.product_queryset, uuid=product_uuid)
         sale = get_object_or_404(self.sales_queryset, uuid=sale_uuid)
         data["product"] = product.id
         data["sale"] = sale.id
-        stock = get_object_or_404(self.stock_queryset, product_id=product.id)
+        # hold the stock row until the sale line is saved so concurrent
+        # sales of the same product queue here instead of overselling
+        stock = Stock.objects.lock([product.id]).get(product.id)
+        if stock is None:
+            raise Http404
         if quantity_sold > stock.stock_quantity:
             quantity_sold = stock.stock_quantity
             data["quantity_sold"] = quantity_sold
@@ -436,22 +701,26 @@ class ProductSalesViewset(ViewSet):
             data["price_per_unit"] = stock.price_per_unit_retail
         data["price"] = Decimal(quantity_sold) * Decimal(data["price_per_unit"])
         data["tax_rate"] = product.tax_type
-        data["tax_amount"] = (
-            product.get_total_amount(Decimal(data["price"]), product.tax_type)
-            - Decimal(data["price"])
-        ).quantize(Decimal("0.00"), rounding=ROUND_HALF_EVEN)
+        try:
+            data["tax_amount"] = line_tax(data["price"], product.tax_type)
+        except UnknownTaxType as error:
+            return Response({"message": str(error)}, status=400)
         serializer = ProductSalesSerializer(data=data)
         if serializer.is_valid():
-            sale.sale_amount_with_tax += product.get_total_amount(
-                Decimal(data["price"]), product.tax_type
+            Sales.objects.filter(pk=sale.pk).update(
+                sale_amount_with_tax=F("sale_amount_with_tax")
+                + data["price"]
+                + data["tax_amount"],
+                tax_amount=F("tax_amount") + data["tax_amount"],
+                updated_at=timezone.now(),
+                version=F("version") + 1,
             )
-            sale.tax_amount += data["tax_amount"]
-            stock.update_stock_quantity(
-                Stock.StockInOutType.Sale, quantity_sold, "Sale made"
+            Stock.objects.move(
+                {stock.pk: quantity_sold}, Stock.StockInOutType.Sale, "Sale made"
             )
-            sale.save()
-            stock.save()
-            serializer.save()
+            product_sale = serializer.save(product=product, sale=sale, cost_per_unit=stock.cost_per_unit)
+            if sale.sale_status == Sales.TransactionProgress.Approved:
+                sale.roll_up_lines(ProductSales.objects.filter(pk=product_sale.pk))
             return Response(serializer.data, status=200)
         return Response(serializer.errors, status=400)
 
@@ -466,12 +735,13 @@ class ProductSalesViewset(ViewSet):
             )
         ],
     )
+    @reports_conflicts
     def update(self, request, uuid=None):
         """Update a ProductSale"""
         product_sale = get_object_or_404(self.product_sales_queryset, uuid=uuid)
         serializer = ProductSalesSerializer(product_sale, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            self.save_line(serializer)
             return Response(serializer.data, status=200)
         return Response(serializer.errors, status=400)
 
@@ -486,6 +756,7 @@ class ProductSalesViewset(ViewSet):
             )
         ],
     )
+    @reports_conflicts
     def partial_update(self, request, uuid=None):
         """Update a ProductSale"""
         product_sale = get_object_or_404(self.product_sales_queryset, uuid=uuid)
@@ -493,7 +764,7 @@ class ProductSalesViewset(ViewSet):
             product_sale, data=request.data, partial=True
         )
         if serializer.is_valid():
-            serializer.save()
+            self.save_line(serializer)
             return Response(serializer.data, status=200)
         return Response(serializer.errors, status=400)
 
@@ -508,24 +779,75 @@ class ProductSalesViewset(ViewSet):
             )
         ],
     )
+    @reports_conflicts
     def destroy(self, request, uuid=None):
         """Delete a ProductSale"""
         product_sale = get_object_or_404(self.product_sales_queryset, uuid=uuid)
+        retry_on_conflict(
+            self.move_on_sale, product_sale.sale_id, -product_sale.price, -product_sale.tax_amount
+        )
         sale = product_sale.sale
-        sale.sale_amount_with_tax -= product_sale.price + product_sale.tax_amount
-        sale.tax_amount -= product_sale.tax_amount
-        sale.save()
+        if sale.sale_status == Sales.TransactionProgress.Approved:
+            sale.roll_up_lines(ProductSales.objects.filter(pk=product_sale.pk), -1)
         product = product_sale.product
         stock = get_object_or_404(self.stock_queryset, product_id=product.id)
         stock.update_stock_quantity(
             Stock.StockInOutType.Return_in, product_sale.quantity_sold, "Sale undone"
         )
-        stock.save()
         product_sale.delete()
         return Response(status=204)
 
+    def save_line(self, serializer):
+        """
+        Save an updated line, moving the change in its amounts onto its sale
+        and, when the sale is approved, the line in the daily rollups, as its
+        quantity, price or tax may have changed
+        """
+        product_sale = serializer.instance
+        lines = ProductSales.objects.filter(pk=product_sale.pk)
+        sale = product_sale.sale
+        price, tax_amount = product_sale.price, product_sale.tax_amount
+        with transaction.atomic():
+            if sale.sale_status == Sales.TransactionProgress.Approved:
+                sale.roll_up_lines(lines, -1)
+            serializer.save()
+            retry_on_conflict(
+                self.move_on_sale,
+                sale.pk,
+                product_sale.price - price,
+                product_sale.tax_amount - tax_amount,
+            )
+            if sale.sale_status == Sales.TransactionProgress.Approved:
+                sale.roll_up_lines(lines)
+
+    def move_on_sale(self, sale_id, price, tax_amount):
+        """
+        Add the change in a line's amounts to its sale, read afresh on every try
+        """
+        sale = self.sales_queryset.get(pk=sale_id)
+        sale.sale_amount_with_tax += price + tax_amount
+        sale.tax_amount += tax_amount
+        sale.save()
+
+    @extend_schema(parameters=EXPORT_PARAMETERS)
+    @action(detail=False, methods=["GET"])
+    def export(self, request, *args, **kwargs):
+        """
+        Stream every product sale, oldest first, as CSV or newline delimited JSON
+        """
+        try:
+            export_format, start_date, end_date = export_options(request.query_params)
+        except ValueError as error:
+            return Response({"message": str(error)}, status=400)
+        product_sales = ProductSales.objects.filter(
+            **day_range(start_date, end_date)
+        ).order_by("created_at", "id")
+        return stream_export(
+            product_sales, self.export_columns, export_format, "product-sales"
+        )
+
 
-class CustomerViewset(ViewSet):
+class CustomerViewset(PaginatedViewSetMixin, ViewSet):
     """API endpoint that allows customer to be viewed or edited"""
 
     serializer_class = CustomerSerializer
@@ -537,8 +859,7 @@ class CustomerViewset(ViewSet):
 
     def list(self, request, *args, **kwargs):
         """Returns a list of Customer"""
-        serializer = CustomerSerializer(self.queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.queryset, CustomerSerializer)
 
     @extend_schema(
         parameters=[
@@ -554,8 +875,7 @@ class CustomerViewset(ViewSet):
     def retrieve(self, request, uuid=None):
         """Retrieves a Customer given its associated identifier"""
         customer = get_object_or_404(self.queryset, uuid=uuid)
-        serializer = CustomerSerializer(customer)
-        return Response(serializer.data)
+        return self.object_response(customer, CustomerSerializer)
 
     def create(self, request, *args, **kwargs):
         """Creates a  new customer"""
@@ -623,7 +943,7 @@ class CustomerViewset(ViewSet):
         return Response(status=204)
 
 
-class PaymentModeViewSet(ViewSet):
+class PaymentModeViewSet(PaginatedViewSetMixin, ViewSet):
     """API endpoint that allows payment mode to be viewed or edited"""
 
     serializer_class = PaymentModeSerializer
@@ -635,8 +955,7 @@ class PaymentModeViewSet(ViewSet):
 
     def list(self, request, *args, **kwargs):
         """Returns a list of Customer"""
-        serializer = PaymentModeSerializer(self.queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.queryset, PaymentModeSerializer)
 
     @extend_schema(
         parameters=[
@@ -652,8 +971,7 @@ class PaymentModeViewSet(ViewSet):
     def retrieve(self, request, uuid=None):
         """Retrieves a Customer given its associated identifier"""
         payment = get_object_or_404(self.queryset, uuid=uuid)
-        serializer = PaymentModeSerializer(payment)
-        return Response(serializer.data)
+        return self.object_response(payment, PaymentModeSerializer)
 
     def create(self, request, *args, **kwargs):
         """Creates a  new customer"""
@@ -674,6 +992,7 @@ class PaymentModeViewSet(ViewSet):
             )
         ],
     )
+    @reports_conflicts
     def update(self, request, uuid=None):
         """Updates a Customer given its associated identifier"""
         payment = get_object_or_404(self.queryset, uuid=uuid)
@@ -694,6 +1013,7 @@ class PaymentModeViewSet(ViewSet):
             )
         ],
     )
+    @reports_conflicts
     def partial_update(self, request, uuid=None):
         """updates a customer partially given it's identifier"""
         payment = get_object_or_404(self.queryset, uuid=uuid)
@@ -721,7 +1041,7 @@ class PaymentModeViewSet(ViewSet):
         return Response(status=204)
 
 
-class PurchaseViewset(ViewSet):
+class PurchaseViewset(PaginatedViewSetMixin, ViewSet):
     """ "API endpoint that allows purchases to viewed and edited"""
 
     serializer_class = PurchaseSerializer
@@ -749,8 +1069,7 @@ class PurchaseViewset(ViewSet):
 
     def list(self, request, *args, **kwargs):
         """list all purchases"""
-        serializer = PurchaseSerializer(self.purchase_queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.purchase_queryset, PurchaseSerializer)
 
     @extend_schema(
         parameters=[
@@ -766,8 +1085,7 @@ class PurchaseViewset(ViewSet):
     def retrieve(self, request, uuid=None):
         """Return a single purchase"""
         purchase = get_object_or_404(self.purchase_queryset, uuid=uuid)
-        serializer = PurchaseSerializer(purchase)
-        return Response(serializer.data)
+        return self.object_response(purchase, PurchaseSerializer)
 
     def create(self, request, *args, **kwargs):
         """create a new purchase"""
@@ -792,7 +1110,6 @@ class PurchaseViewset(ViewSet):
             stock.update_stock_quantity(
                 Stock.StockInOutType.Purchase, product_quantity, "Purchase Made"
             )
-            stock.save()
             serializer.save()
             return Response(serializer.data, status=200)
         return Response(serializer.data, status=400)
@@ -858,6 +1175,171 @@ class PurchaseViewset(ViewSet):
             purchase.product_quantity,
             "Purchase undone",
         )
-        stock.save()
         purchase.delete()
         return Response(status=204)
+
+
+class ReportJobViewSet(PaginatedViewSetMixin, ViewSet):
+    """
+    API endpoint that queues reports and serves them once they are generated
+    """
+
+    serializer_class = ReportJobSerializer
+    lookup_field = "uuid"
+
+    @property
+    def queryset(self):
+        return ReportJob.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        """Returns a list of report jobs"""
+        return self.paginated_response(self.queryset, ReportJobSerializer)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="uuid",
+                description="A unique identifier identifying this Report Job.",
+                required=True,
+                type=OpenApiTypes.UUID,
+                location=OpenApiParameter.PATH,
+            )
+        ],
+    )
+    def retrieve(self, request, uuid=None):
+        """Retrieves the status of a report job given its associated identifier"""
+        job = get_object_or_404(self.queryset, uuid=uuid)
+        return self.object_response(job, ReportJobSerializer)
+
+    @extend_schema(request=ReportRequestSerializer, responses={202: ReportJobSerializer})
+    def create(self, request, *args, **kwargs):
+        """
+        Queues a report, or returns the job already generating the same report
+        """
+        serializer = ReportRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        job, created = ReportJob.request(
+            serializer.validated_data["report_type"],
+            serializer.validated_data["report_format"],
+            serializer.parameters,
+            requested_by=request.user,
+        )
+        if created:
+            # the worker must only see the job once the request transaction commits
+            transaction.on_commit(lambda: generate_report.delay(job.pk))
+        return Response(ReportJobSerializer(job).data, status=202)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="uuid",
+                description="A unique identifier identifying this Report Job.",
+                required=True,
+                type=OpenApiTypes.UUID,
+                location=OpenApiParameter.PATH,
+            )
+        ],
+    )
+    @action(detail=True, methods=["GET"])
+    def download(self, request, uuid=None):
+        """
+        Returns the generated report file
+        """
+        job = get_object_or_404(self.queryset, uuid=uuid)
+        if job.status != ReportJob.JobStatus.SUCCESS:
+            return Response(
+                {"message": "Report is not ready", "status": job.status, "error": job.error},
+                status=400,
+            )
+        return FileResponse(
+            job.result.open("rb"),
+            as_attachment=True,
+            filename=os.path.basename(job.result.name),
+        )
+
+
+class CashRegisterViewSet(PaginatedViewSetMixin, ViewSet):
+    """API endpoint that allows the cash registers of the tills to be viewed and filled"""
+
+    serializer_class = CashRegisterSerializer
+    lookup_field = "uuid"
+
+    @property
+    def queryset(self):
+        return CashRegister.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        """Returns a list of cash registers with the cash in their drawers"""
+        return self.paginated_response(self.queryset, CashRegisterSerializer)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="uuid",
+                description="A unique identifier identifying this Cash Register.",
+                required=True,
+                type=OpenApiTypes.UUID,
+                location=OpenApiParameter.PATH,
+            )
+        ],
+    )
+    def retrieve(self, request, uuid=None):
+        """Retrieves a cash register given its associated identifier"""
+        register = get_object_or_404(
+            eager_load(self.queryset, CashRegisterSerializer), uuid=uuid
+        )
+        return self.object_response(register, CashRegisterSerializer)
+
+    def create(self, request, *args, **kwargs):
+        """Creates a new cash register with an empty drawer"""
+        serializer = CashRegisterSerializer(data=request.data)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=201)
+        return Response(serializer.errors, status=400)
+
+    @extend_schema(
+        request=CashDepositSerializer,
+        parameters=[
+            OpenApiParameter(
+                name="uuid",
+                description="A unique identifier identifying this Cash Register.",
+                required=True,
+                type=OpenApiTypes.UUID,
+                location=OpenApiParameter.PATH,
+            )
+        ],
+    )
+    @action(detail=True, methods=["POST"])
+    def deposit(self, request, uuid=None):
+        """
+        Puts notes and coins into a cash register's drawer
+        """
+        register = get_object_or_404(self.queryset, uuid=uuid)
+        serializer = CashDepositSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        register.deposit(serializer.validated_data["counts"])
+        return Response(CashRegisterSerializer(register).data)
+
+    @extend_schema(
+        request=None,
+        parameters=[
+            OpenApiParameter(
+                name="uuid",
+                description="A unique identifier identifying this Cash Register.",
+                required=True,
+                type=OpenApiTypes.UUID,
+                location=OpenApiParameter.PATH,
+            )
+        ],
+    )
+    @action(detail=True, methods=["POST"])
+    def reset(self, request, uuid=None):
+        """
+        Empties a cash register's drawer
+        """
+        register = get_object_or_404(self.queryset, uuid=uuid)
+        register.reset()
+        return Response(CashRegisterSerializer(register).data)
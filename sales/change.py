@@ -0,0 +1,97 @@
+"""
+Change making for the cash drawers of the tills. Change is made with the
+fewest notes and coins the drawer can actually supply: the usual amounts are
+read from a precomputed table, and when the drawer runs short of what the
+table asks for an exact search over the denomination counts takes over
+"""
+from functools import lru_cache
+
+# notes and coins a till drawer holds, in shillings
+DENOMINATIONS = (1, 5, 10, 20, 50, 100, 200, 500, 1000)
+# change up to this amount is looked up instead of solved
+CHANGE_TABLE_LIMIT = 5000
+
+
+@lru_cache(maxsize=1)
+def change_table():
+    """
+    Fewest notes and coins for every amount up to CHANGE_TABLE_LIMIT with an
+    unlimited drawer, as (denomination, count) pairs largest first. The
+    denominations form a canonical system, so taking the largest note that
+    fits is optimal here
+    """
+    table = []
+    for amount in range(CHANGE_TABLE_LIMIT + 1):
+        breakdown = []
+        remaining = amount
+        for denomination in reversed(DENOMINATIONS):
+            count, remaining = divmod(remaining, denomination)
+            if count:
+                breakdown.append((denomination, count))
+        table.append(tuple(breakdown))
+    return table
+
+
+def solve_change(amount, drawer):
+    """
+    Fewest notes and coins adding up to amount that the drawer holds, by
+    dynamic programming over the denomination counts. Returns a
+    {denomination: count} dict, or None when no combination is exact
+    """
+    values = sorted(
+        (value for value, count in drawer.items() if count > 0 and value <= amount),
+        reverse=True,
+    )
+    counts = [drawer[value] for value in values]
+    # cash held in each denomination and the smaller ones, to cut branches
+    # that cannot make up what is left
+    reach = [0] * (len(values) + 1)
+    for index in range(len(values) - 1, -1, -1):
+        reach[index] = reach[index + 1] + values[index] * counts[index]
+    memo = {}
+
+    def fewest(index, remaining):
+        if remaining == 0:
+            return 0, ()
+        if remaining > reach[index]:
+            return None
+        key = (index, remaining)
+        if key in memo:
+            return memo[key]
+        value = values[index]
+        best = None
+        if index == len(values) - 1:
+            if remaining % value == 0:
+                best = remaining // value, ((value, remaining // value),)
+        else:
+            next_value = values[index + 1]
+            for take in range(min(remaining // value, counts[index]), -1, -1):
+                left = remaining - take * value
+                # fewer large notes only ever need more pieces, so stop once
+                # even the smallest possible total cannot beat the best
+                if best is not None and take - (-left // next_value) >= best[0]:
+                    break
+                rest = fewest(index + 1, left)
+                if rest is not None and (best is None or take + rest[0] < best[0]):
+                    best = take + rest[0], (((value, take),) if take else ()) + rest[1]
+        memo[key] = best
+        return best
+
+    result = fewest(0, amount)
+    return None if result is None else dict(result[1])
+
+
+def make_change(amount, drawer):
+    """
+    Return how many of each denomination to hand out for amount given the
+    counts in drawer, or None when the drawer cannot make it exactly, as for
+    an amount with cents no note or coin can make up
+    """
+    if amount < 0 or amount % 1:
+        return None
+    amount = int(amount)
+    if amount <= CHANGE_TABLE_LIMIT:
+        breakdown = change_table()[amount]
+        if all(drawer.get(value, 0) >= count for value, count in breakdown):
+            return dict(breakdown)
+    return solve_change(amount, drawer)
@@ -0,0 +1,76 @@
+"""
+Idempotency-Key support for the endpoints that record sales. The key row is
+inserted in the same transaction as the sale, so a retry arriving while the
+first request is still running waits on it and then replays its response,
+and a request that fails leaves no key behind
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from sales.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def request_fingerprint(request):
+    data = request.data
+    if hasattr(data, "lists"):
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, cls=JSONEncoder)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def replay(stored):
+    response = Response(stored.response, status=stored.status_code)
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def idempotent(view_method):
+    """
+    Run a ViewSet write at most once per Idempotency-Key and user, answering
+    retries with the response of the first run
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"message": "Idempotency-Key is too long"}, status=400)
+
+        fingerprint = request_fingerprint(request)
+        cutoff = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        with transaction.atomic():
+            IdempotencyKey.objects.filter(user=request.user, key=key, created_at__lt=cutoff).delete()
+            try:
+                with transaction.atomic():
+                    stored = IdempotencyKey.objects.create(user=request.user, key=key, fingerprint=fingerprint)
+            except IntegrityError:
+                # the first request with this key has committed by now, a
+                # concurrent one made this insert wait until it did
+                stored = IdempotencyKey.objects.get(user=request.user, key=key)
+                if stored.fingerprint != fingerprint:
+                    return Response(
+                        {"message": "Idempotency-Key was already used for another request"},
+                        status=422,
+                    )
+                return replay(stored)
+
+            response = view_method(self, request, *args, **kwargs)
+            stored.status_code = response.status_code
+            stored.response = response.data
+            stored.save(update_fields=["status_code", "response"])
+        return response
+
+    return wrapper
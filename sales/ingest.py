@@ -0,0 +1,284 @@
+"""
+Ingestion of the sales a terminal queued while it was offline. A whole batch
+is validated up front, everything its sales refer to is read with one query
+per model, stock is taken for the batch in one locked UPDATE and the sales,
+their lines and their rollups are written with bulk inserts
+"""
+from django.db import connection, models, transaction
+from django.db.models import Case, F, Value, When
+
+from administration.models import Business, Employee
+from products.models import Product, Stock
+from products.tax import RATE_TABLE, cart_tax
+from sales.api.v1.serializers import BatchSaleSerializer
+from sales.models import (
+    PAYMENT_MODE_CODES,
+    Customer,
+    DailyProductRollup,
+    DailySalesRollup,
+    PaymentMode,
+    ProductSales,
+    Sales,
+)
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+REJECTED = "rejected"
+
+
+def sale_result(client_reference, status, uuid=None, errors=None):
+    return {
+        "client_reference": client_reference,
+        "status": status,
+        "uuid": uuid,
+        "errors": errors,
+    }
+
+
+def by_uuid(queryset, uuids):
+    return {obj.uuid: obj for obj in queryset.filter(uuid__in=uuids)}
+
+
+def resolve_references(sales):
+    """
+    Read every business, cashier, customer, stocked product and payment mode
+    the validated sales name, one query each
+    """
+    payment_modes = {}
+    for payment_method in {
+        PAYMENT_MODE_CODES[sale["payment"]["payment_mode"]]
+        for sale in sales
+        if sale["payment"]["payment_mode"] in PAYMENT_MODE_CODES
+    }:
+        payment_modes[payment_method], _ = PaymentMode.objects.get_or_create(payment_method=payment_method)
+    return {
+        "businesses": by_uuid(Business.objects, {sale["business_id"] for sale in sales}),
+        "cashiers": by_uuid(Employee.objects, {sale["cashier_id"] for sale in sales}),
+        "customers": by_uuid(
+            Customer.objects,
+            {sale["customer_id"] for sale in sales if sale.get("customer_id")},
+        ),
+        "products": by_uuid(
+            Product.objects.select_related("stock").filter(stock__isnull=False),
+            {line["product"] for sale in sales for line in sale["lines"]},
+        ),
+        "payment_modes": payment_modes,
+    }
+
+
+def reference_errors(sale, references):
+    """
+    What a sale names that does not exist, keyed like the serializer's errors
+    """
+    errors = {}
+    if sale["business_id"] not in references["businesses"]:
+        errors["business_id"] = ["Business not found"]
+    if sale["cashier_id"] not in references["cashiers"]:
+        errors["cashier_id"] = ["Cashier not found"]
+    if sale.get("customer_id") and sale["customer_id"] not in references["customers"]:
+        errors["customer_id"] = ["Customer not found"]
+    missing = [str(line["product"]) for line in sale["lines"] if line["product"] not in references["products"]]
+    if missing:
+        errors["lines"] = [f"Products not found {missing}"]
+    untaxed = sorted(
+        {
+            references["products"][line["product"]].tax_type
+            for line in sale["lines"]
+            if line["product"] in references["products"]
+            and references["products"][line["product"]].tax_type not in RATE_TABLE
+        }
+    )
+    if untaxed:
+        errors.setdefault("lines", []).append(f"Unknown tax types {untaxed}")
+    if sale["payment"]["payment_mode"] not in PAYMENT_MODE_CODES:
+        errors["payment"] = {"payment_mode": ["Unknown payment mode"]}
+    return errors
+
+
+def build_sale(sale, references, available):
+    """
+    The Sales row and ProductSales rows of one accepted sale. Each line takes
+    what is left of its product's stock, as at checkout
+    """
+    products = references["products"]
+    product_sales = []
+    for line in sale["lines"]:
+        product = products[line["product"]]
+        stock = product.stock
+        quantity_sold = min(line["quantity_sold"], available[stock.pk])
+        available[stock.pk] -= quantity_sold
+        if line["is_wholesale"]:
+            price_per_unit = stock.price_per_unit_wholesale
+        else:
+            price_per_unit = stock.price_per_unit_retail
+        product_sales.append(
+            ProductSales(
+                product=product,
+                quantity_sold=quantity_sold,
+                price_per_unit=price_per_unit,
+                is_wholesale=line["is_wholesale"],
+                price=quantity_sold * price_per_unit,
+                tax_rate=product.tax_type,
+                cost_per_unit=stock.cost_per_unit,
+            )
+        )
+    taxes = cart_tax((product_sale.price, product_sale.tax_rate) for product_sale in product_sales)
+    for product_sale, tax_amount in zip(product_sales, taxes["line_taxes"]):
+        product_sale.tax_amount = tax_amount
+    customer_id = sale.get("customer_id")
+    record = Sales(
+        customer_id=references["customers"][customer_id] if customer_id else None,
+        business_id=references["businesses"][sale["business_id"]],
+        cashier_id=references["cashiers"][sale["cashier_id"]],
+        payment_id=references["payment_modes"][PAYMENT_MODE_CODES[sale["payment"]["payment_mode"]]],
+        receipt_type=sale["receipt_type"],
+        transaction_type=sale["transaction_type"],
+        receipt_label=sale["transaction_type"] + sale["receipt_type"],
+        sale_status=Sales.TransactionProgress.Approved,
+        sale_amount_with_tax=taxes["total"],
+        tax_amount=taxes["tax"],
+        client_reference=sale["client_reference"],
+    )
+    return record, product_sales
+
+
+def client_key(sale, references):
+    """
+    The business, cashier and client_reference of a sale, which a retried
+    upload of it is recognised by. Terminals only keep their references
+    unique for themselves, so another business or cashier may reuse one
+    """
+    return (
+        references["businesses"][sale["business_id"]].pk,
+        references["cashiers"][sale["cashier_id"]].pk,
+        sale["client_reference"],
+    )
+
+
+def lock_client_keys(keys):
+    """
+    Take a transaction lock on each client key, in a fixed order, so uploads
+    of the same sale are recorded one after the other and the later one
+    finds it. The partitioned sales table cannot hold a unique index on the
+    key without created_at
+    """
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(key) FROM ("
+            "SELECT DISTINCT hashtextextended(client_key, 0) AS key "
+            "FROM unnest(%s::text[]) AS client_key ORDER BY key) AS keys",
+            [sorted(f"{business}:{cashier}:{reference}" for business, cashier, reference in keys)],
+        )
+
+
+def record_sales(accepted, references, results):
+    """
+    Write the accepted (index, sale) pairs that were not ingested before,
+    filling in their results. Must run inside a transaction
+    """
+    keys = {client_key(sale, references) for _, sale in accepted}
+    lock_client_keys(keys)
+    existing = {
+        (business, cashier, reference): uuid
+        for business, cashier, reference, uuid in Sales.objects.filter(
+            business_id__in={business for business, _, _ in keys},
+            client_reference__in={reference for _, _, reference in keys},
+        ).values_list("business_id", "cashier_id", "client_reference", "uuid")
+    }
+    new_sales = []
+    for index, sale in accepted:
+        key = client_key(sale, references)
+        if key in existing:
+            results[index] = sale_result(sale["client_reference"], DUPLICATE, existing[key])
+        else:
+            new_sales.append((index, sale))
+    if not new_sales:
+        return
+
+    requested = {}
+    for _, sale in new_sales:
+        for line in sale["lines"]:
+            product = references["products"][line["product"]]
+            requested[product.id] = requested.get(product.id, 0) + line["quantity_sold"]
+    available = Stock.objects.reserve(requested, "Offline sales uploaded")
+
+    records = []
+    product_sales = []
+    for index, sale in new_sales:
+        record, lines = build_sale(sale, references, available)
+        records.append(record)
+        product_sales.append(lines)
+        results[index] = sale_result(sale["client_reference"], CREATED, record.uuid)
+    Sales.objects.bulk_create(records, batch_size=500)
+    for record, lines in zip(records, product_sales):
+        for product_sale in lines:
+            product_sale.sale = record
+    ProductSales.objects.bulk_create(
+        [product_sale for lines in product_sales for product_sale in lines], batch_size=1000
+    )
+
+    sold_at = {record.pk: sale["sold_at"] for record, (_, sale) in zip(records, new_sales) if sale.get("sold_at")}
+    if sold_at:
+        # created_at is set on insert, so the time each sale was made goes in
+        # after, on its lines too so they fall in the same monthly partition
+        Sales.objects.filter(pk__in=sold_at).update(
+            created_at=Case(
+                *(When(pk=pk, then=Value(value)) for pk, value in sold_at.items()),
+                output_field=models.DateTimeField(),
+            ),
+            version=F("version") + 1,
+        )
+        ProductSales.objects.filter(sale__in=sold_at).update(
+            created_at=Case(
+                *(When(sale=pk, then=Value(value)) for pk, value in sold_at.items()),
+                output_field=models.DateTimeField(),
+            )
+        )
+    recorded = Sales.objects.filter(pk__in=[record.pk for record in records])
+    DailySalesRollup.add_sales(recorded)
+    DailyProductRollup.add_sales(recorded)
+
+
+def ingest_sales(items):
+    """
+    Record a batch of offline sales, returning a result per item in order:
+    created with the new sale's uuid, duplicate with the uuid of the sale
+    already recorded for its business, cashier and client_reference, or
+    rejected with its errors
+    """
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        serializer = BatchSaleSerializer(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = sale_result(item.get("client_reference"), REJECTED, errors=serializer.errors)
+
+    references = resolve_references([sale for _, sale in valid])
+    accepted = []
+    first_seen = {}
+    for index, sale in valid:
+        errors = reference_errors(sale, references)
+        if errors:
+            results[index] = sale_result(sale["client_reference"], REJECTED, errors=errors)
+            continue
+        key = client_key(sale, references)
+        if key in first_seen:
+            # filled in once the first copy has been recorded
+            first_seen[key].append(index)
+        else:
+            first_seen[key] = []
+            accepted.append((index, sale))
+
+    if accepted:
+        with transaction.atomic():
+            record_sales(accepted, references, results)
+
+    for index, sale in accepted:
+        first = results[index]
+        for repeat in first_seen[client_key(sale, references)]:
+            results[repeat] = sale_result(first["client_reference"], DUPLICATE, first["uuid"])
+    return results
@@ -0,0 +1,49 @@
+"""
+Management command that detaches the monthly partitions of a closed year
+from the sales tables and archives them
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from sales.partitions import archive_year
+
+
+class Command(BaseCommand):
+    help = (
+        "Detach the sales and sale line partitions of a closed year and move them to "
+        "the archive schema, or drop them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("year", type=int, help="year to archive, before the current one")
+        parser.add_argument(
+            "--schema",
+            default=settings.SALES_ARCHIVE_SCHEMA,
+            help="schema the partitions are moved to",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="drop the partitions instead, once they are backed up elsewhere",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The sales tables are only partitioned on PostgreSQL")
+        year = options["year"]
+        if year >= timezone.localdate().year:
+            raise CommandError(f"{year} is not closed yet")
+
+        archived, left_behind = archive_year(year, options["schema"], options["drop"])
+        if not archived:
+            self.stdout.write(f"No partitions of {year} to archive")
+        for name in archived:
+            self.stdout.write(f"Dropped {name}" if options["drop"] else f"Moved {name} to {options['schema']}")
+        if left_behind:
+            self.stdout.write(
+                self.style.WARNING(f"{left_behind} rows of {year} are in the default partitions and were kept")
+            )
+        # the daily rollups are kept, so summaries over the year still add up
+        self.stdout.write(self.style.SUCCESS(f"Archived {len(archived)} partitions of {year}"))
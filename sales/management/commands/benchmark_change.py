@@ -0,0 +1,35 @@
+"""
+Management command that times the change making solver on random drawers
+"""
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from sales.change import DENOMINATIONS, make_change, solve_change
+
+
+class Command(BaseCommand):
+    help = "Time change making for random till drawers and change amounts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cases", type=int, default=1000, help="drawers and amounts to try")
+        parser.add_argument("--max-count", type=int, default=40, help="most of a denomination in a drawer")
+        parser.add_argument("--max-change", type=int, default=2000, help="largest change amount")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        cases = [
+            (
+                rng.randint(0, options["max_change"]),
+                {value: rng.randint(0, options["max_count"]) for value in DENOMINATIONS},
+            )
+            for _ in range(options["cases"])
+        ]
+        make_change(0, {})  # build the change table outside the timings
+        for name, solver in (("make_change", make_change), ("solve_change", solve_change)):
+            seconds = timeit.timeit(lambda: [solver(amount, drawer) for amount, drawer in cases], number=1)
+            self.stdout.write(f"{name}: {seconds / len(cases) * 1e6:.1f} µs per change")
+        solved = sum(make_change(amount, drawer) is not None for amount, drawer in cases)
+        self.stdout.write(self.style.SUCCESS(f"{solved} of {len(cases)} amounts could be made exactly"))
@@ -0,0 +1,243 @@
+"""
+Management command that seeds a large sales history and records the query
+plans of the hot sales and catalogue lookups, on the indexes the models
+declare and on the indexes they replaced
+"""
+import copy
+import re
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from administration.models import Business
+from products.models import Category, Product, Stock
+from sales.models import ProductSales, Sales, day_range
+
+# the field options each column had before its lookups were indexed for
+FORMER_FIELDS = [
+    (Sales, "uuid", {"unique": False, "db_index": True}),
+    (Sales, "business_id", {"db_index": True}),
+    (ProductSales, "uuid", {"unique": False, "db_index": True}),
+    (ProductSales, "sale", {"db_index": True}),
+    (Product, "uuid", {"unique": False, "db_index": True}),
+    (Stock, "uuid", {"unique": False, "db_index": True}),
+]
+# models whose Meta.indexes and constraints were all added with them
+INDEXED_MODELS = [Sales, ProductSales]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a sales history in a transaction that is rolled back and print the "
+        "plans of the hot queries before and after their indexes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sales", type=int, default=1_000_000, help="sales to seed")
+        parser.add_argument("--lines", type=int, default=3, help="product lines per sale")
+        parser.add_argument("--products", type=int, default=2000, help="products to seed")
+        parser.add_argument("--businesses", type=int, default=20, help="businesses to seed")
+        parser.add_argument("--days", type=int, default=730, help="days the sales span")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            self.stderr.write("Query plans are only recorded on PostgreSQL")
+            return
+        # each side is seeded afresh in a savepoint rolled back after it is
+        # explained, Postgres refuses to index a table with foreign key checks
+        # still pending on rows inserted in the same transaction
+        with transaction.atomic():
+            after = self.record(options, former=False)
+            self.restore_former_indexes()
+            before = self.record(options, former=True)
+            transaction.set_rollback(True)
+
+        for name, (plan, milliseconds) in before.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{name}"))
+            self.stdout.write(f"before: {milliseconds:.2f} ms\n{plan}")
+            plan, milliseconds = after[name]
+            self.stdout.write(f"after: {milliseconds:.2f} ms\n{plan}")
+        self.stdout.write(self.style.MIGRATE_HEADING("\nexecution time"))
+        for name, (_, milliseconds) in before.items():
+            self.stdout.write(f"  {name}: {milliseconds:.2f} ms -> {after[name][1]:.2f} ms")
+
+    def record(self, options, former):
+        """
+        Seed the history and return the plan and execution time of every
+        query, written as they are now or as they used to be
+        """
+        with transaction.atomic():
+            started = time.perf_counter()
+            sample = self.seed(options)
+            self.stdout.write(
+                f"seeded {options['sales']} sales and {options['sales'] * options['lines']} "
+                f"lines in {time.perf_counter() - started:.0f} s"
+            )
+            self.analyze()
+            plans = {name: self.explain(query) for name, query in self.queries(sample, former)}
+            transaction.set_rollback(True)
+        return plans
+
+    def seed(self, options):
+        """
+        Insert the history in bulk and return the rows the queries look up
+        """
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(username=f"benchmark-owner-{index}") for index in range(options["businesses"])
+        )
+        businesses = Business.objects.bulk_create(
+            Business(name=f"Business {index}", address="", tax_pin="", owner=user) for index, user in enumerate(users)
+        )
+        category = Category.objects.create(name="Benchmark")
+        products = Product.objects.bulk_create(
+            Product(
+                category=category,
+                name=f"Product {index}",
+                code=f"BENCH{index:06d}",
+                product_type=Product.ProductType.Finished_Product,
+                tax_type=Product.TaxType.B,
+                packaging_unit=Product.PackagingUnit.Bundle,
+                unit=Product.UnitOfQuantity.Pair,
+            )
+            for index in range(options["products"])
+        )
+        Stock.objects.bulk_create(
+            Stock(
+                product_id=product,
+                stock_quantity=100,
+                cost_per_unit=50,
+                price_per_unit_retail=100,
+                price_per_unit_wholesale=80,
+            )
+            for product in products
+        )
+
+        # sales arrive in time order, so created_at follows the primary key
+        end = timezone.now()
+        start = end - timedelta(days=options["days"])
+        step = (end - start) / options["sales"]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Sales._meta.db_table} (
+                    uuid, business_id_id, sale_amount_with_tax, tax_amount, receipt_type,
+                    transaction_type, sale_status, receipt_label, created_at, updated_at, version
+                )
+                SELECT gen_random_uuid(), (%s::bigint[])[1 + mod(i, %s)], 300, 41.38, 'S',
+                    'N', %s, 'NS', %s + i * %s, %s + i * %s, 1
+                FROM generate_series(1, %s) AS i
+                """,
+                [
+                    [business.pk for business in businesses],
+                    len(businesses),
+                    Sales.TransactionProgress.Approved,
+                    start,
+                    step,
+                    start,
+                    step,
+                    options["sales"],
+                ],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {ProductSales._meta.db_table} (
+                    uuid, product_id, sale_id, quantity_sold, price_per_unit, is_wholesale,
+                    price, tax_amount, tax_rate, created_at, updated_at
+                )
+                SELECT gen_random_uuid(), (%s::bigint[])[1 + mod(sale.id * 7 + line, %s)],
+                    sale.id, 1, 100, false, 100, 13.79, 'B', sale.created_at, sale.created_at
+                FROM {Sales._meta.db_table} AS sale, generate_series(1, %s) AS line
+                WHERE sale.business_id_id = ANY(%s)
+                """,
+                [
+                    [product.pk for product in products],
+                    len(products),
+                    options["lines"],
+                    [business.pk for business in businesses],
+                ],
+            )
+
+        # the most recent sale of a business, and a day in the middle of the history
+        sale = Sales.objects.filter(business_id=businesses[0]).latest("created_at")
+        return {
+            "business": businesses[0],
+            "sale": sale,
+            "product": sale.product_sales.first().product,
+            "day": timezone.localdate(start + (end - start) / 2),
+        }
+
+    def queries(self, sample, former):
+        """
+        The hot queries by name, filtering dates on the stored value or, as
+        they used to, on the date computed from it
+        """
+
+        def days(start_date, end_date, field="created_at"):
+            if former:
+                return {f"{field}__date__range": (start_date, end_date)}
+            return day_range(start_date, end_date, field)
+
+        day = sample["day"]
+        week = (day - timedelta(days=6), day)
+        sale = sample["sale"]
+        return [
+            ("sale by uuid", Sales.objects.filter(uuid=sale.uuid)),
+            ("product by code", Product.objects.filter(code=sample["product"].code)),
+            (
+                "sales of a business over a week",
+                Sales.objects.filter(business_id=sample["business"], **days(*week)),
+            ),
+            (
+                "first export page of a day",
+                Sales.objects.filter(**days(day, day)).order_by("created_at", "id")[:100],
+            ),
+            ("lines of a sale", ProductSales.objects.filter(sale=sale)),
+            (
+                "product line on a sale",
+                ProductSales.objects.filter(sale=sale, product=sample["product"]),
+            ),
+            (
+                "lines sold over a week",
+                ProductSales.objects.filter(sale__in=Sales.objects.filter(**days(*week))),
+            ),
+            (
+                "stock changed over a week",
+                Stock.objects.filter(**days(*week, field="updated_at")),
+            ),
+        ]
+
+    def explain(self, queryset):
+        """
+        The analyzed plan of the second run of queryset, so both sides of the
+        comparison read from a warm cache, and its execution time
+        """
+        queryset.explain(analyze=True)
+        plan = queryset.explain(analyze=True, buffers=True)
+        milliseconds = float(re.search(r"Execution Time: ([\d.]+) ms", plan).group(1))
+        return plan, milliseconds
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            for model in (Sales, ProductSales, Product, Stock):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    def restore_former_indexes(self):
+        """
+        Put back the indexes the models had before, inside the transaction
+        """
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    schema_editor.remove_index(model, index)
+                for constraint in model._meta.constraints:
+                    schema_editor.remove_constraint(model, constraint)
+            for model, name, options in FORMER_FIELDS:
+                field = model._meta.get_field(name)
+                former = copy.copy(field)
+                former.db_index = options["db_index"]
+                former._unique = options.get("unique", field.unique)
+                schema_editor.alter_field(model, field, former)
@@ -0,0 +1,33 @@
+"""
+Management command that backfills the daily sales rollups
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.models import DailyProductRollup, DailySalesRollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales and product rollups from approved sales"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start-date", help="first day to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--end-date", help="last day to rebuild (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        try:
+            start_date, end_date = (
+                datetime.strptime(options[name], "%Y-%m-%d").date() if options[name] else None
+                for name in ("start_date", "end_date")
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        sales_rollups = DailySalesRollup.rebuild(start_date, end_date)
+        product_rollups = DailyProductRollup.rebuild(start_date, end_date)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {len(sales_rollups)} sales rollups and {len(product_rollups)} product rollups"
+            )
+        )
@@ -0,0 +1,105 @@
+# Generated by Django 4.2.3 on 2026-10-18 06:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0006_stockmovement_remove_stock_movement_fields"),
+        ("administration", "0006_delete_customer"),
+        ("sales", "0016_alter_sales_business_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySalesRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField()),
+                (
+                    "payment_method",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("01", "CASH"),
+                            ("02", "CREDIT"),
+                            ("03", "CASH/CREDIT"),
+                            ("04", "BANK CHECK"),
+                            ("05", "DEBIT AND CREDIT CARD"),
+                            ("06", "MOBILE MONEY"),
+                            ("07", "OTHER"),
+                        ],
+                        max_length=2,
+                        null=True,
+                    ),
+                ),
+                ("sales_count", models.PositiveIntegerField(default=0)),
+                ("sale_amount_with_tax", models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ("tax_amount", models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                (
+                    "business",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales_rollups",
+                        to="administration.business",
+                    ),
+                ),
+                (
+                    "cashier",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales_rollups",
+                        to="administration.employee",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["day"],
+                "indexes": [
+                    models.Index(fields=["business", "day"], name="sales_daily_busines_4e865e_idx"),
+                    models.Index(fields=["day"], name="sales_daily_day_a85d34_idx"),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyProductRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField()),
+                ("quantity_sold", models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ("price", models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ("tax_amount", models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ("cost", models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                (
+                    "business",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_product_rollups",
+                        to="administration.business",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_rollups",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["day"],
+                "indexes": [
+                    models.Index(fields=["business", "day", "product"], name="sales_daily_busines_1f1605_idx"),
+                    models.Index(fields=["day"], name="sales_daily_day_2d632c_idx"),
+                ],
+            },
+        ),
+    ]
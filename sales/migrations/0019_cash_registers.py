@@ -0,0 +1,106 @@
+# Generated by Django 4.2.3 on 2026-10-18 06:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+DENOMINATIONS = (1, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def move_till_into_register(apps, schema_editor):
+    """
+    Carry the cash counted in the shared CASH payment mode over to a register
+    """
+    PaymentMode = apps.get_model("sales", "PaymentMode")
+    CashRegister = apps.get_model("sales", "CashRegister")
+    TillDrawer = apps.get_model("sales", "TillDrawer")
+    db = schema_editor.connection.alias
+    counts = dict.fromkeys(DENOMINATIONS, 0)
+    found = False
+    modes = PaymentMode.objects.using(db).filter(payment_method__in=["01", "03"])
+    for properties in modes.values_list("properties", flat=True):
+        for denomination, count in (properties or {}).items():
+            if str(denomination).isdigit() and int(denomination) in counts:
+                counts[int(denomination)] += int(count or 0)
+                found = True
+    if not found:
+        return
+    register = CashRegister.objects.using(db).create(name="Main")
+    TillDrawer.objects.using(db).bulk_create(
+        [
+            TillDrawer(register=register, denomination=denomination, count=max(count, 0))
+            for denomination, count in counts.items()
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("administration", "0006_delete_customer"),
+        ("sales", "0018_reportjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CashRegister",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("uuid", models.UUIDField(db_index=True, default=uuid.uuid4, editable=False)),
+                ("name", models.CharField(max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "business",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cash_registers",
+                        to="administration.business",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="TillDrawer",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("denomination", models.PositiveIntegerField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "register",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="drawer", to="sales.cashregister"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["register", "denomination"],
+            },
+        ),
+        migrations.AddField(
+            model_name="sales",
+            name="register",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="sales",
+                to="sales.cashregister",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="tilldrawer",
+            constraint=models.UniqueConstraint(fields=("register", "denomination"), name="unique_till_denomination"),
+        ),
+        migrations.AddConstraint(
+            model_name="cashregister",
+            constraint=models.UniqueConstraint(fields=("business", "name"), name="unique_cash_register_name"),
+        ),
+        migrations.RunPython(move_till_into_register, migrations.RunPython.noop),
+    ]
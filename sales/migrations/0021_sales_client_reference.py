@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-18 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("sales", "0020_idempotency_keys"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sales",
+            name="client_reference",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
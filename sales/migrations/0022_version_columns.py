@@ -0,0 +1,22 @@
+# Generated by Django 4.2.3 on 2026-10-18 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("sales", "0021_sales_client_reference"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="paymentmode",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="sales",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
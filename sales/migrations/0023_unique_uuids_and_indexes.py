@@ -0,0 +1,114 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:16
+
+from django.db import migrations, models
+from django.db.models import Count, F
+import django.db.models.deletion
+import uuid
+
+APP_LABEL = "sales"
+MODELS = ("cashregister", "customer", "paymentmode", "productsales", "purchase", "reportjob", "sales")
+
+
+def reissue_duplicate_uuids(apps, schema_editor):
+    """
+    Give a fresh uuid to every row sharing one with an older row, which rows
+    that existed when the uuid column was added all do, before it is unique
+    """
+    db = schema_editor.connection.alias
+    for model_name in MODELS:
+        model = apps.get_model(APP_LABEL, model_name)
+        rows = model.objects.using(db)
+        duplicated = rows.values("uuid").annotate(count=Count("pk")).filter(count__gt=1).values("uuid")
+        seen = set()
+        for pk, value in rows.filter(uuid__in=duplicated).order_by("pk").values_list("pk", "uuid"):
+            if value not in seen:
+                seen.add(value)
+                continue
+            changes = {"uuid": uuid.uuid4()}
+            if any(field.name == "version" for field in model._meta.fields):
+                changes["version"] = F("version") + 1
+            rows.filter(pk=pk).update(**changes)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("administration", "0007_unique_uuids"),
+        ("sales", "0022_version_columns"),
+    ]
+
+    operations = [
+        migrations.RunPython(reissue_duplicate_uuids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="cashregister",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="customer",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="paymentmode",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="productsales",
+            name="sale",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="product_sales",
+                to="sales.sales",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="productsales",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="purchase",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="reportjob",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="sales",
+            name="business_id",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="sale",
+                to="administration.business",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="sales",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name="productsales",
+            index=models.Index(fields=["sale", "product"], name="sales_produ_sale_id_0d1044_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productsales",
+            index=models.Index(fields=["created_at", "id"], name="sales_produ_created_0ddc82_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="sales",
+            index=models.Index(fields=["business_id", "created_at"], name="sales_sales_busines_39f8f3_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="sales",
+            index=models.Index(fields=["created_at", "id"], name="sales_sales_created_119d8e_idx"),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+from sales.partitions import PARTITIONED_TABLES, rebuild_table
+
+
+def partition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for table in PARTITIONED_TABLES:
+            rebuild_table(schema_editor, table, partitioned=True)
+
+
+def unpartition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for table in PARTITIONED_TABLES:
+            rebuild_table(schema_editor, table, partitioned=False)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("sales", "0023_unique_uuids_and_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="productsales",
+            name="sale",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="product_sales",
+                to="sales.sales",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="productsales",
+            name="uuid",
+            field=models.UUIDField(db_index=True, default=uuid.uuid4, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="sales",
+            name="client_reference",
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name="sales",
+            name="uuid",
+            field=models.UUIDField(db_index=True, default=uuid.uuid4, editable=False),
+        ),
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
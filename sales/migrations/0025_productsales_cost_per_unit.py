@@ -0,0 +1,35 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:49
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def copy_stock_costs(apps, schema_editor):
+    """Lines sold before costs were kept on them take their product's current stock cost"""
+    ProductSales = apps.get_model("sales", "ProductSales")
+    Stock = apps.get_model("products", "Stock")
+    db = schema_editor.connection.alias
+    ProductSales.objects.using(db).update(
+        cost_per_unit=Coalesce(
+            Subquery(Stock.objects.using(db).filter(product_id=OuterRef("product_id")).values("cost_per_unit")[:1]),
+            Value(0),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0008_product_code_index"),
+        ("sales", "0024_partition_sales"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productsales",
+            name="cost_per_unit",
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+        ),
+        migrations.RunPython(copy_stock_costs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.3 on 2026-10-18 08:04
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("sales", "0025_productsales_cost_per_unit"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="productsales",
+            constraint=models.UniqueConstraint(fields=("uuid", "created_at"), name="unique_product_sale_uuid"),
+        ),
+        migrations.AddConstraint(
+            model_name="sales",
+            constraint=models.UniqueConstraint(fields=("uuid", "created_at"), name="unique_sale_uuid"),
+        ),
+        migrations.AlterField(
+            model_name="productsales",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="sales",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
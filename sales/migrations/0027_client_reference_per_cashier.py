@@ -0,0 +1,23 @@
+# Generated by Django 4.2.3 on 2026-10-18 08:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("sales", "0026_unique_sale_uuids"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sales",
+            index=models.Index(
+                fields=["business_id", "cashier_id", "client_reference"], name="sales_sales_busines_33b742_idx"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="sales",
+            name="client_reference",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -2,13 +2,26 @@
 Module that contains the Models that relate to Sales
 and Sales of products
 """
+import hashlib
+import json
 import uuid as uuid_lib
-from django.db import models
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Sum, Count, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
 
 from administration.models import Business, Employee
+from pos_inventory.utils.versioning import VersionedModel
 from products.models import Product, Supplier, Stock
+from sales.change import DENOMINATIONS, make_change
+from sales.partitions import claim_uuids
 
 # Create your models here.
 
@@ -18,7 +31,7 @@ class Customer(models.Model):
     Models the product buyer information all optional
     """
 
-    uuid = models.UUIDField(editable=False, db_index=True, default=uuid_lib.uuid4)
+    uuid = models.UUIDField(editable=False, unique=True, default=uuid_lib.uuid4)
     name = models.CharField(max_length=255, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -27,7 +40,7 @@ class Customer(models.Model):
     email_address = models.CharField(max_length=255, null=True, blank=True)
 
 
-class PaymentMode(models.Model):
+class PaymentMode(VersionedModel):
     """
     Models the allowed payment types
     """
@@ -41,7 +54,7 @@ class PaymentMode(models.Model):
         MOBILE_MONEY = "06", _("MOBILE MONEY")
         OTHER = "07", _("OTHER")
 
-    uuid = models.UUIDField(editable=False, db_index=True, default=uuid_lib.uuid4)
+    uuid = models.UUIDField(editable=False, unique=True, default=uuid_lib.uuid4)
     payment_method = models.CharField(
         max_length=2, choices=PaymentMethod.choices, default=PaymentMethod.CASH
     )
@@ -66,7 +79,187 @@ class PaymentMode(models.Model):
         return payment_method_labels.get(self.payment_method, "")
 
 
-class Sales(models.Model):
+# payment mode names clients send to the payment method recorded for them
+PAYMENT_MODE_CODES = {
+    "CASH": PaymentMode.PaymentMethod.CASH,
+    "CREDIT": PaymentMode.PaymentMethod.CREDIT,
+    "CASH/CREDIT": PaymentMode.PaymentMethod.CASH_CREDIT,
+    "BANK CHECK": PaymentMode.PaymentMethod.BANK_CHECK,
+    "DEBIT AND CREDIT CARD": PaymentMode.PaymentMethod.CARD,
+    "MOBILE MONEY": PaymentMode.PaymentMethod.MOBILE_MONEY,
+    "OTHER": PaymentMode.PaymentMethod.OTHER,
+}
+
+
+class CashRegister(models.Model):
+    """
+    The till of one terminal. Its cash is kept as a TillDrawer row per
+    denomination so parallel tills never contend on the same rows
+    """
+
+    uuid = models.UUIDField(editable=False, unique=True, default=uuid_lib.uuid4)
+    business = models.ForeignKey(
+        Business,
+        related_name="cash_registers",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["name"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["business", "name"], name="unique_cash_register_name"
+            )
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            TillDrawer.objects.bulk_create(
+                [TillDrawer(register=self, denomination=value) for value in DENOMINATIONS],
+                ignore_conflicts=True,
+            )
+
+    def drawer_counts(self, lock=False):
+        """
+        Number of each denomination in the drawer. Locking holds the rows for
+        the rest of the transaction so no other till hands out the same cash
+        """
+        rows = self.drawer.order_by("denomination")
+        if lock:
+            rows = rows.select_for_update()
+        return dict(rows.values_list("denomination", "count"))
+
+    def move_cash(self, counts, sign):
+        """
+        Add (sign 1) or remove (sign -1) cash from the drawer with a single
+        UPDATE of the denomination counters. counts maps a denomination to the
+        number of notes or coins moved
+        """
+        counts = {int(value): int(count) for value, count in counts.items() if int(count)}
+        unknown = set(counts) - set(DENOMINATIONS)
+        if unknown:
+            raise ValueError(f"Unknown denominations {sorted(unknown)}")
+        if not counts:
+            return 0
+        return self.drawer.filter(denomination__in=counts).update(
+            count=Case(
+                *[
+                    When(denomination=value, then=F("count") + sign * count)
+                    for value, count in counts.items()
+                ],
+                output_field=models.PositiveIntegerField(),
+            ),
+            updated_at=timezone.now(),
+        )
+
+    def deposit(self, counts):
+        return self.move_cash(counts, 1)
+
+    def give_change(self, amount):
+        """
+        Take change for amount out of the drawer, returning the denominations
+        handed out or None, leaving the drawer as it was, when the cash in it
+        cannot make the amount exactly
+        """
+        with transaction.atomic():
+            breakdown = make_change(amount, self.drawer_counts(lock=True))
+            if breakdown is None:
+                return None
+            self.move_cash(breakdown, -1)
+        return breakdown
+
+    def break_down(self, denomination, into):
+        """
+        Swap one note or coin of denomination in the drawer for the smaller
+        ones in into, a {denomination: count} dict that must add up to it
+        """
+        into = {int(value): int(count) for value, count in into.items()}
+        if sum(value * count for value, count in into.items()) != denomination:
+            raise ValueError(f"The breakdown does not add up to {denomination}")
+        with transaction.atomic():
+            taken = self.drawer.filter(denomination=denomination, count__gte=1).update(
+                count=F("count") - 1, updated_at=timezone.now()
+            )
+            if not taken:
+                raise ValueError(f"There is no {denomination} in the drawer")
+            self.deposit(into)
+
+    def reset(self):
+        """
+        Empty the drawer
+        """
+        self.drawer.update(count=0, updated_at=timezone.now())
+
+
+class TillDrawer(models.Model):
+    """
+    Number of notes or coins of one denomination in a cash register
+    """
+
+    register = models.ForeignKey(
+        CashRegister, related_name="drawer", on_delete=models.CASCADE
+    )
+    denomination = models.PositiveIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["register", "denomination"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["register", "denomination"], name="unique_till_denomination"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.count} x {self.denomination}"
+
+
+class PartitionedQuerySet(models.QuerySet):
+    """
+    Bulk inserts into the sales tables partitioned by month, which claim the
+    uuids of the new rows first
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            claim_uuids(self.model, [obj.uuid for obj in objs], self.db)
+            return super().bulk_create(objs, *args, **kwargs)
+
+
+class PartitionedModel(models.Model):
+    """
+    Base for the sales tables partitioned by month on created_at, see
+    sales.partitions. A unique index on them has to include created_at, so
+    the uuid of a new row is checked against the whole table by claim_uuids
+    """
+
+    objects = PartitionedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            claim_uuids(type(self), [self.uuid], using)
+            super().save(*args, **kwargs)
+
+
+class Sales(VersionedModel, PartitionedModel):
     """
     Sales Model information
     """
@@ -101,12 +294,20 @@ class Sales(models.Model):
         PROFORMA = "P", _("Proforma")
         TRAINING = "T", _("Training")
 
-    uuid = models.UUIDField(editable=False, db_index=True, default=uuid_lib.uuid4)
+    # unique with created_at, the partition key, and kept unique on its own
+    # by PartitionedModel
+    uuid = models.UUIDField(editable=False, default=uuid_lib.uuid4)
     customer_id = models.ForeignKey(
         Customer, related_name="sales", on_delete=models.CASCADE, null=True, blank=True
     )
+    # served by the (business_id, created_at) index
     business_id = models.ForeignKey(
-        Business, related_name="sale", on_delete=models.CASCADE, null=True, blank=True
+        Business,
+        related_name="sale",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
     )
     payment_id = models.ForeignKey(
         PaymentMode,
@@ -118,6 +319,13 @@ class Sales(models.Model):
     cashier_id = models.ForeignKey(
         Employee, related_name="sales", on_delete=models.CASCADE, null=True, blank=True
     )
+    register = models.ForeignKey(
+        CashRegister,
+        related_name="sales",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
     products = models.ManyToManyField(
         Product, related_name="sales", through="ProductSales"
     )
@@ -133,12 +341,29 @@ class Sales(models.Model):
         max_length=3, choices=TransactionProgress.choices, null=True, blank=True
     )
     receipt_label = models.CharField(max_length=5)
+    # id a terminal gave a sale it queued offline, so a retried upload of it
+    # is recognised instead of recorded twice. Kept unique for a business's
+    # cashier by sales.ingest, which locks the references it records
+    client_reference = models.CharField(max_length=64, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "sales"
         ordering = ["created_at", "updated_at"]
+        indexes = [
+            # a business's sales over a period, and every sale over a period
+            # in the order the cursor pages and exports walk them
+            models.Index(fields=["business_id", "created_at"]),
+            models.Index(fields=["created_at", "id"]),
+            # the sales a batch upload may already have recorded
+            models.Index(fields=["business_id", "cashier_id", "client_reference"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["uuid", "created_at"], name="unique_sale_uuid"
+            )
+        ]
 
     def get_absolute_url(self):
         return f"/sales/{self.uuid}"
@@ -150,84 +375,136 @@ class Sales(models.Model):
         """
         Reset the cash register
         """
-        reset_dict = {1: 0, 5: 0, 10: 0, 20: 0, 50: 0, 100: 0, 200: 0, 500: 0, 1000: 0}
-
-        # Copy reset_dict values to properties field
-        if self.payment_id:
-            self.payment_id.properties.update(reset_dict)
-            self.payment_id.save()
+        if self.register:
+            self.register.reset()
 
     def generate_change(self, sale_amount, amount_paid):
         """
-        Generate the change to be given
+        Generate the change to be given, taking it out of the sale's cash
+        register. Returns the change and the denominations handed out, which
+        are None when there is no register or it cannot make the change
         """
-        properties = self.payment_id.properties
+        change = amount_paid - sale_amount
+        if change < 0:
+            return 0, None
+        if self.register is None:
+            return change, None
+        return change, self.register.give_change(change)
 
-        # Calculate the total cash in the till
-        total_cash = sum(
-            int(denomination) * quantity
-            for denomination, quantity in properties.items()
+    def roll_up(self, sign=1):
+        """
+        Add this sale and its product lines to the daily rollups when it is
+        approved, or take them off again with sign -1 before an approved sale
+        is deleted or changed
+        """
+        with transaction.atomic():
+            self.update_sales_rollup(
+                sales_count=sign,
+                sale_amount_with_tax=sign * Decimal(self.sale_amount_with_tax),
+                tax_amount=sign * Decimal(self.tax_amount),
+            )
+            self.update_product_rollup(self.product_sales.all(), sign)
+
+    def roll_up_lines(self, lines, sign=1):
+        """
+        Add a queryset of product lines put on this approved sale to the daily
+        rollups, or take them off with sign -1 before they are deleted
+        """
+        totals = lines.aggregate(price=Sum("price"), tax_amount=Sum("tax_amount"))
+        price, tax_amount = totals["price"] or 0, totals["tax_amount"] or 0
+        with transaction.atomic():
+            self.update_sales_rollup(
+                sales_count=0,
+                sale_amount_with_tax=sign * (price + tax_amount),
+                tax_amount=sign * tax_amount,
+            )
+            self.update_product_rollup(lines, sign)
+
+    def update_sales_rollup(self, **totals):
+        """
+        Add totals to the rollup row of this sale's business, day, cashier
+        and payment method, creating it when there is none
+        """
+        key = {
+            "business": self.business_id,
+            "day": timezone.localdate(self.created_at),
+            "cashier": self.cashier_id,
+            "payment_method": self.payment_id.payment_method if self.payment_id else None,
+        }
+        updated = DailySalesRollup.objects.filter(**key).update(
+            **{field: F(field) + total for field, total in totals.items()}
         )
+        if not updated:
+            DailySalesRollup.objects.create(**key, **totals)
 
-        change = amount_paid - sale_amount
-        if total_cash == 0:
-            return change
-        if change >= 0:
-            # Update the denominations in the till
-            denominations = sorted(properties.keys(), reverse=True)
-            remaining_change = change
-
-            for denomination in denominations:
-                quantity = properties[denomination]
-                num_denominations = remaining_change // denomination
-
-                if num_denominations <= quantity:
-                    properties[denomination] -= num_denominations
-                    remaining_change -= num_denominations * denomination
-                else:
-                    properties[denomination] = 0
-                    remaining_change -= quantity * denomination
-
-                if remaining_change == 0:
-                    break
-
-            # Save the updated properties
-            self.properties = properties
-            self.save()
-
-            return change
-        else:
-            return 0
+    def update_product_rollup(self, lines, sign):
+        """
+        Add sign times the totals of a queryset of this sale's product lines
+        to the rollup rows of their products on the sale's day
+        """
+        day = timezone.localdate(self.created_at)
+        lines = {
+            line["product_id"]: line
+            for line in lines.values("product_id").annotate(**DailyProductRollup.line_totals())
+        }
+        rollups = DailyProductRollup.objects.select_for_update().filter(
+            business=self.business_id, day=day, product_id__in=lines
+        )
+        existing = []
+        for rollup in rollups:
+            if rollup.product_id not in lines:
+                continue
+            line = lines.pop(rollup.product_id)
+            for field in DailyProductRollup.TOTAL_FIELDS:
+                total = line[f"total_{field}"] or 0
+                setattr(rollup, field, getattr(rollup, field) + sign * total)
+            existing.append(rollup)
+        DailyProductRollup.objects.bulk_update(existing, DailyProductRollup.TOTAL_FIELDS)
+        DailyProductRollup.objects.bulk_create(
+            [
+                DailyProductRollup(
+                    business=self.business_id,
+                    day=day,
+                    product_id=product_id,
+                    **{
+                        field: sign * (line[f"total_{field}"] or 0)
+                        for field in DailyProductRollup.TOTAL_FIELDS
+                    },
+                )
+                for product_id, line in lines.items()
+            ]
+        )
 
     def break_down_denominiations(self, denominations):
         """
         Breakdown demoniations when given as a list of tuples
         containing the denominiation and the wanted denominations respectively
         """
-        properties = self.payment_id.properties
-        till = properties
-        for denom, wanted_denoms in denominations:
-            if denom in till.keys():
-                till[denom] -= 1
-                amount_to_break += denom * 1
-            for denoms, quantity in wanted_denoms.items():
-                till[denoms] += quantity
-                change_so_far += denoms * quantity
-        self.properties = till
-        self.save()
+        if self.register is None:
+            raise ValueError("The sale was not made at a cash register")
+        with transaction.atomic():
+            for denomination, wanted_denominations in denominations:
+                self.register.break_down(denomination, wanted_denominations)
 
 
-class ProductSales(models.Model):
+class ProductSales(PartitionedModel):
     """
     Models the through Table of Product to Sales many to many
     """
 
-    uuid = models.UUIDField(editable=False, db_index=True, default=uuid_lib.uuid4)
+    # partitioned by month on created_at like Sales
+    uuid = models.UUIDField(editable=False, default=uuid_lib.uuid4)
     product = models.ForeignKey(
         Product, related_name="product_sales", on_delete=models.CASCADE
     )
+    # served by the (sale, product) index. Postgres cannot reference the
+    # partitioned sales table by id alone, deletes still cascade through Django
     sale = models.ForeignKey(
-        Sales, related_name="product_sales", on_delete=models.CASCADE
+        Sales,
+        related_name="product_sales",
+        on_delete=models.CASCADE,
+        db_index=False,
+        db_constraint=False,
     )
     quantity_sold = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     price_per_unit = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
@@ -235,13 +512,28 @@ class ProductSales(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     tax_rate = models.CharField(max_length=5)
+    # the stock cost when the line was sold, which reports and rollups
+    # count the line's cost and profit at
+    cost_per_unit = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    class Meta:
+        indexes = [
+            # the lines of a sale, and a product's line on it
+            models.Index(fields=["sale", "product"]),
+            models.Index(fields=["created_at", "id"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["uuid", "created_at"], name="unique_product_sale_uuid"
+            )
+        ]
+
 
 class Purchase(models.Model):
     """Model with purchase information"""
-    uuid = models.UUIDField(editable=False, db_index=True, default=uuid_lib.uuid4)
+    uuid = models.UUIDField(editable=False, unique=True, default=uuid_lib.uuid4)
     user_id = models.ForeignKey(Employee, related_name="purchases", on_delete=models.CASCADE, null=True, blank=True)
     supplier_id = models.OneToOneField(Supplier, related_name="purchases", on_delete=models.CASCADE, null=True, blank=True)
     product_id = models.ForeignKey(Stock, related_name="purchases", on_delete=models.CASCADE, null=True, blank=True)
@@ -253,4 +545,353 @@ class Purchase(models.Model):
     purchase_amount = models.DecimalField(
         max_digits=10, decimal_places=2, default=0.00
     )
-    description = models.TextField(blank=True, null=True)
\ No newline at end of file
+    description = models.TextField(blank=True, null=True)
+
+
+def day_range(start_date=None, end_date=None, field="created_at"):
+    """
+    Filter arguments selecting values of a datetime field between two local
+    dates, both inclusive, written as a half-open range so an index on the
+    field is used where field__date__range would compute a date for every row
+    """
+    filters = {}
+    if start_date:
+        filters[f"{field}__gte"] = timezone.make_aware(
+            datetime.combine(start_date, time.min)
+        )
+    if end_date:
+        filters[f"{field}__lt"] = timezone.make_aware(
+            datetime.combine(end_date + timedelta(days=1), time.min)
+        )
+    return filters
+
+
+class DailySalesRollup(models.Model):
+    """
+    Approved sales pre-aggregated per business, day, cashier and payment
+    method. Reports sum these rows instead of reading every sale, a key may
+    appear on more than one row so rows must always be summed
+    """
+
+    business = models.ForeignKey(
+        Business,
+        related_name="daily_sales_rollups",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    day = models.DateField()
+    cashier = models.ForeignKey(
+        Employee,
+        related_name="daily_sales_rollups",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    payment_method = models.CharField(
+        max_length=2, choices=PaymentMode.PaymentMethod.choices, null=True, blank=True
+    )
+    sales_count = models.PositiveIntegerField(default=0)
+    sale_amount_with_tax = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0.00
+    )
+    tax_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+
+    class Meta:
+        ordering = ["day"]
+        indexes = [models.Index(fields=["business", "day"]), models.Index(fields=["day"])]
+
+    @classmethod
+    def rebuild(cls, start_date=None, end_date=None):
+        """
+        Recompute the rollups of the given days, all days by default, from the
+        approved sales
+        """
+        rollups = cls.objects.all()
+        if start_date:
+            rollups = rollups.filter(day__gte=start_date)
+        if end_date:
+            rollups = rollups.filter(day__lte=end_date)
+        sales = Sales.objects.filter(
+            sale_status=Sales.TransactionProgress.Approved,
+            **day_range(start_date, end_date),
+        )
+        with transaction.atomic():
+            rollups.delete()
+            return cls.add_sales(sales)
+
+    @classmethod
+    def add_sales(cls, sales):
+        """
+        Add the totals of a queryset of approved sales as new rollup rows,
+        one per key, in a single aggregate and insert
+        """
+        return cls.objects.bulk_create(
+            (
+                cls(
+                    business_id=row["business_id"],
+                    day=row["day"],
+                    cashier_id=row["cashier_id"],
+                    payment_method=row["payment_id__payment_method"],
+                    sales_count=row["sales_count"],
+                    sale_amount_with_tax=row["total_sale_amount_with_tax"],
+                    tax_amount=row["total_tax_amount"],
+                )
+                for row in sales.annotate(day=TruncDate("created_at"))
+                .values("business_id", "day", "cashier_id", "payment_id__payment_method")
+                .annotate(
+                    sales_count=Count("id"),
+                    total_sale_amount_with_tax=Sum("sale_amount_with_tax"),
+                    total_tax_amount=Sum("tax_amount"),
+                )
+                .order_by()
+            ),
+            batch_size=1000,
+        )
+
+
+class DailyProductRollup(models.Model):
+    """
+    Approved sale lines pre-aggregated per business, day and product, cost
+    is taken at the stock cost each line was sold at. A key may appear on
+    more than one row so rows must always be summed
+    """
+
+    TOTAL_FIELDS = ["quantity_sold", "price", "tax_amount", "cost"]
+
+    business = models.ForeignKey(
+        Business,
+        related_name="daily_product_rollups",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    day = models.DateField()
+    product = models.ForeignKey(
+        Product, related_name="daily_rollups", on_delete=models.CASCADE
+    )
+    quantity_sold = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    price = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    tax_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+
+    class Meta:
+        ordering = ["day"]
+        indexes = [
+            models.Index(fields=["business", "day", "product"]),
+            models.Index(fields=["day"]),
+        ]
+
+    @classmethod
+    def line_totals(cls):
+        """
+        Aggregates of ProductSales rows, one total_<field> per TOTAL_FIELDS
+        """
+        return {
+            "total_quantity_sold": Sum("quantity_sold"),
+            "total_price": Sum("price"),
+            "total_tax_amount": Sum("tax_amount"),
+            "total_cost": Sum(
+                ExpressionWrapper(
+                    F("quantity_sold") * F("cost_per_unit"),
+                    output_field=DecimalField(),
+                )
+            ),
+        }
+
+    @classmethod
+    def rebuild(cls, start_date=None, end_date=None):
+        """
+        Recompute the rollups of the given days, all days by default, from the
+        lines of approved sales
+        """
+        rollups = cls.objects.all()
+        if start_date:
+            rollups = rollups.filter(day__gte=start_date)
+        if end_date:
+            rollups = rollups.filter(day__lte=end_date)
+        sales = Sales.objects.filter(
+            sale_status=Sales.TransactionProgress.Approved,
+            **day_range(start_date, end_date),
+        )
+        with transaction.atomic():
+            rollups.delete()
+            return cls.add_sales(sales)
+
+    @classmethod
+    def add_sales(cls, sales):
+        """
+        Add the line totals of a queryset of approved sales as new rollup
+        rows, one per key, in a single aggregate and insert
+        """
+        return cls.objects.bulk_create(
+            (
+                cls(
+                    business_id=row["sale__business_id"],
+                    day=row["day"],
+                    product_id=row["product_id"],
+                    **{field: row[f"total_{field}"] or 0 for field in cls.TOTAL_FIELDS},
+                )
+                for row in ProductSales.objects.filter(sale__in=sales)
+                .annotate(day=TruncDate("sale__created_at"))
+                .values("sale__business_id", "day", "product_id")
+                .annotate(**cls.line_totals())
+                .order_by()
+            ),
+            batch_size=1000,
+        )
+
+
+class ReportJob(models.Model):
+    """
+    A report generated in the background and kept as a file to download later
+    """
+
+    class ReportType(models.TextChoices):
+        SALES = "sales", _("Sales Report")
+        STOCK_MOVEMENT = "stock_movement", _("Stock Movement Report")
+
+    class ReportFormat(models.TextChoices):
+        JSON = "json", _("JSON")
+        CSV = "csv", _("CSV")
+
+    class JobStatus(models.TextChoices):
+        PENDING = "PENDING", _("Pending")
+        RUNNING = "RUNNING", _("Running")
+        SUCCESS = "SUCCESS", _("Success")
+        FAILURE = "FAILURE", _("Failure")
+
+    ACTIVE_STATUSES = [JobStatus.PENDING, JobStatus.RUNNING]
+
+    uuid = models.UUIDField(editable=False, unique=True, default=uuid_lib.uuid4)
+    report_type = models.CharField(max_length=20, choices=ReportType.choices)
+    report_format = models.CharField(
+        max_length=4, choices=ReportFormat.choices, default=ReportFormat.JSON
+    )
+    parameters = models.JSONField(default=dict)
+    fingerprint = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=7, choices=JobStatus.choices, default=JobStatus.PENDING)
+    result = models.FileField(upload_to="reports/", null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="report_jobs",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            # only one job per distinct report may be waiting or running at a time
+            models.UniqueConstraint(
+                fields=["fingerprint"],
+                condition=models.Q(status__in=["PENDING", "RUNNING"]),
+                name="unique_active_report_job",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.report_type} report {self.uuid}"
+
+    @staticmethod
+    def make_fingerprint(report_type, report_format, parameters):
+        """
+        Hash identifying every request for the same report
+        """
+        payload = json.dumps([report_type, report_format, parameters], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @classmethod
+    def request(cls, report_type, report_format, parameters, requested_by=None):
+        """
+        Return the job for a report and whether it was newly created. A job for
+        the same report that is queued, running or recently finished is reused
+        """
+        fingerprint = cls.make_fingerprint(report_type, report_format, parameters)
+        reuse_after = timezone.now() - timedelta(seconds=settings.REPORT_JOB_REUSE_SECONDS)
+        existing = (
+            cls.objects.filter(fingerprint=fingerprint)
+            .filter(
+                models.Q(status__in=cls.ACTIVE_STATUSES)
+                | models.Q(status=cls.JobStatus.SUCCESS, finished_at__gte=reuse_after)
+            )
+            .first()
+        )
+        if existing is not None:
+            return existing, False
+        try:
+            with transaction.atomic():
+                job = cls.objects.create(
+                    report_type=report_type,
+                    report_format=report_format,
+                    parameters=parameters,
+                    fingerprint=fingerprint,
+                    requested_by=requested_by,
+                )
+        except IntegrityError:
+            # an identical request queued the report between our check and insert
+            return cls.objects.get(fingerprint=fingerprint, status__in=cls.ACTIVE_STATUSES), False
+        return job, True
+
+    def start(self):
+        """
+        Move a pending job to running, returning False if another worker has it
+        """
+        started = ReportJob.objects.filter(pk=self.pk, status=self.JobStatus.PENDING).update(
+            status=self.JobStatus.RUNNING, updated_at=timezone.now()
+        )
+        if started:
+            self.status = self.JobStatus.RUNNING
+        return bool(started)
+
+    def finish(self, filename=None, content=None, error=""):
+        """
+        Store the generated file, or the reason there is none, and close the job
+        """
+        if content is not None:
+            self.result.save(filename, ContentFile(content), save=False)
+            self.status = self.JobStatus.SUCCESS
+        else:
+            self.status = self.JobStatus.FAILURE
+        self.error = error
+        self.finished_at = timezone.now()
+        self.save(update_fields=["result", "status", "error", "finished_at", "updated_at"])
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response given to a request sent with an Idempotency-Key header, replayed
+    when a terminal retries the same request instead of running it again
+    """
+
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name="idempotency_keys", on_delete=models.CASCADE
+    )
+    # sha256 of the method, path and body the key was first used with
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    # encoded the way the API renders it, so a replay matches the original
+    response = models.JSONField(null=True, blank=True, encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key")
+        ]
+
+    def __str__(self):
+        return self.key
+
+    @classmethod
+    def purge(cls):
+        """
+        Delete the keys older than IDEMPOTENCY_KEY_TTL_HOURS
+        """
+        cutoff = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        return cls.objects.filter(created_at__lt=cutoff).delete()[0]
@@ -0,0 +1,230 @@
+"""
+Monthly range partitions of the sales tables on PostgreSQL. Sales and their
+lines are partitioned on created_at with one partition a month, named like
+sales_sales_2026_10, and a default partition for rows outside all of them,
+so a query over recent months only reads their partitions and a closed year
+is taken out of the tables by detaching its partitions
+"""
+import re
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.utils import timezone
+
+PARTITIONED_TABLES = ("sales_sales", "sales_productsales")
+PARTITION_KEY = "created_at"
+
+
+def claim_uuids(model, uuids, using=DEFAULT_DB_ALIAS):
+    """
+    Lock the uuids of rows about to be inserted into a partitioned table, in
+    a fixed order, and raise IntegrityError if one is repeated or already
+    taken. The table's unique constraint has to include created_at, so it
+    only rejects a uuid repeated at the same time. Must run inside a
+    transaction
+    """
+    uuids = [str(uuid) for uuid in uuids]
+    if len(set(uuids)) != len(uuids):
+        raise IntegrityError(f"Repeated uuids inserted into {model._meta.db_table}")
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(key) FROM ("
+                "SELECT DISTINCT hashtextextended(%s || uuid, 0) AS key "
+                "FROM unnest(%s::text[]) AS uuid ORDER BY key) AS keys",
+                [model._meta.db_table, sorted(uuids)],
+            )
+    taken = list(model._base_manager.using(using).filter(uuid__in=uuids).values_list("uuid", flat=True)[:5])
+    if taken:
+        raise IntegrityError(f"{model._meta.db_table} already has rows with uuids {', '.join(map(str, taken))}")
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """
+    Start of the local month and of the month after, the range of its partition
+    """
+    return tuple(
+        timezone.make_aware(datetime.combine(add_months(month, offset), datetime.min.time())) for offset in (0, 1)
+    )
+
+
+def partition_name(table, month):
+    return f"{table}_{month:%Y_%m}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def monthly_partitions(table, using=DEFAULT_DB_ALIAS):
+    """
+    The month of every monthly partition attached to table, by name
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    pattern = re.compile(rf"{re.escape(table)}_(\d{{4}})_(\d{{2}})$")
+    return {
+        name: date(int(match[1]), int(match[2]), 1)
+        for name, match in ((name, pattern.match(name)) for name in names)
+        if match
+    }
+
+
+def create_partition(table, month, using=DEFAULT_DB_ALIAS):
+    """
+    Attach the partition of a month to table unless it has one, moving the
+    rows of the month that went to the default partition into it. Returns
+    whether it was created
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    name = partition_name(table, month)
+    start, end = month_bounds(month)
+    with transaction.atomic(using), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+        # filled and checked before it is attached, a partition created
+        # directly would clash with the default partition's rows
+        cursor.execute(f"CREATE TABLE {quote(name)} (LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {quote(default_partition_name(table))} "
+            f"WHERE {PARTITION_KEY} >= %s AND {PARTITION_KEY} < %s RETURNING *) "
+            f"INSERT INTO {quote(name)} SELECT * FROM moved",
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    return True
+
+
+def create_partitions(months_ahead=None, using=DEFAULT_DB_ALIAS):
+    """
+    Make sure the sales tables have partitions from last month, which sales
+    queued offline are still uploaded into, to SALES_PARTITION_MONTHS_AHEAD
+    after this one, returning the names created
+    """
+    if connections[using].vendor != "postgresql":
+        return []
+    if months_ahead is None:
+        months_ahead = settings.SALES_PARTITION_MONTHS_AHEAD
+    this_month = timezone.localdate().replace(day=1)
+    return [
+        partition_name(table, add_months(this_month, offset))
+        for table in PARTITIONED_TABLES
+        for offset in range(-1, months_ahead + 1)
+        if create_partition(table, add_months(this_month, offset), using)
+    ]
+
+
+def archive_year(year, schema, drop=False, using=DEFAULT_DB_ALIAS):
+    """
+    Detach the monthly partitions of a year from the sales tables and move
+    them to schema, or drop them. Returns the names of the partitions and the
+    number of rows of the year left behind in the default partitions
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    start, end = month_bounds(date(year, 1, 1))[0], month_bounds(date(year, 12, 1))[1]
+    archived = []
+    left_behind = 0
+    with transaction.atomic(using), connection.cursor() as cursor:
+        if not drop:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {quote(schema)}")
+        for table in PARTITIONED_TABLES:
+            for name, month in sorted(monthly_partitions(table, using).items()):
+                if month.year != year:
+                    continue
+                cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}")
+                if drop:
+                    cursor.execute(f"DROP TABLE {quote(name)}")
+                else:
+                    cursor.execute(f"ALTER TABLE {quote(name)} SET SCHEMA {quote(schema)}")
+                archived.append(name)
+            cursor.execute(
+                f"SELECT count(*) FROM {quote(default_partition_name(table))} "
+                f"WHERE {PARTITION_KEY} >= %s AND {PARTITION_KEY} < %s",
+                [start, end],
+            )
+            left_behind += cursor.fetchone()[0]
+    return archived, left_behind
+
+
+def rebuild_table(schema_editor, table, partitioned):
+    """
+    Recreate table, with its rows, indexes, unique constraints and foreign
+    keys, as a table partitioned by month with partitions from its first row,
+    or last month, to the months ahead, or back as a plain table. Used by the
+    migrations on PostgreSQL
+    """
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    former = f"{table}_unpartitioned" if partitioned else f"{table}_partitioned"
+    primary_key = f"id, {PARTITION_KEY}" if partitioned else "id"
+    with connection.cursor() as cursor:
+        # read before the rename, so the definitions name the new table. The
+        # indexes of the primary key and unique constraints come with them
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+            [table, table],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('u', 'f')",
+            [table],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(f"SELECT min({PARTITION_KEY}) FROM {quote(table)}")
+        first = cursor.fetchone()[0]
+
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(former)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(former)} INCLUDING DEFAULTS "
+            "INCLUDING IDENTITY INCLUDING CONSTRAINTS)"
+            + (f" PARTITION BY RANGE ({PARTITION_KEY})" if partitioned else "")
+        )
+        if partitioned:
+            cursor.execute(f"CREATE TABLE {quote(default_partition_name(table))} PARTITION OF {quote(table)} DEFAULT")
+            this_month = timezone.localdate().replace(day=1)
+            month = add_months(this_month, -1)
+            if first is not None:
+                month = min(month, timezone.localdate(first).replace(day=1))
+            while month <= add_months(this_month, settings.SALES_PARTITION_MONTHS_AHEAD):
+                create_partition(table, month, connection.alias)
+                month = add_months(month, 1)
+        # the keys and indexes are built once the rows are in
+        cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(former)}")
+        cursor.execute(f"DROP TABLE {quote(former)}")
+
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {quote(f'{table}_id_seq')}")
+        cursor.execute(
+            f"SELECT setval(%s, coalesce(max(id), 1), max(id) IS NOT NULL) FROM {quote(table)}",
+            [f"{table}_id_seq"],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(f'{table}_pkey')} PRIMARY KEY ({primary_key})"
+        )
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in constraints:
+            cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
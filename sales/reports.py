@@ -0,0 +1,161 @@
+"""
+Module building the sales reports shared by the API and the report workers
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import date
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+from products.models import Product
+from products.reports import stock_movement_report, stock_movement_report_rows
+from sales.models import ProductSales, ReportJob, Sales, day_range
+
+SALES_REPORT_SALE_FIELDS = ["cashier_id", "payment_id", "receipt_label", "sale_amount"]
+SALES_REPORT_PRODUCT_FIELDS = [
+    "product_name",
+    "product_description",
+    "product_unit_price",
+    "product_quantity",
+    "product_price",
+    "tax_type",
+    "product_tax",
+    "cost",
+    "profit",
+]
+
+
+def sales_report(start_date, end_date):
+    """
+    Return the sales, their lines and totals between two dates, or None if there is none
+    """
+    sales_summary = Sales.objects.filter(**day_range(start_date, end_date))
+    totals = sales_summary.aggregate(
+        sales_count=Count("id"),
+        total_sales=Sum("sale_amount_with_tax"),
+        tax_amount=Sum("tax_amount"),
+    )
+    if not totals["sales_count"]:
+        return None
+
+    # cost and profit are worked out by the database for every line so the
+    # whole report takes a fixed number of queries however many sales it covers
+    # lines are never older than their sale, so bounding them from below
+    # leaves out the partitions of the months before the report
+    product_sales = ProductSales.objects.filter(sale__in=sales_summary, **day_range(start_date)).annotate(
+        cost=ExpressionWrapper(
+            F("cost_per_unit") * F("quantity_sold"),
+            output_field=DecimalField(),
+        ),
+        profit=ExpressionWrapper(
+            (F("price_per_unit") - F("cost_per_unit")) * F("quantity_sold"),
+            output_field=DecimalField(),
+        ),
+    )
+    report = {
+        "total_sales": totals["total_sales"],
+        "tax_amount": totals["tax_amount"],
+        "profit": product_sales.aggregate(total=Sum("profit"))["total"] or 0,
+        "sales": [],
+    }
+
+    products_by_sale = defaultdict(list)
+    for product_sale in product_sales.order_by("id").values(
+        "sale_id",
+        "product__name",
+        "product__description",
+        "price_per_unit",
+        "quantity_sold",
+        "price",
+        "product__tax_type",
+        "tax_amount",
+        "cost",
+        "profit",
+    ):
+        products_by_sale[product_sale["sale_id"]].append(
+            {
+                "product_name": product_sale["product__name"],
+                "product_description": product_sale["product__description"],
+                "product_unit_price": product_sale["price_per_unit"],
+                "product_quantity": product_sale["quantity_sold"],
+                "product_price": product_sale["price"],
+                "tax_type": product_sale["product__tax_type"],
+                "product_tax": product_sale["tax_amount"],
+                "cost": product_sale["cost"],
+                "profit": product_sale["profit"],
+            }
+        )
+
+    for sale in sales_summary.values("id", "cashier_id", "payment_id", "receipt_label", "sale_amount_with_tax"):
+        report["sales"].append(
+            {
+                "cashier_id": sale["cashier_id"],
+                "payment_id": sale["payment_id"],
+                "receipt_label": sale["receipt_label"],
+                "sale_amount": sale["sale_amount_with_tax"],
+                "products": products_by_sale[sale["id"]],
+            }
+        )
+
+    return report
+
+
+def sales_report_rows(report):
+    """
+    Flatten a sales report into CSV rows, one per sale line, header first
+    """
+    yield SALES_REPORT_SALE_FIELDS + SALES_REPORT_PRODUCT_FIELDS
+    for sale in report["sales"]:
+        sale_columns = [sale[field] for field in SALES_REPORT_SALE_FIELDS]
+        for product in sale["products"]:
+            yield sale_columns + [product[field] for field in SALES_REPORT_PRODUCT_FIELDS]
+
+
+def build_stock_movement_report(start_date, end_date, product=None):
+    """
+    Stock movement report for the parameters a report job is stored with
+    """
+    if product is not None:
+        product = Product.objects.filter(uuid=product).first()
+        if product is None:
+            raise ValueError("Product not found")
+    return stock_movement_report(start_date, end_date, product)
+
+
+# report type: (response key, report builder, CSV row generator, message when empty)
+REPORTS = {
+    ReportJob.ReportType.SALES: (
+        "sales_report",
+        sales_report,
+        sales_report_rows,
+        "No sales found for the given date range",
+    ),
+    ReportJob.ReportType.STOCK_MOVEMENT: (
+        "stock_movement_report",
+        build_stock_movement_report,
+        stock_movement_report_rows,
+        "No stock movement found for the given date range",
+    ),
+}
+
+
+def render_report(report_type, report_format, parameters):
+    """
+    Build a report and return it as file content in the requested format
+    """
+    key, build, rows, empty_message = REPORTS[report_type]
+    parameters = dict(parameters)
+    start_date = date.fromisoformat(parameters.pop("start_date"))
+    end_date = date.fromisoformat(parameters.pop("end_date"))
+    report = build(start_date, end_date, **parameters)
+    if report is None:
+        raise ValueError(empty_message)
+
+    if report_format == ReportJob.ReportFormat.CSV:
+        content = io.StringIO()
+        csv.writer(content).writerows(rows(report))
+        return content.getvalue()
+    return json.dumps({key: report}, cls=DjangoJSONEncoder)
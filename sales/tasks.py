@@ -0,0 +1,43 @@
+import logging
+
+from config import celery_app
+from pos_inventory.utils.db_router import read_from_replica
+from sales.models import IdempotencyKey, ReportJob
+from sales.partitions import create_partitions
+from sales.reports import render_report
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task()
+def generate_report(job_id):
+    """Generate a queued report and store it as a file on its job."""
+    job = ReportJob.objects.get(pk=job_id)
+    if not job.start():
+        # the job was already picked up, e.g. after a redelivered message
+        return job.status
+
+    filename = f"{job.report_type}-{job.uuid}.{job.report_format}"
+    try:
+        with read_from_replica():
+            content = render_report(job.report_type, job.report_format, job.parameters)
+    except ValueError as error:
+        job.finish(error=str(error))
+    except Exception as error:
+        logger.exception("Report job %s failed", job.uuid)
+        job.finish(error=str(error))
+    else:
+        job.finish(filename, content)
+    return job.status
+
+
+@celery_app.task()
+def purge_idempotency_keys():
+    """Delete the idempotency keys too old to be replayed."""
+    return IdempotencyKey.purge()
+
+
+@celery_app.task()
+def create_sales_partitions():
+    """Create the monthly partitions of the sales tables for the months ahead."""
+    return create_partitions()
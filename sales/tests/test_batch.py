@@ -0,0 +1,174 @@
+import gzip
+import json
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from administration.models import Business, Employee
+from pos_inventory.users.models import User
+from products.models import Product, Stock
+from sales.models import DailyProductRollup, DailySalesRollup, ProductSales, Sales
+
+from .test_setup import TestSetUp
+
+
+class TestSalesBatch(TestSetUp):
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_sale_parties()
+        self.sugar = self.create_stocked_product("Sugar", "SUG01", quantity="10.00")
+        self.salt = self.create_stocked_product("Salt", "SALT01", quantity="5.00", price="50.00", tax_type="A")
+
+    def sale(self, client_reference, *lines, **extra):
+        return {
+            "client_reference": client_reference,
+            "business_id": str(self.business.uuid),
+            "cashier_id": str(self.cashier.uuid),
+            "receipt_type": "S",
+            "transaction_type": "N",
+            "lines": [{"product": str(product.uuid), "quantity_sold": quantity} for product, quantity in lines],
+            "payment": {"payment_mode": "CASH", "amount_paid": "1000.00"},
+            **extra,
+        }
+
+    def upload(self, sales, encoding=None):
+        body = json.dumps({"sales": sales}).encode()
+        headers = {}
+        if encoding == "gzip":
+            body = gzip.compress(body)
+        elif encoding == "deflate":
+            body = zlib.compress(body)
+        if encoding:
+            headers["HTTP_CONTENT_ENCODING"] = encoding
+        return self.auth_user.post(reverse("sales-batch"), body, content_type="application/json", **headers)
+
+    def stock_quantity(self, product):
+        return Stock.objects.get(pk=product.pk).stock_quantity
+
+    def test_compressed_batch_is_recorded(self):
+        """Test that a gzip batch records every sale with its lines, stock and rollups"""
+        sold_at = timezone.now() - timedelta(days=2)
+        res = self.upload(
+            [
+                self.sale("T1-1", (self.sugar, "2"), (self.salt, "1")),
+                self.sale("T1-2", (self.sugar, "3"), sold_at=sold_at.isoformat()),
+            ],
+            encoding="gzip",
+        )
+        assert res.status_code == 200
+        results = res.json()["results"]
+        assert [result["status"] for result in results] == ["created", "created"]
+
+        first = Sales.objects.get(uuid=results[0]["uuid"])
+        assert first.client_reference == "T1-1"
+        assert first.sale_status == Sales.TransactionProgress.Approved
+        # 200 of sugar at 16% and 50 of tax free salt
+        assert first.sale_amount_with_tax == Decimal("282.00")
+        assert first.tax_amount == Decimal("32.00")
+        assert ProductSales.objects.filter(sale=first).count() == 2
+        second = Sales.objects.get(uuid=results[1]["uuid"])
+        assert second.created_at == sold_at
+
+        assert self.stock_quantity(self.sugar) == Decimal("5.00")
+        assert self.stock_quantity(self.salt) == Decimal("4.00")
+        rollups = DailySalesRollup.objects.all()
+        assert sum(rollup.sales_count for rollup in rollups) == 2
+        assert {rollup.day for rollup in rollups} == {
+            timezone.localdate(),
+            timezone.localdate(sold_at),
+        }
+        assert DailyProductRollup.objects.filter(product=self.salt).count() == 1
+
+    def test_retried_batch_is_not_recorded_twice(self):
+        """Test that sales already uploaded are reported as duplicates with their uuid"""
+        first = self.upload([self.sale("T1-1", (self.sugar, "2"))], encoding="deflate")
+        uuid = first.json()["results"][0]["uuid"]
+        res = self.upload(
+            [
+                self.sale("T1-1", (self.sugar, "2")),
+                self.sale("T1-2", (self.sugar, "1")),
+                self.sale("T1-2", (self.sugar, "1")),
+            ]
+        )
+        results = res.json()["results"]
+        assert [result["status"] for result in results] == ["duplicate", "created", "duplicate"]
+        assert results[0]["uuid"] == uuid
+        assert results[2]["uuid"] == results[1]["uuid"]
+        assert Sales.objects.count() == 2
+        assert self.stock_quantity(self.sugar) == Decimal("7.00")
+
+    def test_references_are_only_matched_within_a_business_and_cashier(self):
+        """Test that another business's or cashier's sale reusing a reference is recorded"""
+        user = User.objects.create_user(username="kiosk", password="password")
+        other_business = Business.objects.create(name="Kiosk", address="Mombasa", tax_pin="P000000001B", owner=user)
+        other_cashier = Employee.objects.create(user=user, phone_number="0711111111")
+        res = self.upload(
+            [
+                self.sale("1", (self.sugar, "1")),
+                self.sale("1", (self.sugar, "1"), business_id=str(other_business.uuid)),
+                self.sale("1", (self.sugar, "1"), cashier_id=str(other_cashier.uuid)),
+            ]
+        )
+        results = res.json()["results"]
+        assert [result["status"] for result in results] == ["created"] * 3
+        assert len({result["uuid"] for result in results}) == 3
+        res = self.upload([self.sale("1", (self.sugar, "1"), business_id=str(other_business.uuid))])
+        assert res.json()["results"][0] == {**results[1], "status": "duplicate"}
+        assert Sales.objects.filter(client_reference="1").count() == 3
+
+    def test_bad_sales_are_rejected_alone(self):
+        """Test that invalid sales are rejected without holding up the rest of the batch"""
+        unknown = self.sale("T1-2", (self.sugar, "1"))
+        unknown["payment"]["payment_mode"] = "BARTER"
+        res = self.upload(
+            [
+                self.sale("T1-1", (self.sugar, "1")),
+                unknown,
+                self.sale("T1-3"),
+                self.sale("T1-4", (self.sugar, "1"), cashier_id=str(self.business.uuid)),
+            ]
+        )
+        results = res.json()["results"]
+        assert [result["status"] for result in results] == [
+            "created",
+            "rejected",
+            "rejected",
+            "rejected",
+        ]
+        assert "payment" in results[1]["errors"]
+        assert "lines" in results[2]["errors"]
+        assert "cashier_id" in results[3]["errors"]
+        assert Sales.objects.count() == 1
+
+    def test_sales_of_products_with_unknown_tax_types_are_rejected(self):
+        """Test that a sale naming a product with a tax type the rate table does not know is rejected"""
+        Product.objects.filter(pk=self.salt.pk).update(tax_type="Z")
+        res = self.upload([self.sale("T1-1", (self.sugar, "1")), self.sale("T1-2", (self.salt, "1"))])
+        results = res.json()["results"]
+        assert [result["status"] for result in results] == ["created", "rejected"]
+        assert results[1]["errors"] == {"lines": ["Unknown tax types ['Z']"]}
+        assert self.stock_quantity(self.salt) == Decimal("5.00")
+
+    def test_stock_is_taken_set_wise(self):
+        """Test that the batch takes stock in one locked update, clamping oversold lines"""
+        sales = [self.sale(f"T1-{index}", (self.sugar, "3")) for index in range(4)]
+        with self.assert_max_queries(30):
+            res = self.upload(sales, encoding="gzip")
+        quantities = [
+            ProductSales.objects.get(sale__uuid=result["uuid"]).quantity_sold for result in res.json()["results"]
+        ]
+        assert quantities == [Decimal("3"), Decimal("3"), Decimal("3"), Decimal("1")]
+        assert self.stock_quantity(self.sugar) == Decimal("0.00")
+
+    @override_settings(SALES_BATCH_MAX_SALES=2, SALES_BATCH_MAX_BYTES=1024)
+    def test_oversized_batches_are_refused(self):
+        """Test that a batch over the sale or decompressed size limits is refused"""
+        sales = [self.sale(f"T1-{index}", (self.sugar, "1")) for index in range(3)]
+        assert self.upload(sales).status_code == 400
+        padded = self.sale("T1-1", (self.sugar, "1"), padding="x" * 4096)
+        assert self.upload([padded], encoding="gzip").status_code == 400
+        assert Sales.objects.count() == 0
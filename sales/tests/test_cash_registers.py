@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from sales.models import CashRegister, Sales
+
+from .test_setup import TestSetUp
+
+
+class TestCashRegisters(TestSetUp):
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_sale_parties()
+        self.soap = self.create_stocked_product("Soap", "SOAP01", price="85.00", tax_type="A")
+        self.register = CashRegister.objects.create(business=self.business, name="Till 1")
+
+    def drawer(self):
+        return self.register.drawer_counts()
+
+    def checkout(self, amount_paid, tendered):
+        return self.auth_user.post(
+            reverse("sales-checkout"),
+            {
+                "business_id": str(self.business.uuid),
+                "cashier_id": str(self.cashier.uuid),
+                "receipt_type": "S",
+                "transaction_type": "N",
+                "lines": [{"product": str(self.soap.uuid), "quantity_sold": "1"}],
+                "payment": {
+                    "payment_mode": "CASH",
+                    "amount_paid": amount_paid,
+                    "register": str(self.register.uuid),
+                    "tendered": tendered,
+                },
+            },
+            content_type="application/json",
+        )
+
+    def test_new_register_has_an_empty_drawer(self):
+        """Test that a register is created with a counter for every denomination"""
+        res = self.auth_user.post(reverse("registers-list"), {"name": "Till 2"}, content_type="application/json")
+        assert res.status_code == 201
+        drawer = res.json()["drawer"]
+        assert [row["denomination"] for row in drawer] == [1, 5, 10, 20, 50, 100, 200, 500, 1000]
+        assert {row["count"] for row in drawer} == {0}
+
+    def test_cash_sale_takes_tender_in_and_change_out(self):
+        """Test that a cash checkout deposits the notes tendered and hands out change"""
+        self.register.deposit({10: 2, 5: 1})
+        res = self.checkout("100.00", {"100": 1})
+        assert res.status_code == 201
+        assert Decimal(res.json()["change"]) == Decimal("15.00")
+        assert res.json()["change_breakdown"] == {"10": 1, "5": 1}
+        assert self.drawer()[100] == 1
+        assert (self.drawer()[10], self.drawer()[5]) == (1, 0)
+        assert Sales.objects.get(uuid=res.json()["uuid"]).register == self.register
+
+    def test_change_the_drawer_cannot_make_leaves_it_untouched(self):
+        """Test that no cash leaves the drawer when it cannot make the change exactly"""
+        self.register.deposit({20: 3})
+        res = self.checkout("100.00", {})
+        assert res.json()["change_breakdown"] is None
+        assert self.drawer()[20] == 3
+
+    def test_change_in_cents_is_not_rounded_down(self):
+        """Test that change with cents is reported in full and no cash is handed out for it"""
+        self.register.deposit({10: 2, 5: 1, 1: 5})
+        res = self.checkout("100.50", {"100": 1})
+        assert res.status_code == 201
+        assert Decimal(res.json()["change"]) == Decimal("15.50")
+        assert res.json()["change_breakdown"] is None
+        assert [self.drawer()[value] for value in (100, 10, 5, 1)] == [1, 2, 1, 5]
+
+    def test_deposit_rejects_unknown_denominations(self):
+        """Test that a deposit of a denomination no drawer holds is refused"""
+        url = reverse("registers-deposit", kwargs={"uuid": self.register.uuid})
+        res = self.auth_user.post(url, {"counts": {"3": 1}}, content_type="application/json")
+        assert res.status_code == 400
+        res = self.auth_user.post(url, {"counts": {"50": 2}}, content_type="application/json")
+        assert {row["denomination"]: row["count"] for row in res.json()["drawer"]}[50] == 2
+
+
+@skipUnless(connection.vendor == "postgresql", "row locks need a server database")
+class TestParallelTills(TransactionTestCase):
+    payouts = 120
+    tills = 16
+
+    def setUp(self):
+        self.register = CashRegister.objects.create(name="Till 1")
+        self.register.deposit({10: 50, 5: 20})
+
+    def pay_out(self, index):
+        try:
+            return CashRegister.objects.get(pk=self.register.pk).give_change(10)
+        finally:
+            connection.close()
+
+    def test_parallel_change_never_overdraws_the_drawer(self):
+        """Test that tills sharing a register never hand out the same cash twice"""
+        with ThreadPoolExecutor(max_workers=self.tills) as executor:
+            payouts = list(executor.map(self.pay_out, range(self.payouts)))
+        given = [payout for payout in payouts if payout is not None]
+        assert sum(value * count for payout in given for value, count in payout.items()) == 600
+        assert len(given) == 60
+        assert self.register.drawer_counts()[10] == 0
+        assert self.register.drawer_counts()[5] == 0
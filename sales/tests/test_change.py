@@ -0,0 +1,89 @@
+import itertools
+import random
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from sales.change import DENOMINATIONS, change_table, make_change, solve_change
+from sales.models import CashRegister, Sales
+
+from .test_setup import TestSetUp
+
+
+def fewest_pieces(amount, drawer):
+    """every combination the drawer allows, for checking the solver against"""
+    values = sorted(drawer)
+    totals = [
+        sum(combination)
+        for combination in itertools.product(*(range(drawer[value] + 1) for value in values))
+        if sum(value * count for value, count in zip(values, combination)) == amount
+    ]
+    return min(totals, default=None)
+
+
+class TestChangeSolver(SimpleTestCase):
+    def test_change_the_largest_notes_cannot_make_is_still_found(self):
+        """Test that change is made when taking the largest note first leads nowhere"""
+        assert make_change(60, {50: 1, 20: 3}) == {20: 3}
+        assert make_change(60, {50: 1, 20: 3, 1: 10}) == {20: 3}
+        assert make_change(15, {20: 3}) is None
+
+    def test_change_is_only_made_in_whole_shillings(self):
+        """Test that a Decimal amount is made exactly, and one with cents is not made at all"""
+        assert make_change(Decimal("15.00"), {10: 1, 5: 1}) == {10: 1, 5: 1}
+        assert make_change(Decimal("15.50"), {10: 1, 5: 1, 1: 5}) is None
+
+    def test_common_amounts_come_from_the_table(self):
+        """Test that the table holds the fewest pieces for an unlimited drawer"""
+        unlimited = dict.fromkeys(DENOMINATIONS, 1000)
+        for amount in range(0, 1200, 7):
+            assert dict(change_table()[amount]) == solve_change(amount, unlimited)
+        assert make_change(1385, unlimited) == {1000: 1, 200: 1, 100: 1, 50: 1, 20: 1, 10: 1, 5: 1}
+
+    def test_solver_is_exact_and_uses_the_fewest_pieces(self):
+        """Test the solver against every combination of small random drawers"""
+        rng = random.Random(7)
+        for _ in range(200):
+            drawer = {value: rng.randint(0, 3) for value in DENOMINATIONS[:6]}
+            amount = rng.randint(0, 350)
+            breakdown = make_change(amount, drawer)
+            best = fewest_pieces(amount, drawer)
+            if best is None:
+                assert breakdown is None
+                continue
+            assert sum(value * count for value, count in breakdown.items()) == amount
+            assert all(count <= drawer[value] for value, count in breakdown.items())
+            assert sum(breakdown.values()) == best
+
+
+class TestBreakDown(TestSetUp):
+    def setUp(self) -> None:
+        super().setUp()
+        self.register = CashRegister.objects.create(name="Till 1")
+        self.register.deposit({1000: 1})
+        self.sale = Sales.objects.create(register=self.register)
+        self.url = reverse("sales-break-down-denomination", kwargs={"uuid": self.sale.uuid})
+
+    def break_down(self, denominations):
+        return self.auth_user.post(self.url, {"denominations": denominations}, content_type="application/json")
+
+    def test_note_is_swapped_for_smaller_ones(self):
+        """Test that breaking a note takes it out and puts its breakdown in"""
+        res = self.break_down([{"denomination": 1000, "into": {"500": 1, "200": 2, "100": 1}}])
+        assert res.status_code == 200
+        drawer = self.register.drawer_counts()
+        assert (drawer[1000], drawer[500], drawer[200], drawer[100]) == (0, 1, 2, 1)
+
+    def test_breakdowns_that_do_not_add_up_change_nothing(self):
+        """Test that a wrong breakdown or a missing note leaves the drawer as it was"""
+        assert self.break_down([{"denomination": 1000, "into": {"500": 1}}]).status_code == 400
+        res = self.break_down(
+            [
+                {"denomination": 1000, "into": {"500": 2}},
+                {"denomination": 1000, "into": {"500": 2}},
+            ]
+        )
+        assert res.status_code == 400
+        assert self.register.drawer_counts()[1000] == 1
+        assert self.register.drawer_counts()[500] == 0
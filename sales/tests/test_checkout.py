@@ -0,0 +1,96 @@
+from decimal import Decimal
+
+from django.urls import reverse
+
+from products.models import Product, Stock
+from sales.models import ProductSales, Sales
+
+from .test_setup import TestSetUp
+
+
+class TestCheckout(TestSetUp):
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_sale_parties()
+        self.checkout_url = reverse("sales-checkout")
+        self.soap = self.create_stocked_product("Soap", "SOAP01", quantity="10.00")
+        self.salt = self.create_stocked_product("Salt", "SALT01", quantity="5.00", price="50.00", tax_type="A")
+
+    def checkout(self, lines, payment_mode="CREDIT", amount_paid="0"):
+        data = {
+            "customer_id": str(self.customer.uuid),
+            "business_id": str(self.business.uuid),
+            "cashier_id": str(self.cashier.uuid),
+            "receipt_type": "S",
+            "transaction_type": "N",
+            "lines": lines,
+            "payment": {"payment_mode": payment_mode, "amount_paid": amount_paid},
+        }
+        return self.auth_user.post(self.checkout_url, data, content_type="application/json")
+
+    def test_checkout_creates_sale_lines_and_decrements_stock(self):
+        """Test that a whole cart is recorded by a single checkout request"""
+        res = self.checkout(
+            [
+                {"product": str(self.soap.uuid), "quantity_sold": "2"},
+                {"product": str(self.salt.uuid), "quantity_sold": "3"},
+            ]
+        )
+        assert res.status_code == 201
+        sale = Sales.objects.get(uuid=res.json()["uuid"])
+        assert sale.product_sales.count() == 2
+        assert sale.sale_status == Sales.TransactionProgress.Approved
+        assert sale.tax_amount == Decimal("32.00")
+        assert sale.sale_amount_with_tax == Decimal("382.00")
+        tax_summary = res.json()["tax_summary"]
+        assert Decimal(str(tax_summary["B"]["taxable"])) == Decimal("200.00")
+        assert Decimal(str(tax_summary["B"]["tax"])) == Decimal("32.00")
+        assert Decimal(str(tax_summary["A"]["tax"])) == Decimal("0.00")
+        assert Stock.objects.get(pk=self.soap.pk).stock_quantity == Decimal("8.00")
+        assert Stock.objects.get(pk=self.salt.pk).stock_quantity == Decimal("2.00")
+
+    def test_checkout_clamps_quantity_to_available_stock(self):
+        """Test that repeated lines for a product never sell more than is in stock"""
+        res = self.checkout(
+            [
+                {"product": str(self.salt.uuid), "quantity_sold": "4"},
+                {"product": str(self.salt.uuid), "quantity_sold": "4"},
+            ]
+        )
+        assert res.status_code == 201
+        quantities = ProductSales.objects.values_list("quantity_sold", flat=True)
+        assert sorted(quantities) == [Decimal("1.00"), Decimal("4.00")]
+        assert Stock.objects.get(pk=self.salt.pk).stock_quantity == Decimal("0.00")
+
+    def test_checkout_with_unknown_product_changes_nothing(self):
+        """Test that a cart with an unknown product is rejected as a whole"""
+        res = self.checkout(
+            [
+                {"product": str(self.soap.uuid), "quantity_sold": "2"},
+                {"product": "00000000-0000-0000-0000-000000000000", "quantity_sold": "1"},
+            ]
+        )
+        assert res.status_code == 404
+        assert not Sales.objects.exists()
+        assert Stock.objects.get(pk=self.soap.pk).stock_quantity == Decimal("10.00")
+
+    def test_unknown_tax_types_are_refused(self):
+        """Test that a cart or a receipt with a tax type the rate table does not know is a 400"""
+        Product.objects.filter(pk=self.salt.pk).update(tax_type="Z")
+        res = self.checkout([{"product": str(self.salt.uuid), "quantity_sold": "1"}])
+        assert res.status_code == 400
+        assert res.json()["message"] == "Unknown tax type 'Z' on a product in the cart"
+        assert not Sales.objects.exists()
+        assert Stock.objects.get(pk=self.salt.pk).stock_quantity == Decimal("5.00")
+
+        sale = Sales.objects.create(business_id=self.business, cashier_id=self.cashier)
+        ProductSales.objects.create(product=self.soap, sale=sale, price="100.00", tax_rate="B_8")
+        res = self.auth_user.post(
+            reverse("sales-generate-receipt", kwargs={"uuid": sale.uuid}),
+            {"payment_mode": "CASH", "amount_paid": "200.00"},
+            content_type="application/json",
+        )
+        assert res.status_code == 400
+        assert res.json()["message"] == "Unknown tax type 'B_8' on a line of the sale"
+        sale.refresh_from_db()
+        assert sale.sale_status is None
@@ -0,0 +1,98 @@
+from django.urls import reverse
+
+from products.models import Category, Product
+from sales.models import PaymentMode, Sales
+
+from .test_queries import REQUEST_QUERIES
+from .test_setup import TestSetUp
+
+
+class TestConditionalRequests(TestSetUp):
+    def setUp(self) -> None:
+        super().setUp()
+        self.product = self.create_stocked_product("Sugar", "SUG01")
+
+    def get(self, url, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.auth_user.get(url, **headers)
+
+    def test_unchanged_object_is_not_sent_again(self):
+        """Test that a retrieve answers a matching If-None-Match with 304"""
+        url = reverse("stock-detail", kwargs={"uuid": self.product.stock.uuid})
+        res = self.get(url)
+        assert res.status_code == 200
+        assert res["ETag"].startswith('"') and res.has_header("Last-Modified")
+        # the object is read but nothing is serialized
+        with self.assert_max_queries(REQUEST_QUERIES + 1):
+            res = self.get(url, res["ETag"])
+        assert res.status_code == 304
+        assert res.content == b""
+
+    def test_nested_changes_change_the_object_etag(self):
+        """Test that renaming a product's category gives the product a new ETag"""
+        url = reverse("products-detail", kwargs={"uuid": self.product.uuid})
+        etag = self.get(url)["ETag"]
+        category = Category.objects.get(name="General")
+        category.name = "Groceries"
+        category.save()
+        res = self.get(url, etag)
+        assert res.status_code == 200
+        assert res.json()["category"]["name"] == "Groceries"
+        assert res["ETag"] != etag
+
+    def test_list_etag_follows_added_and_deleted_rows(self):
+        """Test that a list is answered with 304 until a row is added or deleted"""
+        url = reverse("stock-list")
+        etag = self.get(url)["ETag"]
+        assert self.get(url, etag).status_code == 304
+
+        salt = self.create_stocked_product("Salt", "SALT01")
+        res = self.get(url, etag)
+        assert res.status_code == 200
+        assert len(res.json()["results"]) == 2
+        etag = res["ETag"]
+
+        Product.objects.filter(pk=salt.pk).delete()
+        res = self.get(url, etag)
+        assert res.status_code == 200
+        assert len(res.json()["results"]) == 1
+
+    def test_list_etag_follows_the_page(self):
+        """Test that another page of a list is not answered with the first page's ETag"""
+        self.create_stocked_product("Salt", "SALT01")
+        url = reverse("stock-list")
+        etag = self.get(f"{url}?limit=1")["ETag"]
+        assert self.get(f"{url}?limit=1", etag).status_code == 304
+        res = self.get(f"{url}?limit=1&offset=1", etag)
+        assert res.status_code == 200
+        assert res["ETag"] != etag
+
+    def test_rows_without_updated_at_change_the_etag(self):
+        """Test that a sale's ETag follows its payment mode and cashier's user, which have no updated_at"""
+        self.create_sale_parties()
+        payment = PaymentMode.objects.create(payment_method="01")
+        sale = Sales.objects.create(business_id=self.business, cashier_id=self.cashier, payment_id=payment)
+        url = reverse("sales-detail", kwargs={"uuid": sale.uuid})
+        res = self.get(url)
+        assert not res.has_header("Last-Modified")
+        etag = res["ETag"]
+
+        payment.payment_method = "06"
+        payment.save()
+        res = self.get(url, etag)
+        assert res.status_code == 200
+        etag = res["ETag"]
+
+        self.cashier.user.first_name = "Wanjiru"
+        self.cashier.user.save()
+        res = self.get(url, etag)
+        assert res.status_code == 200
+        assert res.json()["cashier_id"]["user"]["first_name"] == "Wanjiru"
+
+    def test_cached_responses_keep_their_validators(self):
+        """Test that a response served from the response cache is still conditional"""
+        url = reverse("products-list")
+        etag = self.get(url)["ETag"]
+        res = self.get(url)
+        assert res["ETag"] == etag
+        assert self.get(url, etag).status_code == 304
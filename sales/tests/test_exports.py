@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .test_setup import TestSetUp
+
+
+class TestExports(TestSetUp):
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_sale_parties()
+        self.soap = self.create_stocked_product("Soap", "SOAP01", quantity="1000.00")
+
+    def make_sales(self, count):
+        for _ in range(count):
+            self.auth_user.post(
+                reverse("sales-checkout"),
+                {
+                    "business_id": str(self.business.uuid),
+                    "cashier_id": str(self.cashier.uuid),
+                    "receipt_type": "S",
+                    "transaction_type": "N",
+                    "lines": [{"product": str(self.soap.uuid), "quantity_sold": "1"}],
+                    "payment": {"payment_mode": "CREDIT", "amount_paid": "0"},
+                },
+                content_type="application/json",
+            )
+
+    def export(self, url_name, **params):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.auth_user.get(reverse(url_name), params)
+            content = b"".join(res.streaming_content).decode()
+        return res, content, len(queries)
+
+    def test_sales_are_streamed_as_csv(self):
+        """Test that the sales export streams a CSV row for every sale"""
+        self.make_sales(3)
+        res, content, _ = self.export("sales-export")
+        assert res.streaming
+        assert res["Content-Type"] == "text/csv"
+        rows = list(csv.DictReader(io.StringIO(content)))
+        assert len(rows) == 3
+        assert rows[0]["cashier"] == str(self.cashier.uuid)
+        assert rows[0]["payment_method"] == "02"
+
+    def test_product_sales_are_streamed_as_ndjson(self):
+        """Test that the product sales export writes one JSON object per line"""
+        self.make_sales(2)
+        res, content, _ = self.export("productsales-export", export_format="ndjson")
+        assert res["Content-Type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in content.splitlines()]
+        assert [line["product_code"] for line in lines] == ["SOAP01", "SOAP01"]
+        assert lines[0]["quantity_sold"] == "1.00"
+
+    def test_export_query_count_does_not_grow_with_rows(self):
+        """Test that rows are read with one query however many are exported"""
+        self.make_sales(1)
+        _, _, small_export_queries = self.export("sales-export")
+        self.make_sales(20)
+        _, content, large_export_queries = self.export("sales-export")
+        assert len(content.splitlines()) == 22
+        assert large_export_queries == small_export_queries
+
+    def test_export_rejects_unknown_formats_and_dates(self):
+        """Test that invalid export options are answered with a 400"""
+        assert self.auth_user.get(reverse("sales-export"), {"export_format": "xml"}).status_code == 400
+        assert self.auth_user.get(reverse("sales-export"), {"start_date": "today"}).status_code == 400
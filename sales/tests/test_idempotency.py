@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from products.models import Stock
+from sales.models import IdempotencyKey, Sales
+
+from .test_setup import TestSetUp
+
+
+class IdempotentCheckoutMixin:
+    def create_cart(self):
+        self.create_sale_parties()
+        self.soap = self.create_stocked_product("Soap", "SOAP01", quantity="10.00")
+
+    def checkout(self, client, key=None, quantity="2"):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return client.post(
+            reverse("sales-checkout"),
+            {
+                "business_id": str(self.business.uuid),
+                "cashier_id": str(self.cashier.uuid),
+                "receipt_type": "S",
+                "transaction_type": "N",
+                "lines": [{"product": str(self.soap.uuid), "quantity_sold": quantity}],
+                "payment": {"payment_mode": "CREDIT", "amount_paid": "0"},
+            },
+            content_type="application/json",
+            **headers,
+        )
+
+
+class TestIdempotency(IdempotentCheckoutMixin, TestSetUp):
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_cart()
+
+    def test_retried_checkout_replays_the_first_response(self):
+        """Test that a retry with the same key records nothing and returns the same receipt"""
+        first = self.checkout(self.auth_user, "till-1-0001")
+        retry = self.checkout(self.auth_user, "till-1-0001")
+        assert retry.status_code == first.status_code == 201
+        assert retry.json() == first.json()
+        assert retry["Idempotent-Replayed"] == "true"
+        assert Sales.objects.count() == 1
+        assert Stock.objects.get(pk=self.soap.pk).stock_quantity == Decimal("8.00")
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        """Test that a key sent again with a different body is refused"""
+        self.checkout(self.auth_user, "till-1-0001")
+        res = self.checkout(self.auth_user, "till-1-0001", quantity="3")
+        assert res.status_code == 422
+        assert Sales.objects.count() == 1
+
+    def test_requests_without_a_key_all_run(self):
+        """Test that requests without a key are not deduplicated"""
+        self.checkout(self.auth_user)
+        self.checkout(self.auth_user)
+        assert Sales.objects.count() == 2
+
+    def test_expired_keys_run_again(self):
+        """Test that a key older than its time to live no longer replays"""
+        self.checkout(self.auth_user, "till-1-0001")
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        assert "Idempotent-Replayed" not in self.checkout(self.auth_user, "till-1-0001")
+        assert Sales.objects.count() == 2
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        assert IdempotencyKey.purge() == 1
+
+    def test_retried_product_sale_adds_to_the_sale_once(self):
+        """Test that a retried sale line neither moves stock nor adds to the total twice"""
+        sale = Sales.objects.create(business_id=self.business)
+        for _ in range(2):
+            res = self.auth_user.post(
+                reverse("productsales-list"),
+                {
+                    "product": str(self.soap.uuid),
+                    "sale": str(sale.uuid),
+                    "quantity_sold": "1",
+                    "is_wholesale": False,
+                },
+                content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="till-1-line-1",
+            )
+            assert res.status_code == 200
+        sale.refresh_from_db()
+        assert sale.sale_amount_with_tax == Decimal("116.00")
+        assert Stock.objects.get(pk=self.soap.pk).stock_quantity == Decimal("9.00")
+
+
+@skipUnless(connection.vendor == "postgresql", "row locks need a server database")
+class TestConcurrentRetries(IdempotentCheckoutMixin, TransactionTestCase):
+    retries = 8
+
+    def setUp(self):
+        self.create_cart()
+
+    create_sale_parties = TestSetUp.create_sale_parties
+    create_stocked_product = TestSetUp.create_stocked_product
+
+    def retry(self, index):
+        try:
+            client = Client()
+            client.force_login(self.business.owner)
+            return self.checkout(client, "till-1-0001").status_code
+        finally:
+            connection.close()
+
+    def test_simultaneous_retries_record_one_sale(self):
+        """Test that retries racing the first request wait for it and replay it"""
+        with ThreadPoolExecutor(max_workers=self.retries) as executor:
+            statuses = list(executor.map(self.retry, range(self.retries)))
+        assert statuses == [201] * self.retries
+        assert Sales.objects.count() == 1
+        assert Stock.objects.get(pk=self.soap.pk).stock_quantity == Decimal("8.00")
@@ -0,0 +1,32 @@
+from django.urls import reverse
+
+from sales.models import PaymentMode, Sales
+
+from .test_setup import TestSetUp
+
+
+class TestPagination(TestSetUp):
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_sale_parties()
+
+    def test_sales_are_paged_with_a_cursor(self):
+        """Test that walking the sales cursor returns every sale once, oldest first"""
+        sales = [Sales.objects.create(business_id=self.business) for _ in range(7)]
+        url, seen = reverse("sales-list") + "?limit=3", []
+        while url:
+            page = self.auth_user.get(url).json()
+            assert "count" not in page
+            assert len(page["results"]) <= 3
+            seen.extend(sale["uuid"] for sale in page["results"])
+            url = page["next"]
+        assert seen == [str(sale.uuid) for sale in sales]
+
+    def test_small_tables_are_paged_with_limit_and_offset(self):
+        """Test that other lists are paged with a total count"""
+        PaymentMode.objects.bulk_create(PaymentMode(payment_method="01") for _ in range(20))
+        page = self.auth_user.get(self.payment_mode_url).json()
+        assert page["count"] == 20
+        assert len(page["results"]) == 15
+        page = self.auth_user.get(page["next"]).json()
+        assert len(page["results"]) == 5
@@ -0,0 +1,121 @@
+from datetime import date, datetime
+from unittest import skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from sales.models import ProductSales, Sales
+from sales.partitions import add_months, create_partition, create_partitions, monthly_partitions
+
+from .test_setup import TestSetUp
+
+
+def partition_of(model, pk):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT tableoid::regclass::text FROM {model._meta.db_table} WHERE id = %s", [pk])
+        return cursor.fetchone()[0]
+
+
+def check_foreign_keys():
+    # Postgres refuses to alter a table with foreign key checks still deferred
+    # on rows the test inserted
+    with connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+def make_sale(created_at):
+    sale = Sales.objects.create(receipt_type="S", transaction_type="N", receipt_label="NS")
+    Sales.objects.filter(pk=sale.pk).update(created_at=created_at)
+    return sale
+
+
+@skipUnless(connection.vendor == "postgresql", "partitions need PostgreSQL")
+class TestSalesPartitions(TestCase):
+    def setUp(self) -> None:
+        self.this_month = timezone.localdate().replace(day=1)
+
+    def test_sales_go_to_the_partition_of_their_month(self):
+        """Test that sales land in their month's partition and older ones in the default"""
+        recent = make_sale(timezone.now())
+        old = make_sale(timezone.make_aware(datetime(2001, 5, 17)))
+        assert partition_of(Sales, recent.pk) == f"sales_sales_{self.this_month:%Y_%m}"
+        assert partition_of(Sales, old.pk) == "sales_sales_default"
+
+    def test_partitions_are_created_ahead(self):
+        """Test that the job creates the missing months ahead once"""
+        created = create_partitions(months_ahead=5)
+        assert created == [
+            f"{table}_{add_months(self.this_month, offset):%Y_%m}"
+            for table in ("sales_sales", "sales_productsales")
+            for offset in (4, 5)
+        ]
+        assert create_partitions(months_ahead=5) == []
+
+    def test_archiving_a_closed_year(self):
+        """Test that a year's partitions are detached with the rows moved into them"""
+        old = make_sale(timezone.make_aware(datetime(2001, 5, 17)))
+        kept = make_sale(timezone.now())
+        check_foreign_keys()
+        create_partitions(months_ahead=0)
+        with self.assertRaises(CommandError):
+            call_command("archive_sales_year", timezone.localdate().year)
+        create_partition("sales_sales", date(2001, 5, 1))
+        assert partition_of(Sales, old.pk) == "sales_sales_2001_05"
+        call_command("archive_sales_year", 2001, schema="sales_archive")
+        assert list(Sales.objects.values_list("pk", flat=True)) == [kept.pk]
+        assert "sales_sales_2001_05" not in monthly_partitions("sales_sales")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM sales_archive.sales_sales_2001_05")
+            assert cursor.fetchall() == [(old.pk,)]
+
+
+@skipUnless(connection.vendor == "postgresql", "partitions need PostgreSQL")
+class TestBackdatedSalePartitions(TestSetUp):
+    def test_backdated_lines_follow_their_sale(self):
+        """Test that an offline sale and its lines land in the month it was sold"""
+        self.create_sale_parties()
+        sugar = self.create_stocked_product("Sugar", "SUG01")
+        last_month = add_months(timezone.localdate(), -1)
+        sold_at = timezone.make_aware(datetime.combine(last_month, datetime.min.time()))
+        sale = {
+            "client_reference": "T1-1",
+            "business_id": str(self.business.uuid),
+            "cashier_id": str(self.cashier.uuid),
+            "receipt_type": "S",
+            "transaction_type": "N",
+            "lines": [{"product": str(sugar.uuid), "quantity_sold": "1"}],
+            "payment": {"payment_mode": "CASH", "amount_paid": "1000.00"},
+            "sold_at": sold_at.isoformat(),
+        }
+        res = self.auth_user.post(reverse("sales-batch"), {"sales": [sale]}, content_type="application/json")
+        assert res.status_code == 200
+        record = Sales.objects.get(client_reference="T1-1")
+        line = ProductSales.objects.get(sale=record)
+        assert record.created_at == line.created_at == sold_at
+        assert partition_of(Sales, record.pk) == f"sales_sales_{last_month:%Y_%m}"
+        assert partition_of(ProductSales, line.pk) == f"sales_productsales_{last_month:%Y_%m}"
+
+
+@skipUnless(connection.vendor == "postgresql", "partitions need PostgreSQL")
+class TestPartitionedUuids(TestSetUp):
+    def test_uuids_are_unique_across_partitions(self):
+        """Test that a sale or line reusing a uuid is rejected whatever month it falls in"""
+        product = self.create_stocked_product("Sugar", "SUG01")
+        old = make_sale(timezone.make_aware(datetime(2001, 5, 17)))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Sales.objects.create(uuid=old.uuid, receipt_type="S", transaction_type="N", receipt_label="NS")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Sales.objects.bulk_create(
+                [Sales(uuid=old.uuid, receipt_type="S", transaction_type="N", receipt_label="NS")]
+            )
+        sale = make_sale(timezone.now())
+        line = ProductSales(sale=sale, product=product)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ProductSales.objects.bulk_create([line, ProductSales(uuid=line.uuid, sale=old, product=product)])
+        line.save()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ProductSales.objects.create(uuid=line.uuid, sale=old, product=product)
+        assert Sales.objects.filter(uuid=old.uuid).count() == ProductSales.objects.count() == 1
@@ -0,0 +1,68 @@
+from django.urls import reverse
+
+from administration.models import Supplier
+from products.models import Stock
+from sales.models import PaymentMode, ProductSales, Sales
+
+from .test_setup import TestSetUp
+
+# queries every request makes: the session and user lookups and the
+# savepoint pair of the request transaction
+REQUEST_QUERIES = 4
+
+
+class TestEndpointQueries(TestSetUp):
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_sale_parties()
+        self.payment = PaymentMode.objects.create(payment_method="01")
+
+    def make_rows(self, count):
+        for index in range(count):
+            product = self.create_stocked_product(f"Product {index}", f"P{Sales.objects.count()}")
+            sale = Sales.objects.create(
+                business_id=self.business,
+                cashier_id=self.cashier,
+                customer_id=self.customer,
+                payment_id=self.payment,
+            )
+            ProductSales.objects.create(product=product, sale=sale, tax_rate="B")
+            sale.products.add(product)
+            supplier = Supplier.objects.create(name=f"Supplier {index}", address="Nairobi")
+            supplier.products.add(product)
+
+    def assert_bounded(self, url, limit):
+        """the endpoint stays within limit queries, for few and for many rows"""
+        for count in (2, 10):
+            self.make_rows(count)
+            with self.assert_max_queries(REQUEST_QUERIES + limit):
+                res = self.auth_user.get(url)
+            assert res.status_code == 200
+
+    def test_sales_list(self):
+        """Test that listing sales with their nested relations takes fixed queries"""
+        self.assert_bounded(reverse("sales-list"), 3)
+
+    def test_sales_retrieve(self):
+        """Test that a sale with every nested relation is read in fixed queries"""
+        self.make_rows(3)
+        sale = Sales.objects.first()
+        with self.assert_max_queries(REQUEST_QUERIES + 3):
+            self.auth_user.get(reverse("sales-detail", kwargs={"uuid": sale.uuid}))
+
+    def test_product_sales_list(self):
+        """Test that listing product sales takes fixed queries"""
+        self.assert_bounded(reverse("productsales-list"), 1)
+
+    def test_stock_list(self):
+        """Test that listing stock with its product and category takes fixed queries"""
+        self.assert_bounded(reverse("stock-list"), 1)
+        assert Stock.objects.count() == 12
+
+    def test_supplier_list(self):
+        """Test that listing suppliers with their products takes fixed queries"""
+        self.assert_bounded(reverse("supplier-list"), 4)
+
+    def test_employee_list(self):
+        """Test that listing employees with their users takes fixed queries"""
+        self.assert_bounded(reverse("employees-list"), 2)
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import tempfile
+from decimal import Decimal
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from sales.models import ReportJob
+
+from .test_setup import TestSetUp
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, MEDIA_ROOT=tempfile.mkdtemp())
+class TestReportJobs(TestSetUp):
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_sale_parties()
+        self.soap = self.create_stocked_product("Soap", "SOAP01", quantity="100.00")
+        self.today = timezone.localdate().isoformat()
+        self.auth_user.post(
+            reverse("sales-checkout"),
+            {
+                "business_id": str(self.business.uuid),
+                "cashier_id": str(self.cashier.uuid),
+                "receipt_type": "S",
+                "transaction_type": "N",
+                "lines": [{"product": str(self.soap.uuid), "quantity_sold": "2"}],
+                "payment": {"payment_mode": "CREDIT", "amount_paid": "0"},
+            },
+            content_type="application/json",
+        )
+
+    def queue(self, report_type="sales", report_format="json", run=True, **extra):
+        with self.captureOnCommitCallbacks(execute=run):
+            res = self.auth_user.post(
+                reverse("reportjobs-list"),
+                {
+                    "report_type": report_type,
+                    "report_format": report_format,
+                    "start_date": self.today,
+                    "end_date": self.today,
+                    **extra,
+                },
+                content_type="application/json",
+            )
+        return res
+
+    def download(self, job_uuid):
+        res = self.auth_user.get(reverse("reportjobs-download", kwargs={"uuid": job_uuid}))
+        return b"".join(res.streaming_content).decode()
+
+    def test_sales_report_is_generated_in_the_background(self):
+        """Test that a queued sales report can be polled and downloaded as JSON"""
+        res = self.queue()
+        assert res.status_code == 202
+        job_uuid = res.json()["uuid"]
+        status = self.auth_user.get(reverse("reportjobs-detail", kwargs={"uuid": job_uuid}))
+        assert status.json()["status"] == ReportJob.JobStatus.SUCCESS
+        report = json.loads(self.download(job_uuid))["sales_report"]
+        assert Decimal(report["total_sales"]) == Decimal("232.00")
+        assert report["sales"][0]["products"][0]["product_name"] == "Soap"
+
+    def test_stock_movement_report_can_be_downloaded_as_csv(self):
+        """Test that a stock movement report is stored as CSV with a header row"""
+        res = self.queue("stock_movement", "csv", product=str(self.soap.uuid))
+        rows = list(csv.reader(io.StringIO(self.download(res.json()["uuid"]))))
+        assert rows[0][1] == "product_name"
+        assert [row[1] for row in rows[1:]] == ["Soap"]
+        assert rows[-1][11] == "Sale made"
+
+    def test_identical_requests_share_one_job(self):
+        """Test that the same report requested again while queued is not run twice"""
+        first = self.queue(run=False).json()
+        second = self.queue(run=False).json()
+        assert first["uuid"] == second["uuid"]
+        assert first["status"] == ReportJob.JobStatus.PENDING
+        assert ReportJob.objects.count() == 1
+        assert self.queue("sales", "csv", run=False).json()["uuid"] != first["uuid"]
+
+    def test_recently_finished_report_is_reused(self):
+        """Test that a finished report is handed out again instead of regenerated"""
+        first = self.queue().json()
+        assert self.queue().json()["uuid"] == first["uuid"]
+        with override_settings(REPORT_JOB_REUSE_SECONDS=0):
+            assert self.queue().json()["uuid"] != first["uuid"]
+
+    def test_empty_report_fails_with_a_message(self):
+        """Test that a report over a range without sales ends as a failed job"""
+        res = self.queue(start_date="2000-01-01", end_date="2000-01-02")
+        job = ReportJob.objects.get(uuid=res.json()["uuid"])
+        assert job.status == ReportJob.JobStatus.FAILURE
+        assert job.error == "No sales found for the given date range"
+        download = self.auth_user.get(reverse("reportjobs-download", kwargs={"uuid": job.uuid}))
+        assert download.status_code == 400
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .test_setup import TestSetUp
+
+
+class TestSalesReport(TestSetUp):
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_sale_parties()
+        self.report_url = reverse("sales-generate-sales-report")
+        self.products = [
+            self.create_stocked_product(f"Product {index}", f"P{index}", quantity="1000.00") for index in range(3)
+        ]
+
+    def make_sales(self, count, lines):
+        for _ in range(count):
+            self.auth_user.post(
+                reverse("sales-checkout"),
+                {
+                    "business_id": str(self.business.uuid),
+                    "cashier_id": str(self.cashier.uuid),
+                    "receipt_type": "S",
+                    "transaction_type": "N",
+                    "lines": [
+                        {"product": str(product.uuid), "quantity_sold": "2"} for product in self.products[:lines]
+                    ],
+                    "payment": {"payment_mode": "CREDIT", "amount_paid": "0"},
+                },
+                content_type="application/json",
+            )
+
+    def report(self):
+        today = timezone.localdate().isoformat()
+        with CaptureQueriesContext(connection) as queries:
+            res = self.auth_user.post(
+                self.report_url,
+                {"start_date": today, "end_date": today},
+                content_type="application/json",
+            )
+        return res.json()["sales_report"], len(queries)
+
+    def test_report_totals(self):
+        """Test that revenue, tax and profit add up over every sale line"""
+        self.make_sales(2, lines=3)
+        report, _ = self.report()
+        # each line sells 2 units at 100.00 bought at 50.00 with 16% tax
+        assert Decimal(str(report["total_sales"])) == Decimal("1392.00")
+        assert Decimal(str(report["tax_amount"])) == Decimal("192.00")
+        assert Decimal(str(report["profit"])) == Decimal("600.00")
+        assert len(report["sales"]) == 2
+        assert len(report["sales"][0]["products"]) == 3
+        assert Decimal(str(report["sales"][0]["products"][0]["cost"])) == Decimal("100.00")
+
+    def test_report_query_count_does_not_grow_with_rows(self):
+        """Test that the report takes the same number of queries for more sales and lines"""
+        self.make_sales(1, lines=1)
+        _, small_report_queries = self.report()
+        self.make_sales(10, lines=3)
+        report, large_report_queries = self.report()
+        assert len(report["sales"]) == 11
+        assert large_report_queries == small_report_queries
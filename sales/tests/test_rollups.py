@@ -0,0 +1,187 @@
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from products.models import Stock
+from sales.models import DailyProductRollup, DailySalesRollup, ProductSales, Sales
+
+from .test_setup import TestSetUp
+
+
+class TestDailyRollups(TestSetUp):
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_sale_parties()
+        self.soap = self.create_stocked_product("Soap", "SOAP01", quantity="100.00")
+        self.salt = self.create_stocked_product("Salt", "SALT01", quantity="100.00", price="50.00", tax_type="A")
+        self.today = timezone.localdate().isoformat()
+
+    def checkout(self, lines, payment_mode):
+        return self.auth_user.post(
+            reverse("sales-checkout"),
+            {
+                "business_id": str(self.business.uuid),
+                "cashier_id": str(self.cashier.uuid),
+                "receipt_type": "S",
+                "transaction_type": "N",
+                "lines": lines,
+                "payment": {"payment_mode": payment_mode, "amount_paid": "0"},
+            },
+            content_type="application/json",
+        )
+
+    def make_sales(self):
+        self.checkout(
+            [
+                {"product": str(self.soap.uuid), "quantity_sold": "2"},
+                {"product": str(self.salt.uuid), "quantity_sold": "1"},
+            ],
+            "CREDIT",
+        )
+        self.checkout([{"product": str(self.soap.uuid), "quantity_sold": "1"}], "MOBILE MONEY")
+        self.checkout([{"product": str(self.soap.uuid), "quantity_sold": "3"}], "CREDIT")
+
+    def summary(self):
+        res = self.auth_user.post(
+            reverse("sales-generate-sales-summary"),
+            {"start_date": self.today, "end_date": self.today},
+            content_type="application/json",
+        )
+        return res.json()["sales_summary"]
+
+    def rollup_rows(self):
+        return (
+            sorted(
+                DailySalesRollup.objects.values_list(
+                    "payment_method", "sales_count", "sale_amount_with_tax", "tax_amount"
+                )
+            ),
+            sorted(
+                DailyProductRollup.objects.values_list("product__code", "quantity_sold", "price", "tax_amount", "cost")
+            ),
+        )
+
+    def test_approved_sales_are_rolled_up_incrementally(self):
+        """Test that each approved sale is added to its day's rollups"""
+        self.make_sales()
+        sales_rollups, product_rollups = self.rollup_rows()
+        assert sales_rollups == [
+            ("02", 2, Decimal("630.00"), Decimal("80.00")),
+            ("06", 1, Decimal("116.00"), Decimal("16.00")),
+        ]
+        assert product_rollups == [
+            ("SALT01", Decimal("1.00"), Decimal("50.00"), Decimal("0.00"), Decimal("25.00")),
+            ("SOAP01", Decimal("6.00"), Decimal("600.00"), Decimal("96.00"), Decimal("300.00")),
+        ]
+
+    def test_summary_matches_the_raw_sales_report(self):
+        """Test that the rollup summary gives the same totals as the raw report"""
+        self.make_sales()
+        summary = self.summary()
+        report = self.auth_user.post(
+            reverse("sales-generate-sales-report"),
+            {"start_date": self.today, "end_date": self.today},
+            content_type="application/json",
+        ).json()["sales_report"]
+        assert summary["sales_count"] == 3
+        for summary_key, report_key in [
+            ("total_sales", "total_sales"),
+            ("tax_amount", "tax_amount"),
+            ("profit", "profit"),
+        ]:
+            assert Decimal(str(summary[summary_key])) == Decimal(str(report[report_key]))
+        assert [product["product__name"] for product in summary["products"]] == ["Soap", "Salt"]
+
+    def test_backfill_command_rebuilds_the_same_rollups(self):
+        """Test that the backfill command recreates the incrementally kept rollups"""
+        self.make_sales()
+        incremental = self.rollup_rows()
+        DailySalesRollup.objects.all().delete()
+        DailyProductRollup.objects.all().delete()
+        call_command("rollup_sales", start_date=self.today, end_date=self.today)
+        assert self.rollup_rows() == incremental
+
+    def summed_rollups(self):
+        """
+        The rollup totals summed per key, leaving out keys that add up to nothing
+        """
+        sales, products = {}, {}
+        for rollups, key_field, totals, fields in [
+            (DailySalesRollup, "payment_method", sales, ["sales_count", "sale_amount_with_tax", "tax_amount"]),
+            (DailyProductRollup, "product__code", products, DailyProductRollup.TOTAL_FIELDS),
+        ]:
+            for key, *values in rollups.objects.values_list(key_field, *fields):
+                totals[key] = [sum(pair) for pair in zip(totals.get(key, [0] * len(fields)), values)]
+        return (
+            {key: values for key, values in sales.items() if any(values)},
+            {key: values for key, values in products.items() if any(values)},
+        )
+
+    def assert_matches_rebuild(self):
+        incremental = self.summed_rollups()
+        call_command("rollup_sales", start_date=self.today, end_date=self.today)
+        assert self.summed_rollups() == incremental
+
+    def test_changes_to_approved_sales_follow_into_the_rollups(self):
+        """Test that deleted sales, added and deleted lines and status changes move the rollups"""
+        self.make_sales()
+        first, second, third = Sales.objects.order_by("created_at")
+        self.auth_user.delete(reverse("sales-detail", kwargs={"uuid": first.uuid}))
+        res = self.auth_user.post(
+            reverse("productsales-list"),
+            {"product": str(self.salt.uuid), "sale": str(second.uuid), "quantity_sold": "2", "is_wholesale": False},
+            content_type="application/json",
+        )
+        assert res.status_code == 200
+        line = ProductSales.objects.get(sale=second, product=self.salt)
+        self.auth_user.delete(reverse("productsales-detail", kwargs={"uuid": third.product_sales.get().uuid}))
+        sales_rollups, product_rollups = self.summed_rollups()
+        assert sales_rollups == {
+            "02": [1, Decimal("0.00"), Decimal("0.00")],
+            "06": [1, Decimal("216.00"), Decimal("16.00")],
+        }
+        assert product_rollups == {
+            "SALT01": [Decimal("2.00"), Decimal("100.00"), Decimal("0.00"), Decimal("50.00")],
+            "SOAP01": [Decimal("1.00"), Decimal("100.00"), Decimal("16.00"), Decimal("50.00")],
+        }
+        self.assert_matches_rebuild()
+
+        self.auth_user.delete(reverse("productsales-detail", kwargs={"uuid": line.uuid}))
+        res = self.auth_user.patch(
+            reverse("sales-detail", kwargs={"uuid": third.uuid}),
+            {"sale_status": Sales.TransactionProgress.Cancelled},
+            content_type="application/json",
+        )
+        assert res.status_code == 200
+        assert self.summed_rollups()[0] == {"06": [1, Decimal("116.00"), Decimal("16.00")]}
+        self.assert_matches_rebuild()
+
+    def test_edited_lines_of_approved_sales_follow_into_the_summary(self):
+        """Test that editing a line of an approved sale moves its sale, the rollups and the summary"""
+        self.checkout([{"product": str(self.soap.uuid), "quantity_sold": "1"}], "CREDIT")
+        line = ProductSales.objects.get()
+        res = self.auth_user.patch(
+            reverse("productsales-detail", kwargs={"uuid": line.uuid}),
+            {"quantity_sold": "3", "price": "300.00", "tax_amount": "48.00"},
+            content_type="application/json",
+        )
+        assert res.status_code == 200
+        sale = Sales.objects.get()
+        assert (sale.sale_amount_with_tax, sale.tax_amount) == (Decimal("348.00"), Decimal("48.00"))
+        summary = self.summary()
+        assert summary["sales_count"] == 1
+        assert Decimal(str(summary["total_sales"])) == Decimal("348.00")
+        assert Decimal(str(summary["tax_amount"])) == Decimal("48.00")
+        [product] = summary["products"]
+        assert Decimal(str(product["quantity_sold"])) == Decimal("3.00")
+        assert Decimal(str(product["profit"])) == Decimal("150.00")
+        self.assert_matches_rebuild()
+
+    def test_cost_is_kept_at_the_cost_sold_at(self):
+        """Test that a later stock cost change leaves the cost of rolled up and rebuilt sales alone"""
+        self.make_sales()
+        Stock.objects.filter(product_id=self.soap).update(cost_per_unit=Decimal("80.00"))
+        self.assert_matches_rebuild()
+        assert self.summed_rollups()[1]["SOAP01"][3] == Decimal("300.00")
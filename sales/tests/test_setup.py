@@ -1,6 +1,14 @@
+from contextlib import contextmanager
+from decimal import Decimal
+
 from rest_framework.test import APITestCase
 from pos_inventory.users.models import User
+from administration.models import Business, Employee
+from products.models import Category, Product, Stock
+from sales.models import Customer
+from django.db import connection
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 class TestSetUp(APITestCase):
@@ -13,6 +21,47 @@ class TestSetUp(APITestCase):
         client.login(username="testuser", password="password")
         return client
 
+    def create_sale_parties(self) -> None:
+        """create the business, cashier and customer a sale is made for"""
+        owner = User.objects.create_user(username="owner", password="password")
+        cashier = User.objects.create_user(username="cashier", password="password")
+        self.business = Business.objects.create(
+            name="Duka", address="Nairobi", tax_pin="P000000000A", owner=owner
+        )
+        self.cashier = Employee.objects.create(user=cashier, phone_number="0700000000")
+        self.customer = Customer.objects.create(name="Walk in")
+
+    def create_stocked_product(
+        self, name, code, quantity="10.00", price="100.00", tax_type="B"
+    ) -> Product:
+        """create a product with its stock"""
+        category, _ = Category.objects.get_or_create(name="General")
+        product = Product.objects.create(
+            category=category,
+            name=name,
+            code=code,
+            product_type=Product.ProductType.Finished_Product,
+            tax_type=tax_type,
+            packaging_unit=Product.PackagingUnit.Bag,
+            unit=Product.UnitOfQuantity.Number,
+        )
+        Stock.objects.create(
+            product_id=product,
+            stock_quantity=Decimal(quantity),
+            cost_per_unit=Decimal(price) / 2,
+            price_per_unit_retail=Decimal(price),
+            price_per_unit_wholesale=Decimal(price) * Decimal("0.9"),
+        )
+        return product
+
+    @contextmanager
+    def assert_max_queries(self, limit):
+        """fail when the block runs more than limit queries"""
+        with CaptureQueriesContext(connection) as queries:
+            yield queries
+        executed = "\n".join(query["sql"] for query in queries.captured_queries)
+        assert len(queries) <= limit, f"{len(queries)} queries, expected {limit} at most\n{executed}"
+
     def setUp(self) -> None:
         self.auth_user = self.authenticate_user()
         self.payment_mode_url = reverse("paymentmodes-list")
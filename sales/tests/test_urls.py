@@ -22,7 +22,8 @@ class TestSaleUrls(TestSetUp):
         self.auth_user.post(self.payment_mode_url, self.payment_mode_data1, format="json")
         self.auth_user.post(self.payment_mode_url, self.payment_mode_data2, format="json")
         res = self.auth_user.get(self.payment_mode_url)
-        assert len(res.json()) == 2
+        assert res.json()["count"] == 2
+        assert len(res.json()["results"]) == 2
 
     def test_payment_mode_can_be_edited_after_creation(self):
         """Test that the put method works and a payment mode can be edited"""
@@ -39,7 +40,7 @@ class TestSaleUrls(TestSetUp):
         payment_mode_url = reverse("paymentmodes-detail", args=[uuid])
         self.auth_user.delete(payment_mode_url)
         res = self.auth_user.get(self.payment_mode_url)
-        assert original_res.json() != res.json() and res.json() == []
+        assert res.json()["results"] == []
 
     def test_payment_mode_single_property_can_be_edited(self):
         """Test that a single property of the payment mode can be changed"""